@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .cloning import clone_course
 from .models import Category, Course
 
 @admin.register(Category)
@@ -32,6 +33,13 @@ class CourseAdmin(admin.ModelAdmin):
             'fields': ('is_published', 'is_popular')
         }),
     )
+    actions = ['duplicate_courses']
+
+    def duplicate_courses(self, request, queryset):
+        for course in queryset:
+            clone_course(course)
+        self.message_user(request, f'Создано копий курсов: {len(queryset)} (не опубликованы)')
+    duplicate_courses.short_description = 'Создать копии с модулями и уроками'
 
 from .models import Review
 
@@ -61,8 +69,8 @@ class ModuleAdmin(admin.ModelAdmin):
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
-    list_display = ['title', 'module', 'order', 'duration_minutes', 'is_published', 'created_at']
-    list_filter = ['module__course', 'is_published', 'created_at']
+    list_display = ['title', 'module', 'order', 'duration_minutes', 'content_format', 'is_published', 'created_at']
+    list_filter = ['module__course', 'content_format', 'is_published', 'created_at']
     search_fields = ['title', 'content']
     ordering = ['module', 'order']
 
@@ -0,0 +1,188 @@
+"""
+JSON API каталога только для чтения (/api/v1/...): категории и
+опубликованные курсы с модулями и уроками.
+
+- fields=id,title,price - поля ответа (загружаются через only());
+  без параметра отдаются поля ресурса по умолчанию;
+- cursor= и limit= - курсорная пагинация: next_cursor из ответа
+  передается в следующий запрос. Курсор - значения полей порядка
+  последней строки, поэтому дальние страницы не медленнее первой
+  (нет OFFSET), а строки не пропускаются при изменении каталога;
+- у ответа сильный ETag из последнего updated_at и числа строк:
+  клиент присылает его в If-None-Match и получает 304 без тела,
+  а сервер не загружает и не сериализует строки.
+
+    GET /api/v1/courses/?level=beginner&fields=id,title,price&limit=2
+    {"results": [{"id": 7, "title": "...", "price": "0.00"}, ...],
+     "next_cursor": "WyIyMDI2LTEwLTE5VDEyOjAwOjAwKzAwOjAwIiwgN10"}
+"""
+import base64
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max, Q
+from django.utils.http import quote_etag
+
+from .models import Category, Course, Lesson, Module
+
+API_VERSION = 'v1'
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+# Максимум ID курсов в одном пакетном запросе (/api/v1/courses/batch/?ids=...)
+MAX_BATCH_IDS = 100
+
+
+class ApiError(ValueError):
+    """Неверный параметр запроса (ответ 400)"""
+
+
+class Resource:
+    """Поля ресурса API и порядок строк, по которому строится курсор"""
+
+    def __init__(self, model, fields, default_fields, ordering):
+        self.model = model
+        self.fields = fields
+        self.default_fields = default_fields
+        self.ordering = ordering
+
+    def parse_fields(self, value):
+        """Поля из параметра fields=; без него - поля по умолчанию"""
+        if not value:
+            return list(self.default_fields)
+        names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown or not names:
+            raise ApiError(f'Неизвестные поля: {", ".join(unknown)}. Доступны: {", ".join(self.fields)}')
+        return names
+
+    def only(self, queryset, names):
+        # Поля порядка нужны для курсора следующей страницы
+        ordering_fields = [field.lstrip('-') for field in self.ordering]
+        return queryset.only(*dict.fromkeys([*names, *ordering_fields]))
+
+    def serialize(self, obj, names):
+        # Для связей отдается id: category -> category_id
+        return {name: getattr(obj, self.model._meta.get_field(name).attname) for name in names}
+
+
+CATEGORIES = Resource(
+    Category,
+    fields=('id', 'name', 'description', 'updated_at'),
+    default_fields=('id', 'name', 'description'),
+    ordering=('name', 'id'),
+)
+COURSES = Resource(
+    Course,
+    fields=(
+        'id', 'title', 'description', 'full_description', 'price', 'is_free', 'level', 'is_popular',
+        'category', 'author', 'duration_hours', 'average_rating', 'review_count', 'created_at', 'updated_at',
+    ),
+    default_fields=(
+        'id', 'title', 'description', 'price', 'is_free', 'level', 'category', 'author', 'duration_hours',
+        'created_at',
+    ),
+    # Как в каталоге: новые курсы первыми
+    ordering=('-created_at', '-id'),
+)
+MODULES = Resource(
+    Module,
+    fields=('id', 'course', 'title', 'description', 'order', 'updated_at'),
+    default_fields=('id', 'course', 'title', 'description', 'order'),
+    ordering=('order', 'id'),
+)
+LESSONS = Resource(
+    Lesson,
+    # Текст урока - очищенный скомпилированный HTML (см. content.py), исходный content не отдается
+    fields=('id', 'module', 'title', 'content_html', 'toc', 'word_count', 'order', 'duration_minutes', 'updated_at'),
+    # Текст урока большой - только по запросу fields=...,content_html
+    default_fields=('id', 'module', 'title', 'order', 'duration_minutes'),
+    ordering=('order', 'id'),
+)
+
+
+def parse_limit(value):
+    if not value:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ApiError('limit должен быть числом')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ApiError(f'limit должен быть от 1 до {MAX_LIMIT}')
+    return limit
+
+
+def parse_ids(value):
+    """ID из параметра ids=1,2,3 без повторов, в порядке запроса"""
+    try:
+        ids = list(dict.fromkeys(int(part) for part in (value or '').split(',') if part.strip()))
+    except ValueError:
+        raise ApiError('ids должен быть списком чисел через запятую')
+    if not ids:
+        raise ApiError('Не указаны ids')
+    if len(ids) > MAX_BATCH_IDS:
+        raise ApiError(f'Не больше {MAX_BATCH_IDS} ids в одном запросе')
+    return ids
+
+
+def encode_cursor(values):
+    raw = json.dumps([value.isoformat() if hasattr(value, 'isoformat') else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(resource, cursor):
+    """Значения полей порядка из курсора; None - первая страница"""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(resource.ordering):
+            raise ValueError(cursor)
+        return [
+            resource.model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(resource.ordering, values)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        raise ApiError('Неверный курсор')
+
+
+def after(ordering, values):
+    """Условие «строка после курсора»: (a, b) > (x, y) для порядка ordering"""
+    condition = Q()
+    for index, field in enumerate(ordering):
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{field.lstrip("-")}__{lookup}': values[index]})
+        for previous, value in zip(ordering[:index], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def paginate(resource, queryset, names, cursor_values=None, limit=DEFAULT_LIMIT):
+    """Страница сериализованных объектов после курсора и курсор следующей страницы"""
+    queryset = resource.only(queryset, names).order_by(*resource.ordering)
+    if cursor_values is not None:
+        queryset = queryset.filter(after(resource.ordering, cursor_values))
+    objects = list(queryset[:limit + 1])
+
+    next_cursor = None
+    if len(objects) > limit:
+        objects = objects[:limit]
+        next_cursor = encode_cursor([getattr(objects[-1], field.lstrip('-')) for field in resource.ordering])
+    return {
+        'results': [resource.serialize(obj, names) for obj in objects],
+        'next_cursor': next_cursor,
+    }
+
+
+def make_etag(request, queryset):
+    """
+    Сильный ETag ответа и число строк: один агрегирующий запрос.
+    Изменение строки сдвигает ее updated_at, удаление и снятие с
+    публикации уменьшают число строк - в любом случае ETag меняется.
+    """
+    stats = queryset.order_by().aggregate(updated=Max('updated_at'), count=Count('pk'))
+    updated = stats['updated'].isoformat() if stats['updated'] else ''
+    source = f'{API_VERSION}|{request.get_full_path()}|{updated}|{stats["count"]}'
+    return quote_etag(hashlib.md5(source.encode('utf-8'), usedforsecurity=False).hexdigest()), stats['count']
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    Стандартный ModelBackend, который загружает пользователя вместе с
+    UserProfile одним запросом (select_related).
+    Миксины и шаблоны постоянно обращаются к user.user_profile,
+    поэтому отдельный запрос за профилем на каждый запрос не нужен.
+    """
+
+    def get_user_queryset(self):
+        return UserModel._default_manager.select_related('user_profile')
+
+    def get_user(self, user_id):
+        try:
+            user = self.get_user_queryset().get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await self.get_user_queryset().aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
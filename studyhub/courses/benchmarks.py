@@ -0,0 +1,377 @@
+"""
+Набор тестов производительности для `manage.py bench`.
+
+Сценарии бывают двух видов:
+- macro - полный запрос через тестовый клиент: все middleware, представление,
+  шаблон, сессия;
+- micro - отдельная функция или запрос ORM без HTTP.
+
+Данные создает generate_load_data с префиксом bench в объемах из SIZES.
+Каждая итерация выполняется в транзакции, которая откатывается, поэтому
+сценарии на запись (прохождение урока, оформление заказа) повторяемы.
+Для сценария измеряются время (перцентили), число запросов к базе и пик
+выделенной памяти (tracemalloc, отдельным проходом - он замедляет код).
+
+Результат сравнивается с сохраненным базовым прогоном функцией compare.
+"""
+import gc
+import io
+import platform
+import statistics
+import time
+import tracemalloc
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+
+from .enrollments import ENROLLED_IDS_KEY, get_enrolled_course_ids
+from .metrics import percentile
+from .models import Course, Enrollment, Lesson, SupportRequest
+from .querystats import collect_queries
+from .views import CourseRecommendationView, get_categories_with_counts
+
+PREFIX = 'bench'
+
+# Объемы данных (параметры generate_load_data)
+SIZES = {
+    'small': {
+        'users': 100, 'tutors': 10, 'courses': 40, 'modules': 4, 'lessons': 5,
+        'enrollments': 5, 'orders': 100, 'support': 200,
+    },
+    'medium': {
+        'users': 1000, 'tutors': 40, 'courses': 400, 'modules': 6, 'lessons': 8,
+        'enrollments': 8, 'orders': 2000, 'support': 3000,
+    },
+    'large': {
+        'users': 10000, 'tutors': 200, 'courses': 3000, 'modules': 6, 'lessons': 8,
+        'enrollments': 12, 'orders': 20000, 'support': 30000,
+    },
+}
+
+QUIZ_PARAMS = (
+    '?coding_interest=5&design_interest=2&web_development=4&mobile_development=3'
+    '&database_interest=4&ml_interest=2&level=beginner'
+)
+
+# Имя сценария: (вид, функция подготовки)
+SCENARIOS = {}
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+def scenario(name, kind='macro'):
+    """
+    Регистрирует сценарий. Функция подготовки получает BenchData
+    и возвращает функцию одной итерации.
+    """
+    def decorator(func):
+        SCENARIOS[name] = (kind, func)
+        return func
+    return decorator
+
+
+class BenchData:
+    """Пользователи и объекты, на которых выполняются сценарии"""
+
+    def __init__(self):
+        # Самый популярный курс - на него приходится основная нагрузка
+        self.course = (
+            Course.objects.filter(is_published=True)
+            .annotate(enrollments_count=Count('enrollment'))
+            .filter(enrollments_count__gt=0, modules__lessons__isnull=False)
+            .order_by('-enrollments_count', 'pk')
+            .first()
+        )
+        if self.course is None:
+            raise BenchmarkError('Нет опубликованного курса с записями и уроками')
+        self.module = self.course.modules.filter(lessons__isnull=False).order_by('order').first()
+        self.lesson = self.module.lessons.order_by('order').first()
+        self.student = (
+            User.objects.filter(enrollment__course=self.course).order_by('pk').first()
+        )
+        self.admin, created = User.objects.get_or_create(
+            username=f'{PREFIX}_admin', defaults={'is_staff': True, 'is_superuser': True},
+        )
+        if created:
+            self.admin.user_profile.role = 'admin'
+            self.admin.user_profile.save()
+
+        enrolled = Enrollment.objects.filter(user=self.student).values('course_id')
+        self.cart_course_ids = list(
+            Course.objects.filter(is_published=True, is_free=False)
+            .exclude(pk__in=enrolled)
+            .order_by('pk')
+            .values_list('pk', flat=True)[:3]
+        )
+        self.clients = {}
+
+    def client(self, user):
+        """Клиент с выполненным входом (один на пользователя)"""
+        if user.pk not in self.clients:
+            client = Client()
+            client.force_login(user)
+            self.clients[user.pk] = client
+        return self.clients[user.pk]
+
+    def module_kwargs(self):
+        return {'course_pk': self.course.pk, 'module_pk': self.module.pk}
+
+
+def page(client, url, method='get', data=None, status=200):
+    """Итерация macro-сценария: запрос с проверкой кода ответа"""
+    def run():
+        response = getattr(client, method)(url, data)
+        if response.status_code != status:
+            raise BenchmarkError(f'{method.upper()} {url}: ответ {response.status_code}, ожидался {status}')
+    return run
+
+
+@scenario('catalog_list')
+def catalog_list(data):
+    return page(data.client(data.student), reverse('course_list'))
+
+
+@scenario('catalog_filter')
+def catalog_filter(data):
+    return page(data.client(data.student), reverse('course_list') + '?level=beginner&free=on')
+
+
+@scenario('catalog_search')
+def catalog_search(data):
+    return page(data.client(data.student), reverse('course_list') + '?search=Python')
+
+
+@scenario('course_search')
+def course_search(data):
+    return page(data.client(data.student), reverse('course_search') + '?q=Django')
+
+
+@scenario('course_detail')
+def course_detail(data):
+    return page(data.client(data.student), reverse('course_detail', args=[data.course.pk]))
+
+
+@scenario('module_detail')
+def module_detail(data):
+    return page(data.client(data.student), reverse('module_detail', kwargs=data.module_kwargs()))
+
+
+@scenario('lesson_detail')
+def lesson_detail(data):
+    url = reverse('lesson_detail', kwargs={**data.module_kwargs(), 'lesson_pk': data.lesson.pk})
+    return page(data.client(data.student), url)
+
+
+@scenario('lesson_complete')
+def lesson_complete(data):
+    return page(
+        data.client(data.student), reverse('mark_lesson_completed'), 'post',
+        {'lesson_id': data.lesson.pk, 'completed': 'true'},
+    )
+
+
+@scenario('checkout')
+def checkout(data):
+    if not data.cart_course_ids:
+        raise BenchmarkError('Нет платных курсов для корзины')
+    client = data.client(data.student)
+    # Корзина сохраняется в сессии до итераций; оформление в итерации откатывается
+    session = client.session
+    session['cart'] = data.cart_course_ids
+    session.save()
+    return page(client, reverse('checkout'), 'post', {}, status=302)
+
+
+@scenario('recommendation_quiz')
+def recommendation_quiz(data):
+    return page(data.client(data.student), reverse('course_recommendation') + QUIZ_PARAMS)
+
+
+@scenario('admin_stats')
+def admin_stats(data):
+    return page(data.client(data.admin), reverse('admin_stats'))
+
+
+@scenario('support_list')
+def support_list(data):
+    return page(data.client(data.admin), reverse('support_requests_list') + '?status=all')
+
+
+@scenario('enrolled_ids', kind='micro')
+def enrolled_ids(data):
+    def run():
+        # Новый объект пользователя и пустой кэш - загрузка из базы
+        user = User(pk=data.student.pk)
+        caches['default'].delete(ENROLLED_IDS_KEY.format(user.pk))
+        get_enrolled_course_ids(user)
+    return run
+
+
+@scenario('recommendation_scoring', kind='micro')
+def recommendation_scoring(data):
+    request = RequestFactory().get(reverse('course_recommendation') + QUIZ_PARAMS)
+    request.user = data.student
+
+    def run():
+        view = CourseRecommendationView()
+        view.setup(request)
+        list(view._get_recommended_courses())
+    return run
+
+
+@scenario('category_counts', kind='micro')
+def category_counts(data):
+    # Функция без кэша - стоимость самого запроса
+    return get_categories_with_counts.__wrapped__
+
+
+@scenario('course_outline', kind='micro')
+def course_outline(data):
+    def run():
+        list(Lesson.objects.filter(module__course=data.course).select_related('module').order_by(
+            'module__order', 'order',
+        ))
+    return run
+
+
+@scenario('support_pending_count', kind='micro')
+def support_pending_count(data):
+    return lambda: SupportRequest.objects.filter(status='pending').count()
+
+
+def run_iteration(run):
+    """Одна итерация в откатываемой транзакции: (время в мс, число запросов)"""
+    with transaction.atomic():
+        try:
+            with collect_queries() as stats:
+                started = time.perf_counter()
+                run()
+                duration = time.perf_counter() - started
+        finally:
+            transaction.set_rollback(True)
+    return duration * 1000, stats.count
+
+
+def measure(run, iterations=30, warmup=3, alloc_iterations=3):
+    """Время, запросы и память одного сценария"""
+    for _ in range(warmup):
+        run_iteration(run)
+
+    gc.collect()
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        duration, count = run_iteration(run)
+        timings.append(duration)
+        queries.append(count)
+
+    allocations = []
+    if alloc_iterations:
+        tracemalloc.start()
+        try:
+            for _ in range(alloc_iterations):
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                run_iteration(run)
+                allocations.append(tracemalloc.get_traced_memory()[1] - before)
+        finally:
+            tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'min_ms': round(min(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p90_ms': round(percentile(timings, 90), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'p99_ms': round(percentile(timings, 99), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': max(queries),
+        'alloc_peak_kb': round(statistics.median(allocations) / 1024, 1) if allocations else None,
+    }
+
+
+def generate_data(size, seed=42, stdout=None):
+    """Пересоздает данные bench; size - имя из SIZES или словарь параметров"""
+    options = SIZES[size] if isinstance(size, str) else size
+    call_command(
+        'generate_load_data', prefix=PREFIX, clear=True, seed=seed,
+        stdout=stdout or io.StringIO(), **options,
+    )
+
+
+def run_suite(names=None, iterations=30, warmup=3, alloc_iterations=3, progress=None):
+    """Выполняет сценарии на текущих данных: {имя: результат}"""
+    names = names or list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        raise BenchmarkError(f'Неизвестные сценарии: {", ".join(unknown)}')
+
+    for alias in ('default', 'local'):
+        caches[alias].clear()
+    data = BenchData()
+    results = {}
+    for name in names:
+        kind, prepare = SCENARIOS[name]
+        result = measure(prepare(data), iterations, warmup, alloc_iterations)
+        results[name] = {'kind': kind, **result}
+        if progress:
+            progress(name, results[name])
+    return results
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+        'created_at': timezone.now().isoformat(),
+    }
+
+
+def compare(baseline, current, threshold=0.25, min_delta_ms=2.0, min_delta_kb=256.0):
+    """
+    Регрессии текущего прогона относительно базового:
+    - p50 и p95 выросли больше чем на threshold (доля) и на min_delta_ms;
+    - пик памяти вырос больше чем на threshold и на min_delta_kb;
+    - выросло число запросов к базе (оно не зависит от шума).
+    Сравниваются только сценарии, которые есть в обоих прогонах.
+    """
+    regressions = []
+    for size, results in current.get('results', {}).items():
+        base_results = baseline.get('results', {}).get(size, {})
+        for name, result in results.items():
+            base = base_results.get(name)
+            if base is None:
+                continue
+            checks = [('p50_ms', min_delta_ms), ('p95_ms', min_delta_ms), ('alloc_peak_kb', min_delta_kb)]
+            for metric, min_delta in checks:
+                old, new = base.get(metric), result.get(metric)
+                if old is None or new is None:
+                    continue
+                if new - old > min_delta and new > old * (1 + threshold):
+                    regressions.append(regression(size, name, metric, old, new))
+            if result['queries'] > base['queries']:
+                regressions.append(regression(size, name, 'queries', base['queries'], result['queries']))
+    return regressions
+
+
+def regression(size, name, metric, old, new):
+    return {
+        'size': size,
+        'scenario': name,
+        'metric': metric,
+        'baseline': old,
+        'current': new,
+        'change': round((new - old) / old * 100, 1) if old else None,
+    }
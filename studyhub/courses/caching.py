@@ -0,0 +1,207 @@
+"""
+Кэширование данных каталога.
+
+Каждая модель (курсы, модули, уроки, ...) имеет свое пространство имен
+с номером версии. Версия хранится в общем кэше и увеличивается сигналами
+при любом изменении модели (см. signals.py), поэтому ключи, построенные
+на старой версии, просто перестают использоваться - удалять их не нужно.
+
+    @cached('course', 'category', timeout=300)
+    def get_category_counts():
+        ...
+
+    key = make_key('catalog', 'course', 'review')
+
+Для публичных страниц есть полный кэш ответов анонимным посетителям:
+
+    @method_decorator(cache_anonymous_page('course', 'category'), name='dispatch')
+    class CourseListView(ListView):
+        ...
+
+Асинхронным представлениям нужен async def dispatch - тогда декоратор
+выбирает асинхронную обертку.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.utils.cache import patch_vary_headers
+
+# Общий кэш (файлы или Redis) - виден всем процессам
+SHARED_CACHE = 'default'
+# Локальный кэш процесса - для небольших часто используемых объектов
+LOCAL_CACHE = 'local'
+
+NAMESPACES = ('course', 'category', 'module', 'lesson', 'review', 'enrollment', 'userprofile', 'user')
+
+NAMESPACE_VERSION_KEY = 'courses:ns:{}'
+
+
+def _check_namespace(namespace):
+    if namespace not in NAMESPACES:
+        raise ValueError(f'Неизвестное пространство имен кэша: {namespace}')
+
+
+def get_namespace_version(namespace):
+    """Текущая версия пространства имен"""
+    _check_namespace(namespace)
+    cache = caches[SHARED_CACHE]
+    key = NAMESPACE_VERSION_KEY.format(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Версия потеряна (кэш очищен) - начинаем с нового значения,
+        # чтобы не совпасть ни с одной из старых версий
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def get_namespace_versions(*namespaces):
+    """Версии нескольких пространств имен одним обращением к кэшу"""
+    for namespace in namespaces:
+        _check_namespace(namespace)
+    cache = caches[SHARED_CACHE]
+    keys = {NAMESPACE_VERSION_KEY.format(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, namespace in keys.items():
+        if key in found:
+            versions[namespace] = found[key]
+        else:
+            versions[namespace] = get_namespace_version(namespace)
+    return [versions[namespace] for namespace in namespaces]
+
+
+def bump_namespace_version(namespace):
+    """Делает недействительными все ключи пространства имен"""
+    _check_namespace(namespace)
+    caches[SHARED_CACHE].set(NAMESPACE_VERSION_KEY.format(namespace), time.time_ns(), timeout=None)
+
+
+def make_key(prefix, *namespaces, parts=()):
+    """
+    Ключ кэша, зависящий от версий указанных пространств имен.
+    Дополнительные части (аргументы, параметры запроса) хэшируются.
+    """
+    versions = get_namespace_versions(*namespaces)
+    stamp = '.'.join(f'{namespace}{version}' for namespace, version in zip(namespaces, versions))
+    key = f'courses:{prefix}:{stamp}'
+    if parts:
+        digest = hashlib.md5(repr(tuple(parts)).encode('utf-8'), usedforsecurity=False).hexdigest()
+        key = f'{key}:{digest}'
+    return key
+
+
+def cached(*namespaces, timeout=300, cache_alias=SHARED_CACHE, prefix=None):
+    """
+    Декоратор: кэширует результат функции до изменения любой из моделей
+    из namespaces (или до истечения timeout).
+    Аргументы функции входят в ключ, поэтому они должны иметь стабильный repr.
+    """
+    def decorator(func):
+        key_prefix = prefix or f'{func.__module__}.{func.__qualname__}'
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = caches[cache_alias]
+            key = make_key(key_prefix, *namespaces, parts=(args, sorted(kwargs.items())))
+            sentinel = object()
+            result = cache.get(key, sentinel)
+            if result is sentinel:
+                result = func(*args, **kwargs)
+                cache.set(key, result, timeout)
+            return result
+
+        wrapper.cache_namespaces = namespaces
+        return wrapper
+    return decorator
+
+
+def _is_anonymous_request(request):
+    """
+    Запрос можно обслужить из кэша, только если у посетителя нет сессии
+    и непоказанных сообщений - иначе страница может отличаться.
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    if CookieStorage.cookie_name in request.COOKIES:
+        return False
+    return True
+
+
+def cache_anonymous_page(*namespaces, timeout=600, cache_alias=SHARED_CACHE):
+    """
+    Декоратор представления: кэширует весь ответ для анонимных посетителей.
+    Ключ включает полный путь с query string и версии namespaces,
+    поэтому изменение любой из этих моделей сразу делает страницу устаревшей.
+    Ответ всегда получает Vary: Cookie, чтобы прокси не отдавали
+    анонимную версию вошедшим пользователям.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _is_anonymous_request(request):
+                    response = await view_func(request, *args, **kwargs)
+                    patch_vary_headers(response, ('Cookie',))
+                    return response
+
+                cache = caches[cache_alias]
+                key = await sync_to_async(make_key)(
+                    'page', *namespaces, parts=(request.get_host(), request.get_full_path()),
+                )
+                response = await cache.aget(key)
+                if response is not None:
+                    response['X-Page-Cache'] = 'HIT'
+                    return response
+
+                response = await view_func(request, *args, **kwargs)
+                return _store_page(request, response, cache, key, timeout)
+
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_anonymous_request(request):
+                response = view_func(request, *args, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+
+            cache = caches[cache_alias]
+            key = make_key('page', *namespaces, parts=(request.get_host(), request.get_full_path()))
+            response = cache.get(key)
+            if response is not None:
+                response['X-Page-Cache'] = 'HIT'
+                return response
+
+            response = view_func(request, *args, **kwargs)
+            return _store_page(request, response, cache, key, timeout)
+
+        return wrapper
+    return decorator
+
+
+def _store_page(request, response, cache, key, timeout):
+    """Сохраняет ответ в кэш после рендеринга (TemplateResponse) или сразу"""
+    patch_vary_headers(response, ('Cookie',))
+
+    def store(response):
+        # Страницы с CSRF-токеном, cookie или ошибками не кэшируем
+        if response.status_code != 200 or response.streaming or response.cookies:
+            return
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            return
+        cache.set(key, response, timeout)
+        response['X-Page-Cache'] = 'MISS'
+
+    if hasattr(response, 'render') and callable(response.render) and not response.is_rendered:
+        response.add_post_render_callback(store)
+    else:
+        store(response)
+    return response
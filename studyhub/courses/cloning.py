@@ -0,0 +1,76 @@
+"""
+Копирование курса с модулями и уроками - основа нового издания курса.
+
+Копия создается тремя bulk_create (курс, модули, уроки) в одной
+транзакции, поэтому число запросов не зависит от размера курса.
+Первичные ключи новых строк возвращает INSERT ... RETURNING (PostgreSQL,
+SQLite 3.35+), по ним старые ID модулей заменяются новыми в уроках.
+
+bulk_create не вызывает save() и сигналы post_save. Поэтому:
+- уроки копируются вместе со скомпилированным содержанием
+  (content_html, toc, word_count) - компилировать его заново не нужно;
+- кэш курсов, модулей и уроков сбрасывается один раз после фиксации
+  транзакции, а не на каждой строке.
+
+Копия не опубликована и не популярна, отзывов и записей у нее нет -
+автор проверяет ее и публикует сам.
+"""
+from django.db import transaction
+
+from .caching import bump_namespace_version
+from .models import Course, Lesson, Module
+
+# Поля, которые не переносятся в копию: ключ и даты заполняются заново
+_SKIPPED_FIELDS = {'id', 'created_at', 'updated_at'}
+# Копия - черновик без популярности и рейтинга
+COURSE_RESET = {'is_published': False, 'is_popular': False, 'review_count': 0, 'average_rating': None}
+
+COPY_SUFFIX = ' (копия)'
+
+
+def _copy(obj, **overrides):
+    """Несохраненная копия объекта: значения всех полей, кроме ключа и дат"""
+    values = {
+        field.attname: getattr(obj, field.attname)
+        for field in obj._meta.concrete_fields
+        if field.name not in _SKIPPED_FIELDS
+    }
+    values.update(overrides)
+    return type(obj)(**values)
+
+
+def copy_title(title):
+    max_length = Course._meta.get_field('title').max_length
+    return title[:max_length - len(COPY_SUFFIX)] + COPY_SUFFIX
+
+
+def clone_course(course, title=None, author=None):
+    """
+    Копия курса со всеми модулями и уроками в прежнем порядке.
+    По умолчанию название получает суффикс « (копия)», автор сохраняется.
+    """
+    with transaction.atomic():
+        new_course = _copy(
+            course,
+            title=title or copy_title(course.title),
+            author_id=author.pk if author else course.author_id,
+            **COURSE_RESET,
+        )
+        Course.objects.bulk_create([new_course])
+
+        modules = list(Module.objects.filter(course=course).order_by('order'))
+        new_modules = [_copy(module, course_id=new_course.pk) for module in modules]
+        Module.objects.bulk_create(new_modules)
+        module_ids = {module.pk: new_module.pk for module, new_module in zip(modules, new_modules)}
+
+        lessons = Lesson.objects.filter(module__course=course).order_by('module_id', 'order')
+        Lesson.objects.bulk_create([
+            _copy(lesson, module_id=module_ids[lesson.module_id]) for lesson in lessons
+        ])
+
+        def bump_versions():
+            for namespace in ('course', 'module', 'lesson'):
+                bump_namespace_version(namespace)
+
+        transaction.on_commit(bump_versions)
+    return new_course
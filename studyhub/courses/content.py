@@ -0,0 +1,187 @@
+"""
+Подготовка текста урока к показу: HTML, оглавление и число слов.
+
+Текст компилируется при сохранении урока (Lesson.save) и хранится
+в content_html, toc и word_count - страница урока выводит готовый HTML,
+и Markdown с очисткой не выполняются на каждом запросе. Уроки,
+сохраненные в обход save() (bulk_create, update), компилирует команда
+manage.py render_lessons.
+
+Форматы (Lesson.content_format):
+- text - обычный текст: абзацы и переносы строк, как фильтр linebreaks;
+- markdown - Markdown (нужен пакет markdown, без него текст выводится
+  как text);
+- html - HTML автора.
+
+Любой результат проходит очистку: остаются только теги ALLOWED_TAGS
+с атрибутами ALLOWED_ATTRIBUTES, ссылки - http(s), mailto и
+относительные. Заголовки h2 и h3 получают id, из них строится оглавление:
+
+    [{'level': 2, 'id': 'введение', 'title': 'Введение'}, ...]
+"""
+import logging
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+from django.utils.html import linebreaks
+from django.utils.text import slugify
+
+try:
+    import markdown
+except ImportError:  # Необязательная зависимость: без нее Markdown выводится как обычный текст
+    markdown = None
+
+logger = logging.getLogger('courses.content')
+
+MARKDOWN_EXTENSIONS = ['tables', 'fenced_code', 'sane_lists']
+
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b', 'em', 'i', 'u', 's', 'del',
+    'sub', 'sup', 'code', 'pre', 'blockquote', 'ul', 'ol', 'li', 'a', 'img',
+    'table', 'thead', 'tbody', 'tr', 'th', 'td',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title'},
+    'ol': {'start'},
+    'th': {'colspan', 'rowspan'},
+    'td': {'colspan', 'rowspan'},
+}
+URL_ATTRIBUTES = {'href': {'', 'http', 'https', 'mailto'}, 'src': {'', 'http', 'https'}}
+VOID_TAGS = {'br', 'hr', 'img'}
+# Теги, содержимое которых отбрасывается целиком
+DROPPED_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'template', 'noscript', 'textarea', 'title'}
+# h1 на странице урока - название урока, заголовки текста начинаются с h2
+RENAMED_TAGS = {'h1': 'h2'}
+TOC_TAGS = {'h2': 2, 'h3': 3}
+
+WORD_RE = re.compile(r'\w+')
+# Пробелы и управляющие символы, которыми маскируют javascript: в ссылках
+URL_JUNK_RE = re.compile(r'[\x00-\x20\x7f]+')
+
+
+class ContentBuilder(HTMLParser):
+    """Пересобирает HTML из разрешенных тегов, собирая оглавление и число слов"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+        self.dropped = 0
+        self.toc = []
+        self.ids = set()
+        self.heading = None
+        self.word_count = 0
+
+    def handle_starttag(self, tag, attrs):
+        tag = RENAMED_TAGS.get(tag, tag)
+        if tag in DROPPED_TAGS:
+            self.dropped += 1
+            return
+        if self.dropped or tag not in ALLOWED_TAGS:
+            return
+        attrs = self.clean_attributes(tag, attrs)
+        if tag in TOC_TAGS and self.heading is None:
+            # id заголовка известен только после его текста - место тега заполняется в finish_heading
+            self.heading = {'tag': tag, 'index': len(self.parts), 'text': []}
+            self.parts.append('')
+        else:
+            self.parts.append(self.start_tag(tag, attrs))
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        tag = RENAMED_TAGS.get(tag, tag)
+        if tag in DROPPED_TAGS:
+            self.dropped = max(self.dropped - 1, 0)
+            return
+        if self.dropped or tag not in self.open_tags:
+            return
+        # Незакрытые вложенные теги закрываются вместе с внешним
+        while self.open_tags:
+            open_tag = self.open_tags.pop()
+            self.parts.append(f'</{open_tag}>')
+            if self.heading is not None and open_tag == self.heading['tag'] and open_tag not in self.open_tags:
+                self.finish_heading()
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropped:
+            return
+        self.word_count += len(WORD_RE.findall(data))
+        if self.heading is not None:
+            self.heading['text'].append(data)
+        self.parts.append(escape(data, quote=False))
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.handle_endtag(self.open_tags[-1])
+
+    def finish_heading(self):
+        heading, self.heading = self.heading, None
+        title = ' '.join(''.join(heading['text']).split())
+        anchor = base = slugify(title, allow_unicode=True) or 'section'
+        number = 1
+        while anchor in self.ids:
+            number += 1
+            anchor = f'{base}-{number}'
+        self.ids.add(anchor)
+        self.parts[heading['index']] = self.start_tag(heading['tag'], [('id', anchor)])
+        if title:
+            self.toc.append({'level': TOC_TAGS[heading['tag']], 'id': anchor, 'title': title})
+
+    def clean_attributes(self, tag, attrs):
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        cleaned = []
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES:
+                value = URL_JUNK_RE.sub('', value)
+                if urlsplit(value).scheme.lower() not in URL_ATTRIBUTES[name]:
+                    continue
+            cleaned.append((name, value))
+        return cleaned
+
+    def start_tag(self, tag, attrs):
+        attributes = ''.join(f' {name}="{escape(value)}"' for name, value in attrs)
+        return f'<{tag}{attributes}>'
+
+
+def render_content(text, content_format='text'):
+    """Очищенный HTML урока, оглавление и число слов"""
+    if content_format == 'markdown' and markdown is not None:
+        html = markdown.markdown(text, extensions=MARKDOWN_EXTENSIONS)
+    elif content_format == 'html':
+        html = text
+    else:
+        if content_format == 'markdown':
+            logger.warning('Пакет markdown не установлен - урок выводится как обычный текст')
+        html = linebreaks(text, autoescape=True)
+
+    builder = ContentBuilder()
+    builder.feed(html)
+    builder.close()
+    return ''.join(builder.parts), builder.toc, builder.word_count
+
+
+def render_lessons(queryset, batch_size=500):
+    """Компилирует уроки queryset пачками (bulk_update); возвращает количество"""
+    fields = ['content_html', 'toc', 'word_count']
+    total = 0
+    batch = []
+    for lesson in queryset.only('pk', 'content', 'content_format').iterator(chunk_size=batch_size):
+        lesson.render_content()
+        batch.append(lesson)
+        if len(batch) >= batch_size:
+            queryset.model.objects.bulk_update(batch, fields)
+            total += len(batch)
+            batch = []
+    if batch:
+        queryset.model.objects.bulk_update(batch, fields)
+        total += len(batch)
+    return total
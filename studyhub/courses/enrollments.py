@@ -0,0 +1,91 @@
+"""
+Проверка записи пользователя на курс.
+
+ID курсов, на которые записан пользователь, загружаются одним запросом
+в отсортированный кортеж и кэшируются между запросами. Кэш сбрасывается
+сигналами post_save/post_delete модели Enrollment (см. signals.py).
+Для асинхронных представлений - aget_enrolled_course_ids и ais_enrolled.
+"""
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .models import Enrollment
+
+ENROLLED_IDS_KEY = 'courses:enrolled_ids:{}'
+ENROLLED_IDS_TIMEOUT = 60 * 60
+
+# Атрибут, в котором ID запоминаются на объекте пользователя на время запроса
+_USER_ATTR = '_enrolled_course_ids'
+
+
+def get_enrolled_course_ids(user):
+    """Отсортированный кортеж ID курсов, на которые записан пользователь"""
+    if not user.is_authenticated:
+        return ()
+
+    course_ids = getattr(user, _USER_ATTR, None)
+    if course_ids is not None:
+        return course_ids
+
+    key = ENROLLED_IDS_KEY.format(user.pk)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = tuple(sorted(
+            Enrollment.objects.filter(user=user).values_list('course_id', flat=True)
+        ))
+        cache.set(key, course_ids, ENROLLED_IDS_TIMEOUT)
+
+    setattr(user, _USER_ATTR, course_ids)
+    return course_ids
+
+
+async def aget_enrolled_course_ids(user):
+    """Асинхронный вариант get_enrolled_course_ids"""
+    if not user.is_authenticated:
+        return ()
+
+    course_ids = getattr(user, _USER_ATTR, None)
+    if course_ids is not None:
+        return course_ids
+
+    key = ENROLLED_IDS_KEY.format(user.pk)
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        course_ids = tuple(sorted([
+            course_id async for course_id
+            in Enrollment.objects.filter(user=user).values_list('course_id', flat=True)
+        ]))
+        await cache.aset(key, course_ids, ENROLLED_IDS_TIMEOUT)
+
+    setattr(user, _USER_ATTR, course_ids)
+    return course_ids
+
+
+def _contains(course_ids, course):
+    course_id = getattr(course, 'pk', course)
+    index = bisect_left(course_ids, course_id)
+    return index < len(course_ids) and course_ids[index] == course_id
+
+
+def is_enrolled(user, course):
+    """Записан ли пользователь на курс (принимает курс или его ID)"""
+    return _contains(get_enrolled_course_ids(user), course)
+
+
+async def ais_enrolled(user, course):
+    """Асинхронный вариант is_enrolled"""
+    return _contains(await aget_enrolled_course_ids(user), course)
+
+
+def invalidate_enrolled_course_ids(enrollment):
+    """Сбрасывает кэш записей пользователя после изменения Enrollment"""
+    cache.delete(ENROLLED_IDS_KEY.format(enrollment.user_id))
+
+    # Если объект пользователя уже загружен (обычно это request.user),
+    # сбрасываем и значение, запомненное на нем в рамках запроса
+    user_field = Enrollment._meta.get_field('user')
+    if user_field.is_cached(enrollment):
+        user = enrollment.user
+        if getattr(user, _USER_ATTR, None) is not None:
+            delattr(user, _USER_ATTR)
@@ -0,0 +1,209 @@
+"""
+События для пользователей в реальном времени (Server-Sent Events).
+
+Событие публикуется в канал, например progress_channel(user.pk).
+EventBus доставляет его подписчикам своего процесса - открытым потокам
+event_stream (см. ProgressStreamView). Между процессами события передает
+брокер из настройки EVENT_BROKER:
+- LocalBroker - без внешних сервисов, только внутри процесса
+  (разработка, один воркер);
+- RedisBroker - Redis pub/sub (REDIS_URL): событие получают все воркеры.
+
+    bus.publish(progress_channel(user.pk), 'progress', {'lesson_id': 1, ...})
+
+    subscription = bus.subscribe(progress_channel(user.pk))
+    message = await subscription.get(timeout=15)
+
+Каждое событие прогресса содержит полные значения (а не изменения),
+поэтому потерянное событие исправляется следующим.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger('courses.events')
+
+# Сколько событий копится для медленного клиента, прежде чем старые отбрасываются
+SUBSCRIBER_QUEUE_SIZE = 100
+# Через сколько миллисекунд браузер переподключается после разрыва
+RETRY_MS = 3000
+
+
+def progress_channel(user_id):
+    """Канал событий прогресса пользователя"""
+    return f'progress:{user_id}'
+
+
+class Subscription:
+    """Очередь событий одного подписчика; принадлежит циклу событий, в котором создана"""
+
+    def __init__(self, bus, channel, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.bus = bus
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize)
+
+    def put(self, message):
+        # Вызывается только в цикле событий подписчика
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Следующее сообщение {'event': ..., 'data': ...} или None, если за timeout секунд их не было"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class EventBus:
+    """Подписки процесса на каналы и публикация через брокер"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = {}
+        self._broker = None
+
+    @property
+    def broker(self):
+        if self._broker is None:
+            self._broker = import_string(getattr(settings, 'EVENT_BROKER', 'courses.events.LocalBroker'))(self)
+        return self._broker
+
+    def subscribe(self, channel):
+        """Подписка на канал; вызывается из асинхронного кода"""
+        self.broker.listen()
+        subscription = Subscription(self, channel)
+        with self.lock:
+            self.subscriptions.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[subscription.channel]
+
+    def publish(self, channel, event, data):
+        """Отправляет событие подписчикам канала во всех процессах"""
+        self.broker.publish(channel, {'event': event, 'data': data})
+
+    async def apublish(self, channel, event, data):
+        # Брокер может ходить в сеть - не блокируем цикл событий
+        await sync_to_async(self.publish, thread_sensitive=False)(channel, event, data)
+
+    def deliver(self, channel, message):
+        """Доставляет сообщение подписчикам этого процесса; можно вызывать из любого потока"""
+        with self.lock:
+            subscribers = list(self.subscriptions.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.put, message)
+            except RuntimeError:
+                # Цикл событий подписчика уже закрыт
+                self.unsubscribe(subscription)
+
+    def reset(self):
+        """Сбрасывает подписки и брокер (тесты, смена настроек)"""
+        with self.lock:
+            self.subscriptions.clear()
+            self._broker = None
+
+
+class LocalBroker:
+    """Брокер без внешних сервисов: события доставляются только внутри процесса"""
+
+    def __init__(self, bus):
+        self.bus = bus
+
+    def listen(self):
+        pass
+
+    def publish(self, channel, message):
+        self.bus.deliver(channel, message)
+
+
+class RedisBroker:
+    """
+    Redis pub/sub: событие публикуется в Redis, а каждый процесс слушает
+    каналы в фоновом потоке и передает события своим подписчикам.
+    """
+
+    PREFIX = 'studyhub:events:'
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, bus, url=None):
+        # Пакет redis нужен только вместе с REDIS_URL - как и для кэша Redis
+        import redis
+
+        self.bus = bus
+        self.client = redis.Redis.from_url(url or settings.REDIS_URL)
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def listen(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='studyhub-events', daemon=True)
+                self.thread.start()
+
+    def publish(self, channel, message):
+        self.client.publish(self.PREFIX + channel, json.dumps(message))
+
+    def run(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.PREFIX + '*')
+                for item in pubsub.listen():
+                    channel = item['channel'].decode()[len(self.PREFIX):]
+                    self.bus.deliver(channel, json.loads(item['data']))
+            except Exception as error:
+                logger.warning('Брокер событий Redis недоступен: %s', error)
+                time.sleep(self.RECONNECT_DELAY)
+
+
+def format_event(message):
+    """Сообщение в формате text/event-stream"""
+    data = json.dumps(message['data'], ensure_ascii=False)
+    return f"event: {message['event']}\ndata: {data}\n\n"
+
+
+async def event_stream(channel, keepalive=None, max_duration=None):
+    """
+    Асинхронный генератор для StreamingHttpResponse: события канала
+    в формате text/event-stream. Пока событий нет, раз в keepalive секунд
+    отправляется комментарий, чтобы прокси не закрыли соединение.
+    Через max_duration секунд поток завершается, и браузер (EventSource)
+    переподключается - так соединения не копятся бесконечно.
+    """
+    keepalive = keepalive or getattr(settings, 'EVENT_STREAM_KEEPALIVE', 15)
+    max_duration = max_duration or getattr(settings, 'EVENT_STREAM_MAX_DURATION', 300)
+    deadline = time.monotonic() + max_duration
+
+    subscription = bus.subscribe(channel)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        while (remaining := deadline - time.monotonic()) > 0:
+            message = await subscription.get(timeout=min(keepalive, remaining))
+            if message is None:
+                yield ': keepalive\n\n'
+            else:
+                yield format_event(message)
+    finally:
+        subscription.close()
+
+
+bus = EventBus()
@@ -249,6 +249,7 @@ class ReviewForm(forms.ModelForm):
 from django import forms
 from django.core.exceptions import ValidationError
 from .models import Enrollment, Course
+from .enrollments import get_enrolled_course_ids, is_enrolled
 
 class EnrollmentForm(forms.ModelForm):
     class Meta:
@@ -267,9 +268,7 @@ class EnrollmentForm(forms.ModelForm):
         
         # Фильтруем только опубликованные курсы, на которые пользователь еще не записан
         if self.user:
-            enrolled_courses = Enrollment.objects.filter(
-                user=self.user
-            ).values_list('course_id', flat=True)
+            enrolled_courses = get_enrolled_course_ids(self.user)
             self.fields['course'].queryset = Course.objects.filter(
                 is_published=True
             ).exclude(id__in=enrolled_courses)
@@ -280,7 +279,7 @@ class EnrollmentForm(forms.ModelForm):
         
         if self.user and course:
             # Проверка, не записан ли уже пользователь на этот курс
-            if Enrollment.objects.filter(user=self.user, course=course).exists():
+            if is_enrolled(self.user, course):
                 raise ValidationError('Вы уже записаны на этот курс!')
         
         return cleaned_data
@@ -363,6 +362,7 @@ class ProfileForm(forms.ModelForm):
         
         return birth_date
     
+from . import content
 from .models import Module, Lesson
 
 class ModuleForm(forms.ModelForm):
@@ -398,11 +398,12 @@ class LessonForm(forms.ModelForm):
     """
     class Meta:
         model = Lesson
-        fields = ['title', 'content', 'order', 'duration_minutes', 'is_published']
+        fields = ['title', 'content', 'content_format', 'order', 'duration_minutes', 'is_published']
         
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'content': forms.Textarea(attrs={'class': 'form-control', 'rows': 10}),
+            'content_format': forms.Select(attrs={'class': 'form-select'}),
             'order': forms.NumberInput(attrs={'class': 'form-control'}),
             'duration_minutes': forms.NumberInput(attrs={'class': 'form-control'}),
         }
@@ -410,10 +411,18 @@ class LessonForm(forms.ModelForm):
         labels = {
             'title': 'Название урока',
             'content': 'Содержание урока',
+            'content_format': 'Формат содержания',
             'order': 'Порядковый номер',
             'duration_minutes': 'Продолжительность (минут)',
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Без пакета markdown такой урок выводился бы обычным текстом - формат не предлагаем
+        if content.markdown is None:
+            field = self.fields['content_format']
+            field.choices = [choice for choice in field.choices if choice[0] != 'markdown']
+
 
 class CourseRecommendationForm(forms.Form):
     """
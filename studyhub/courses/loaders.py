@@ -0,0 +1,117 @@
+"""
+Пакетная загрузка объектов по ключам в духе DataLoader.
+
+Код запрашивает объекты по одному (loader.load(pk)), а загрузчик копит
+ключи и загружает их одним запросом при первом обращении к любому из
+значений. Загруженные значения запоминаются: повторные ключи в пределах
+загрузчика в базу не уходят. Загрузчик живет один запрос
+(course_loader(request)) и общий для всего рендера страницы, поэтому
+данные не устаревают, а курс, который выводится в нескольких блоках
+(популярные и бесплатные курсы главной), загружается один раз.
+
+    loader = course_loader(request)
+    first, second = loader.load(1), loader.load(2)   # запросов нет
+    first.title                                       # один запрос id__in=(1, 2)
+    loader.load_many([2, 3])                          # запрос только для 3
+"""
+from django.urls import reverse
+from django.utils.functional import SimpleLazyObject
+
+from .models import Course
+
+# Максимум ключей в одном запросе id__in
+MAX_BATCH_SIZE = 500
+
+# Атрибут запроса, в котором хранится загрузчик курсов
+_REQUEST_ATTR = '_course_loader'
+
+
+class DataLoader:
+    """
+    Копит ключи и загружает их пачками через batch_load(keys) -> {key: value}.
+    Ключ, которого нет в результате batch_load, получает значение None.
+    """
+
+    def __init__(self, batch_load, max_batch_size=MAX_BATCH_SIZE):
+        self.batch_load = batch_load
+        self.max_batch_size = max_batch_size
+        self.cache = {}
+        # Ключи, ожидающие загрузки (dict - упорядоченное множество)
+        self.queue = {}
+        self.batches = 0
+
+    def load(self, key):
+        """Отложенное значение: загружается вместе со всеми ключами очереди при первом обращении"""
+        if key not in self.cache:
+            self.queue[key] = None
+        return SimpleLazyObject(lambda: self.get(key))
+
+    def get(self, key):
+        """Значение по ключу; загружает очередь, если значения еще нет"""
+        if key not in self.cache:
+            self.queue[key] = None
+            self.dispatch()
+        return self.cache[key]
+
+    def load_many(self, keys):
+        """Значения по ключам в том же порядке (одна загрузка на всю очередь)"""
+        keys = list(keys)
+        for key in keys:
+            if key not in self.cache:
+                self.queue[key] = None
+        self.dispatch()
+        return [self.cache[key] for key in keys]
+
+    def dispatch(self):
+        """Загружает все ключи очереди пачками по max_batch_size"""
+        keys = [key for key in self.queue if key not in self.cache]
+        self.queue.clear()
+        for start in range(0, len(keys), self.max_batch_size):
+            batch = keys[start:start + self.max_batch_size]
+            values = self.batch_load(batch)
+            self.batches += 1
+            for key in batch:
+                self.cache[key] = values.get(key)
+
+    def prime(self, key, value):
+        """Запоминает уже загруженное значение (например, из другого запроса)"""
+        self.cache.setdefault(key, value)
+
+    def clear(self, key=None):
+        """Забывает значение ключа (или все значения) после изменения объекта"""
+        if key is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(key, None)
+
+
+def course_card(course):
+    """Карточка курса для API: автор, категория и денормализованный рейтинг"""
+    return {
+        'id': course.pk,
+        'title': course.title,
+        'description': course.description,
+        'price': course.price,
+        'is_free': course.is_free,
+        'level': course.level,
+        'duration_hours': course.duration_hours,
+        'author': {'id': course.author_id, 'username': course.author.username},
+        'category': {'id': course.category_id, 'name': course.category.name} if course.category else None,
+        'average_rating': course.average_rating,
+        'review_count': course.review_count,
+        'url': reverse('course_detail', args=[course.pk]),
+    }
+
+
+def load_courses(course_ids):
+    """Опубликованные курсы для карточек одним запросом: {id: курс}"""
+    return {course.pk: course for course in Course.objects.cards().filter(pk__in=course_ids, is_published=True)}
+
+
+def course_loader(request):
+    """Загрузчик курсов на время запроса - общий для представления и шаблонов"""
+    loader = getattr(request, _REQUEST_ATTR, None)
+    if loader is None:
+        loader = DataLoader(load_courses)
+        setattr(request, _REQUEST_ATTR, loader)
+    return loader
@@ -0,0 +1,361 @@
+"""
+Нагрузочное тестирование по сценариям пользователей (`manage.py loadtest`).
+
+Виртуальные пользователи работают по замкнутому циклу: каждый проходит
+свой сценарий шаг за шагом, дожидаясь ответа сервера, и сразу (или после
+паузы think time) начинает сценарий заново. Поэтому нагрузка задается
+числом одновременных пользователей, а пропускная способность измеряется.
+
+Сценарии (роли):
+- visitor - аноним: главная, каталог, фильтр, поиск, страница курса;
+- student - записывается на бесплатный курс, читает уроки по порядку
+  и отмечает их пройденными;
+- buyer - добавляет платные курсы в корзину и оформляет заказ;
+- tutor - открывает и сохраняет форму редактирования своего модуля.
+
+Студенты, покупатели и преподаватели входят под пользователями из
+generate_load_data, ID курсов и уроков берутся из той же базы, с которой
+работает сервер. Тест меняет данные (записи, прогресс, заказы).
+
+HTTP-клиент - httpx (pip install httpx), импортируется только при запуске.
+"""
+import asyncio
+import random
+import time
+from collections import Counter, defaultdict
+
+from django.contrib.auth.models import User
+from django.db.models import Count
+from django.urls import reverse
+
+from .metrics import percentile
+from .models import Course, Lesson, Module
+
+ROLES = ('visitor', 'student', 'buyer', 'tutor')
+DEFAULT_MIX = {'visitor': 50, 'student': 30, 'buyer': 15, 'tutor': 5}
+SEARCH_TERMS = ['Python', 'Django', 'SQL', 'Docker', 'React', 'Алгоритмы', 'дизайн', 'Go']
+LEVELS = ['beginner', 'middle', 'advanced']
+
+# Сколько курсов каждого вида брать из базы для сценариев
+PLAN_COURSES = 200
+# Пауза после ошибки шага, секунд
+ERROR_PAUSE = 0.05
+
+
+class JourneyAborted(Exception):
+    """Шаг завершился ошибкой - сценарий начинается заново"""
+
+
+class LoadPlan:
+    """Пользователи и объекты из базы, с которыми работают сценарии"""
+
+    def __init__(self, prefix='load', password='load12345'):
+        self.password = password
+        self.students = list(
+            User.objects.filter(username__startswith=f'{prefix}_student_')
+            .order_by('pk').values_list('username', flat=True)[:1000]
+        )
+        published = Course.objects.filter(is_published=True)
+        self.course_ids = list(published.order_by('pk').values_list('pk', flat=True)[:PLAN_COURSES])
+        self.category_ids = list(
+            published.exclude(category=None).values_list('category_id', flat=True).distinct()
+        )
+        self.paid_course_ids = list(
+            published.filter(is_free=False).order_by('pk').values_list('pk', flat=True)[:PLAN_COURSES]
+        )
+
+        # Бесплатные курсы с уроками по порядку: {курс: [(модуль, урок), ...]}
+        free_ids = list(
+            published.filter(is_free=True).annotate(lessons_count=Count('modules__lessons'))
+            .filter(lessons_count__gt=0).order_by('pk').values_list('pk', flat=True)[:PLAN_COURSES]
+        )
+        self.free_lessons = defaultdict(list)
+        lessons = (
+            Lesson.objects.filter(module__course_id__in=free_ids)
+            .order_by('module__course_id', 'module__order', 'order')
+            .values_list('module__course_id', 'module_id', 'pk')
+        )
+        for course_id, module_id, lesson_id in lessons:
+            self.free_lessons[course_id].append((module_id, lesson_id))
+
+        # Модули преподавателей: {логин: [(курс, модуль, название, описание, порядок), ...]}
+        self.tutor_modules = defaultdict(list)
+        modules = (
+            Module.objects.filter(course__author__username__startswith=f'{prefix}_tutor_')
+            .order_by('course__author_id', 'pk')
+            .values_list('course__author__username', 'course_id', 'pk', 'title', 'description', 'order')
+        )
+        for username, *module in modules:
+            if len(self.tutor_modules[username]) < 20:
+                self.tutor_modules[username].append(tuple(module))
+        self.tutors = sorted(self.tutor_modules)
+
+    def check(self, mix):
+        """Ошибки плана для выбранных ролей"""
+        problems = []
+        if not self.course_ids:
+            problems.append('нет опубликованных курсов')
+        if mix.get('student') and not (self.students and self.free_lessons):
+            problems.append('для student нужны студенты и бесплатные курсы с уроками')
+        if mix.get('buyer') and not (self.students and self.paid_course_ids):
+            problems.append('для buyer нужны студенты и платные курсы')
+        if mix.get('tutor') and not self.tutors:
+            problems.append('для tutor нужны преподаватели с модулями')
+        return problems
+
+
+class StepStats:
+    def __init__(self):
+        self.durations = []
+        self.errors = Counter()
+
+    def summary(self, elapsed):
+        count = len(self.durations)
+        error_count = sum(self.errors.values())
+        durations = [duration * 1000 for duration in self.durations]
+        return {
+            'count': count,
+            'rps': round(count / elapsed, 2) if elapsed else 0.0,
+            'errors': error_count,
+            'error_rate': round(error_count / count, 4) if count else 0.0,
+            'error_kinds': dict(self.errors),
+            'p50_ms': round(percentile(durations, 50), 1),
+            'p95_ms': round(percentile(durations, 95), 1),
+            'p99_ms': round(percentile(durations, 99), 1),
+            'max_ms': round(max(durations), 1) if durations else 0.0,
+        }
+
+
+class LoadStats:
+    """Время и ошибки по шагам сценариев за одну ступень нагрузки"""
+
+    def __init__(self):
+        self.steps = defaultdict(StepStats)
+        self.journeys = Counter()
+
+    def record(self, step, duration, error=None):
+        stats = self.steps[step]
+        stats.durations.append(duration)
+        if error:
+            stats.errors[error] += 1
+
+    def summary(self, concurrency, elapsed):
+        total = StepStats()
+        for stats in self.steps.values():
+            total.durations.extend(stats.durations)
+            total.errors.update(stats.errors)
+        return {
+            'concurrency': concurrency,
+            'elapsed': round(elapsed, 2),
+            'journeys': dict(self.journeys),
+            'total': total.summary(elapsed),
+            'steps': {name: stats.summary(elapsed) for name, stats in sorted(self.steps.items())},
+        }
+
+
+def parse_mix(value):
+    """'visitor=50,student=30' -> {'visitor': 50, 'student': 30}"""
+    mix = {}
+    for part in filter(None, value.split(',')):
+        role, _, weight = part.partition('=')
+        role = role.strip()
+        if role not in ROLES:
+            raise ValueError(f'Неизвестная роль: {role}')
+        mix[role] = int(weight or 1)
+    if not any(mix.values()):
+        raise ValueError('Нужна хотя бы одна роль с ненулевым весом')
+    return mix
+
+
+def assign_roles(concurrency, mix):
+    """Роли для пользователей ступени по весам (детерминированно)"""
+    roles = [role for role in ROLES if mix.get(role)]
+    total = sum(mix[role] for role in roles)
+    result = []
+    for index in range(concurrency):
+        point = (index + 0.5) / concurrency * total
+        for role in roles:
+            point -= mix[role]
+            if point < 0:
+                result.append(role)
+                break
+    return result
+
+
+class VirtualUser:
+    """Один пользователь со своим HTTP-клиентом (cookie, сессия) и сценарием"""
+
+    def __init__(self, index, role, plan, client, think_time=0.0, seed=0):
+        self.index = index
+        self.role = role
+        self.plan = plan
+        self.client = client
+        self.think_time = think_time
+        self.rnd = random.Random(seed * 100003 + index)
+        self.logged_in = False
+        self.stats = None
+
+    async def run(self, stats, deadline):
+        self.stats = stats
+        loop = asyncio.get_running_loop()
+        journey = getattr(self, f'journey_{self.role}')
+        while loop.time() < deadline:
+            try:
+                if self.role != 'visitor' and not self.logged_in:
+                    await self.login()
+                await journey()
+                stats.journeys[self.role] += 1
+            except JourneyAborted:
+                # Короткая пауза, чтобы недоступный сервер не превращался в цикл без ожидания
+                await asyncio.sleep(ERROR_PAUSE)
+            if self.think_time:
+                await asyncio.sleep(self.rnd.uniform(0, 2 * self.think_time))
+
+    async def step(self, name, method, url, expect=(200,), data=None):
+        import httpx
+
+        headers = {}
+        if method == 'POST':
+            headers['X-CSRFToken'] = self.client.cookies.get('csrftoken', '')
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, data=data, headers=headers)
+        except httpx.TimeoutException:
+            self.stats.record(name, time.perf_counter() - started, 'timeout')
+            raise JourneyAborted
+        except httpx.HTTPError as error:
+            self.stats.record(name, time.perf_counter() - started, type(error).__name__)
+            raise JourneyAborted
+        duration = time.perf_counter() - started
+
+        if response.status_code not in expect:
+            self.stats.record(name, duration, str(response.status_code))
+            if response.status_code == 302 and '/login/' in response.headers.get('location', ''):
+                # Сессия потеряна - войти заново
+                self.logged_in = False
+            raise JourneyAborted
+        self.stats.record(name, duration)
+        return response
+
+    def username(self):
+        if self.role == 'tutor':
+            return self.plan.tutors[self.index % len(self.plan.tutors)]
+        students = self.plan.students
+        # Покупатели берут студентов с конца списка, чтобы не делить учетные записи со student
+        if self.role == 'buyer':
+            return students[-1 - self.index % len(students)]
+        return students[self.index % len(students)]
+
+    async def login(self):
+        url = reverse('login')
+        await self.step('login_form', 'GET', url)
+        await self.step('login', 'POST', url, expect=(302,), data={
+            'username': self.username(), 'password': self.plan.password,
+        })
+        self.logged_in = True
+
+    async def journey_visitor(self):
+        plan, rnd = self.plan, self.rnd
+        await self.step('home', 'GET', reverse('home'))
+        await self.step('catalog', 'GET', reverse('course_list'))
+        if plan.category_ids and rnd.random() < 0.5:
+            query = f'?category={rnd.choice(plan.category_ids)}'
+        else:
+            query = f'?level={rnd.choice(LEVELS)}'
+        await self.step('catalog_filter', 'GET', reverse('course_list') + query)
+        await self.step('search', 'GET', reverse('course_search') + f'?q={rnd.choice(SEARCH_TERMS)}')
+        await self.step('course_detail', 'GET', reverse('course_detail', args=[rnd.choice(plan.course_ids)]))
+
+    async def journey_student(self, lessons_per_journey=3):
+        plan, rnd = self.plan, self.rnd
+        course_id = rnd.choice(list(plan.free_lessons))
+        await self.step('my_courses', 'GET', reverse('my_courses'))
+        await self.step('enroll', 'POST', reverse('quick_enroll', args=[course_id]), expect=(302,))
+        await self.step('course_detail', 'GET', reverse('course_detail', args=[course_id]))
+
+        lessons = plan.free_lessons[course_id]
+        start = rnd.randrange(len(lessons))
+        for module_id, lesson_id in lessons[start:start + lessons_per_journey]:
+            url = reverse('lesson_detail', kwargs={
+                'course_pk': course_id, 'module_pk': module_id, 'lesson_pk': lesson_id,
+            })
+            await self.step('lesson', 'GET', url)
+            await self.step('lesson_complete', 'POST', reverse('mark_lesson_completed'), data={
+                'lesson_id': lesson_id, 'completed': 'true',
+            })
+
+    async def journey_buyer(self):
+        plan, rnd = self.plan, self.rnd
+        for course_id in rnd.sample(plan.paid_course_ids, min(2, len(plan.paid_course_ids))):
+            await self.step('course_detail', 'GET', reverse('course_detail', args=[course_id]))
+            await self.step('add_to_cart', 'POST', reverse('add_to_cart', args=[course_id]), expect=(302,))
+        await self.step('cart', 'GET', reverse('cart'))
+        await self.step('checkout_form', 'GET', reverse('checkout'))
+        await self.step('checkout', 'POST', reverse('checkout'), expect=(302,))
+        await self.step('orders', 'GET', reverse('orders_history'))
+
+    async def journey_tutor(self):
+        modules = self.plan.tutor_modules[self.username()]
+        course_id, module_id, title, description, order = self.rnd.choice(modules)
+        url = reverse('module_edit', kwargs={'course_pk': course_id, 'module_pk': module_id})
+        await self.step('my_courses', 'GET', reverse('my_courses'))
+        await self.step('module_edit_form', 'GET', url)
+        await self.step('module_edit', 'POST', url, expect=(302,), data={
+            'title': title, 'description': description, 'order': order,
+        })
+
+
+class LoadTest:
+    """
+    Ступени нагрузки с общим набором виртуальных пользователей:
+    пользователь, вошедший на одной ступени, остается в системе на следующих.
+    """
+
+    def __init__(self, base_url, plan, mix=None, think_time=0.0, timeout=30.0, seed=42):
+        self.base_url = base_url.rstrip('/')
+        self.plan = plan
+        self.mix = mix or DEFAULT_MIX
+        self.think_time = think_time
+        self.timeout = timeout
+        self.seed = seed
+        self.users = []
+        self.clients = []
+
+    def get_users(self, concurrency):
+        import httpx
+
+        users = []
+        counters = Counter()
+        for role in assign_roles(concurrency, self.mix):
+            # Номер пользователя внутри роли: на всех ступенях одни и те же учетные записи
+            users.append((role, counters[role]))
+            counters[role] += 1
+
+        result = []
+        for role, index in users:
+            user = next((user for user in self.users if user.role == role and user.index == index), None)
+            if user is None:
+                client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, follow_redirects=False)
+                user = VirtualUser(index, role, self.plan, client, self.think_time, self.seed)
+                self.users.append(user)
+                self.clients.append(client)
+            result.append(user)
+        return result
+
+    async def run_level(self, concurrency, duration):
+        users = self.get_users(concurrency)
+        stats = LoadStats()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(user.run(stats, started + duration) for user in users))
+        return stats.summary(concurrency, loop.time() - started)
+
+    async def close(self):
+        for client in self.clients:
+            await client.aclose()
+
+
+def is_overloaded(summary, max_error_rate=0.01, max_p95_ms=2000.0):
+    """Ступень считается перегрузкой, если ошибок или задержек больше допустимого"""
+    total = summary['total']
+    return total['error_rate'] > max_error_rate or total['p95_ms'] > max_p95_ms
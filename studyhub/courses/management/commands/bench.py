@@ -0,0 +1,196 @@
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings, setup_databases, teardown_databases
+
+from courses.benchmarks import (
+    SCENARIOS,
+    SIZES,
+    BenchmarkError,
+    compare,
+    environment,
+    generate_data,
+    run_suite,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Тесты производительности основных страниц и сервисов на сгенерированных данных '
+        'нескольких объемов (отдельная тестовая база). Результат сохраняется в JSON и '
+        'сравнивается с базовым прогоном: при регрессии команда завершается с ошибкой'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='*', help='Сценарии (по умолчанию все, см. --list)')
+        parser.add_argument(
+            '--sizes',
+            default='small,medium',
+            help=f'Объемы данных через запятую: {", ".join(SIZES)}',
+        )
+        parser.add_argument('--iterations', type=int, default=30, help='Измеряемых итераций на сценарий')
+        parser.add_argument('--warmup', type=int, default=3, help='Итераций прогрева (не учитываются)')
+        parser.add_argument(
+            '--alloc-iterations', type=int, default=3, help='Итераций измерения памяти (0 - не измерять)',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора данных')
+        parser.add_argument('--output', help='Файл результата (по умолчанию BENCH_DIR/latest.json)')
+        parser.add_argument('--baseline', help='Базовый прогон (по умолчанию BENCH_DIR/baseline.json)')
+        parser.add_argument('--save-baseline', action='store_true', help='Сохранить результат как базовый прогон')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25, help='Допустимый рост времени и памяти (доля, 0.25 = 25%%)',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=2.0, help='Меньший рост времени не считается регрессией',
+        )
+        parser.add_argument('--list', action='store_true', help='Показать сценарии и объемы данных')
+
+    def handle(self, *args, **options):
+        if options['list']:
+            self.print_scenarios()
+            return
+
+        sizes = [size.strip() for size in options['sizes'].split(',') if size.strip()]
+        unknown = [size for size in sizes if size not in SIZES]
+        if unknown:
+            raise CommandError(f'Неизвестные объемы: {", ".join(unknown)}. Доступны: {", ".join(SIZES)}')
+        unknown = [name for name in options['scenarios'] if name not in SCENARIOS]
+        if unknown:
+            raise CommandError(f'Неизвестные сценарии: {", ".join(unknown)}')
+
+        bench_dir = Path(getattr(settings, 'BENCH_DIR', Path(settings.BASE_DIR) / '.bench'))
+        output = Path(options['output']) if options['output'] else bench_dir / 'latest.json'
+        baseline_path = Path(options['baseline']) if options['baseline'] else bench_dir / 'baseline.json'
+
+        report = {
+            'environment': environment(),
+            'settings': {
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'seed': options['seed'],
+            },
+            'sizes': {size: SIZES[size] for size in sizes},
+            'results': self.run_isolated(sizes, options),
+        }
+
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        self.stdout.write(f'Результат: {output}')
+
+        if options['save_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+            self.stdout.write(self.style.SUCCESS(f'Базовый прогон сохранен: {baseline_path}'))
+            return
+
+        if not baseline_path.exists():
+            self.stdout.write(self.style.WARNING(
+                f'Базового прогона нет ({baseline_path}). Сохраните его: manage.py bench --save-baseline'
+            ))
+            return
+        self.check_baseline(json.loads(baseline_path.read_text(encoding='utf-8')), report, options)
+
+    def run_isolated(self, sizes, options):
+        """Прогон в отдельной тестовой базе с кэшем в памяти, без журналов и метрик dev-сервера"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            bench_settings = {
+                'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+                'CACHES': {
+                    'default': {
+                        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                        'LOCATION': 'studyhub-bench',
+                    },
+                    'local': {
+                        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                        'LOCATION': 'studyhub-bench-local',
+                    },
+                },
+                'METRICS_DIR': Path(tmpdir) / 'metrics',
+                'SLOW_QUERY_THRESHOLD_MS': None,
+                'PROFILING_SAMPLE_RATE': 0,
+                # Число запросов выводит сам отчет - QueryBudgetMiddleware не нужен
+                'QUERY_STATS': False,
+            }
+            # SQLite по умолчанию создает тестовую базу в памяти - для замеров нужен файл
+            test_names = {}
+            for alias in connections:
+                settings_dict = connections[alias].settings_dict
+                if connections[alias].vendor == 'sqlite' and not settings_dict['TEST'].get('MIRROR'):
+                    test_names[alias] = settings_dict['TEST'].get('NAME')
+                    settings_dict['TEST']['NAME'] = str(Path(tmpdir) / f'bench-{alias}.sqlite3')
+
+            with override_settings(**bench_settings):
+                old_config = setup_databases(verbosity=0, interactive=False)
+                try:
+                    return {size: self.run_size(size, options) for size in sizes}
+                except BenchmarkError as error:
+                    raise CommandError(str(error))
+                finally:
+                    teardown_databases(old_config, verbosity=0)
+                    for alias, name in test_names.items():
+                        connections[alias].settings_dict['TEST']['NAME'] = name
+
+    def run_size(self, size, options):
+        started = time.perf_counter()
+        generate_data(size, seed=options['seed'])
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nОбъем {size}: данные созданы за {time.perf_counter() - started:.1f} с'
+        ))
+        self.stdout.write(
+            f'  {"Сценарий":<24} {"Вид":<6} {"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9} '
+            f'{"Запросов":>9} {"Память, КБ":>11}'
+        )
+
+        def progress(name, result):
+            memory = '-' if result['alloc_peak_kb'] is None else f'{result["alloc_peak_kb"]:,.0f}'
+            self.stdout.write(
+                f'  {name:<24} {result["kind"]:<6} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                f'{result["p99_ms"]:>9.2f} {result["queries"]:>9} {memory:>11}'
+            )
+
+        return run_suite(
+            options['scenarios'] or None,
+            iterations=options['iterations'],
+            warmup=options['warmup'],
+            alloc_iterations=options['alloc_iterations'],
+            progress=progress,
+        )
+
+    def check_baseline(self, baseline, report, options):
+        base_env, env = baseline.get('environment', {}), report['environment']
+        for key in ('database', 'python', 'django'):
+            if base_env.get(key) != env.get(key):
+                self.stdout.write(self.style.WARNING(
+                    f'Окружение отличается от базового прогона: {key} {base_env.get(key)} -> {env.get(key)}'
+                ))
+
+        regressions = compare(
+            baseline, report, threshold=options['threshold'], min_delta_ms=options['min_delta_ms'],
+        )
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(
+                f'Регрессий нет (базовый прогон от {base_env.get("created_at", "?")})'
+            ))
+            return
+
+        self.stdout.write(self.style.ERROR('Регрессии относительно базового прогона:'))
+        for item in regressions:
+            change = '' if item['change'] is None else f' ({item["change"]:+.1f}%)'
+            self.stdout.write(
+                f'  {item["size"]}/{item["scenario"]}: {item["metric"]} '
+                f'{item["baseline"]} -> {item["current"]}{change}'
+            )
+        raise CommandError(f'Найдено регрессий: {len(regressions)}')
+
+    def print_scenarios(self):
+        self.stdout.write('Сценарии:')
+        for name, (kind, prepare) in SCENARIOS.items():
+            self.stdout.write(f'  {name:<24} {kind}')
+        self.stdout.write('Объемы данных:')
+        for size, scale in SIZES.items():
+            self.stdout.write(f'  {size:<8} ' + ', '.join(f'{key}={value}' for key, value in scale.items()))
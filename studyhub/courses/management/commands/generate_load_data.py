@@ -0,0 +1,358 @@
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from courses.caching import NAMESPACES, bump_namespace_version
+from courses.content import render_content
+from courses.ratings import rating_expressions
+from courses.models import (
+    Category,
+    Course,
+    Enrollment,
+    Lesson,
+    Module,
+    Order,
+    OrderItem,
+    Progress,
+    Review,
+    SupportRequest,
+    UserProfile,
+)
+
+PASSWORD = 'load12345'
+
+TOPICS = [
+    'Python', 'Django', 'JavaScript', 'React', 'SQL', 'PostgreSQL', 'Docker', 'Linux',
+    'Machine Learning', 'Data Science', 'UI/UX дизайн', 'Figma', 'Android', 'iOS',
+    'Kotlin', 'Go', 'Rust', 'Алгоритмы', 'Git', 'DevOps', 'Кибербезопасность', 'Java',
+]
+TITLE_FORMATS = [
+    '{topic} с нуля', '{topic} для профессионалов', 'Практический {topic}',
+    'Интенсив: {topic}', '{topic}: продвинутый уровень', 'Основы {topic}',
+]
+REVIEW_TEXTS = [
+    'Отличный курс, все понятно объяснено.',
+    'Много практики, рекомендую.',
+    'Хороший материал, но хотелось бы больше примеров.',
+    'Курс помог найти работу.',
+    'Слишком быстро для новичков.',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует большой объем данных для нагрузочного тестирования: пользователи, курсы, '
+        'модули, уроки, записи, прогресс, отзывы, заказы и обращения (bulk_create, фиксированный seed)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Количество студентов')
+        parser.add_argument('--tutors', type=int, default=50, help='Количество преподавателей')
+        parser.add_argument('--categories', type=int, default=10, help='Количество категорий')
+        parser.add_argument('--courses', type=int, default=300, help='Количество курсов')
+        parser.add_argument('--modules', type=int, default=6, help='Модулей в курсе')
+        parser.add_argument('--lessons', type=int, default=8, help='Уроков в модуле')
+        parser.add_argument('--enrollments', type=int, default=10, help='Записей на курсы у студента (в среднем)')
+        parser.add_argument(
+            '--progress', type=float, default=0.5,
+            help='Доля уроков курса, по которым у записанного студента есть прогресс (0..1)',
+        )
+        parser.add_argument('--reviews', type=float, default=0.2, help='Доля записей с отзывом (0..1)')
+        parser.add_argument('--orders', type=int, default=3000, help='Количество заказов')
+        parser.add_argument('--support', type=int, default=1000, help='Количество обращений в поддержку')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора случайных чисел')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+        parser.add_argument('--prefix', default='load', help='Префикс имен пользователей и данных')
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Удалить ранее сгенерированные данные с этим префиксом перед созданием',
+        )
+
+    def handle(self, *args, **options):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            raise CommandError('Нужна база, возвращающая ID из bulk_create (PostgreSQL или SQLite 3.35+)')
+
+        self.rnd = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        self.rows = 0
+        self.started = time.perf_counter()
+
+        if options['clear']:
+            self.clear()
+        elif User.objects.filter(username__startswith=f'{self.prefix}_').exists():
+            raise CommandError(
+                f'Данные с префиксом "{self.prefix}" уже есть. Используйте --clear или другой --prefix'
+            )
+
+        students, tutors = self.create_users(options['users'], options['tutors'])
+        categories = self.create_categories(options['categories'])
+        courses = self.create_courses(options['courses'], tutors, categories)
+        lessons_by_course = self.create_structure(courses, options['modules'], options['lessons'])
+        enrollments = self.create_enrollments(students, courses, options['enrollments'])
+        self.create_progress(enrollments, lessons_by_course, options['progress'])
+        self.create_reviews(enrollments, options['reviews'])
+        self.create_orders(students, courses, options['orders'])
+        self.create_support_requests(options['support'])
+
+        # bulk_create не отправляет сигналы - сбрасываем кэш каталога вручную
+        for namespace in NAMESPACES:
+            bump_namespace_version(namespace)
+
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {self.rows:,} строк за {elapsed:.1f} с ({self.rows / elapsed:,.0f} строк/с). '
+            f'Пароль пользователей: {PASSWORD}'
+        ))
+
+    def bulk_create(self, model, objects):
+        """Вставка пачками в одной транзакции"""
+        with transaction.atomic():
+            created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.rows += len(created)
+        return created
+
+    def report(self, label, count):
+        elapsed = time.perf_counter() - self.started
+        self.stdout.write(f'  {label:<22} {count:>12,}   ({elapsed:.1f} с)')
+
+    def clear(self):
+        """Удаляет сгенерированные данные напрямую SQL (без загрузки объектов и сигналов)"""
+        self.stdout.write(self.style.WARNING(f'Удаление данных с префиксом "{self.prefix}"...'))
+        users = f"SELECT id FROM {User._meta.db_table} WHERE username LIKE %s"
+        courses = f"SELECT id FROM {Course._meta.db_table} WHERE author_id IN ({users})"
+        modules = f"SELECT id FROM {Module._meta.db_table} WHERE course_id IN ({courses})"
+        orders = f"SELECT id FROM {Order._meta.db_table} WHERE user_id IN ({users})"
+        user_pattern = f'{self.prefix}\\_%'
+        statements = [
+            (Progress, f'user_id IN ({users})', [user_pattern]),
+            (Progress, f'lesson_id IN (SELECT id FROM {Lesson._meta.db_table} WHERE module_id IN ({modules}))',
+             [user_pattern]),
+            (Review, f'user_id IN ({users}) OR course_id IN ({courses})', [user_pattern, user_pattern]),
+            (Enrollment, f'user_id IN ({users}) OR course_id IN ({courses})', [user_pattern, user_pattern]),
+            (OrderItem, f'order_id IN ({orders}) OR course_id IN ({courses})', [user_pattern, user_pattern]),
+            (Order, f'user_id IN ({users})', [user_pattern]),
+            (Lesson, f'module_id IN ({modules})', [user_pattern]),
+            (Module, f'course_id IN ({courses})', [user_pattern]),
+            (Course, f'author_id IN ({users})', [user_pattern]),
+            (UserProfile, f'user_id IN ({users})', [user_pattern]),
+            (User, "username LIKE %s", [user_pattern]),
+            (Category, "name LIKE %s", [f'% ({self.prefix})']),
+            (SupportRequest, "contact LIKE %s", [user_pattern]),
+        ]
+        # LIKE с экранированием _ одинаково работает в SQLite и PostgreSQL
+        escape = " ESCAPE '\\'"
+        with transaction.atomic(), connection.cursor() as cursor:
+            for model, where, params in statements:
+                where = where.replace('LIKE %s', f'LIKE %s{escape}')
+                cursor.execute(f'DELETE FROM {model._meta.db_table} WHERE {where}', params)
+                if cursor.rowcount:
+                    self.report(f'удалено: {model._meta.model_name}', cursor.rowcount)
+
+    def create_users(self, student_count, tutor_count):
+        # Хэш пароля считается один раз: PBKDF2 на каждого пользователя занял бы минуты
+        password = make_password(PASSWORD)
+        now = timezone.now()
+        users = [
+            User(username=f'{self.prefix}_tutor_{index}', password=password, email=f'{self.prefix}_tutor_{index}@example.com',
+                 first_name='Преподаватель', last_name=str(index), date_joined=now)
+            for index in range(tutor_count)
+        ] + [
+            User(username=f'{self.prefix}_student_{index}', password=password,
+                 email=f'{self.prefix}_student_{index}@example.com', date_joined=now)
+            for index in range(student_count)
+        ]
+        users = self.bulk_create(User, users)
+        tutors, students = users[:tutor_count], users[tutor_count:]
+
+        # Профили обычно создает сигнал post_save, который bulk_create не вызывает
+        self.bulk_create(UserProfile, [
+            UserProfile(user=user, role='tutor' if index < tutor_count else 'student')
+            for index, user in enumerate(users)
+        ])
+        self.report('пользователи', len(users))
+        return students, tutors
+
+    def create_categories(self, count):
+        categories = self.bulk_create(Category, [
+            Category(name=f'{TOPICS[index % len(TOPICS)]} ({self.prefix})', description='Сгенерированная категория')
+            for index in range(count)
+        ])
+        self.report('категории', len(categories))
+        return categories
+
+    def create_courses(self, count, tutors, categories):
+        if not tutors:
+            raise CommandError('Нужен хотя бы один преподаватель (--tutors)')
+        rnd = self.rnd
+        courses = []
+        for index in range(count):
+            topic = rnd.choice(TOPICS)
+            price = Decimal(0) if rnd.random() < 0.3 else Decimal(rnd.randrange(990, 29990, 500))
+            courses.append(Course(
+                title=f'{rnd.choice(TITLE_FORMATS).format(topic=topic)} #{index + 1}',
+                description=f'Курс по теме {topic}: теория, практика и проекты.',
+                full_description=f'Подробная программа курса по теме {topic}. ' * 5,
+                price=price,
+                # bulk_create не вызывает Course.save, который выставляет is_free
+                is_free=price == 0,
+                level=rnd.choice(['beginner', 'middle', 'advanced']),
+                is_popular=rnd.random() < 0.1,
+                author=rnd.choice(tutors),
+                category=rnd.choice(categories) if categories else None,
+                is_published=rnd.random() < 0.9,
+                duration_hours=rnd.randint(4, 120),
+            ))
+        courses = self.bulk_create(Course, courses)
+        self.report('курсы', len(courses))
+        return courses
+
+    def create_structure(self, courses, modules_per_course, lessons_per_course_module):
+        """Модули и уроки; возвращает {course_id: [lesson_id, ...]}"""
+        rnd = self.rnd
+        modules = self.bulk_create(Module, [
+            Module(course=course, title=f'Модуль {order}', description='Содержание модуля', order=order)
+            for course in courses
+            for order in range(1, modules_per_course + 1)
+        ])
+        self.report('модули', len(modules))
+
+        content = 'Учебный материал урока. ' * 40
+        # bulk_create не вызывает Lesson.save, который компилирует содержание
+        content_html, toc, word_count = render_content(content)
+        lessons_by_course = {course.pk: [] for course in courses}
+        lessons = []
+        lesson_count = 0
+        for module in modules:
+            for order in range(1, lessons_per_course_module + 1):
+                lessons.append(Lesson(
+                    module=module,
+                    title=f'Урок {module.order}.{order}',
+                    content=content,
+                    content_html=content_html,
+                    toc=toc,
+                    word_count=word_count,
+                    order=order,
+                    duration_minutes=rnd.randint(5, 60),
+                ))
+            if len(lessons) >= self.batch_size:
+                lesson_count += self.flush_lessons(lessons, lessons_by_course)
+                lessons = []
+        lesson_count += self.flush_lessons(lessons, lessons_by_course)
+        self.report('уроки', lesson_count)
+        return lessons_by_course
+
+    def flush_lessons(self, lessons, lessons_by_course):
+        for lesson in self.bulk_create(Lesson, lessons):
+            lessons_by_course[lesson.module.course_id].append(lesson.pk)
+        return len(lessons)
+
+    def pick_courses(self, courses, weights, count):
+        """Разные курсы с учетом популярности (уникальность пары студент-курс)"""
+        count = min(count, len(courses))
+        picked = {}
+        while len(picked) < count:
+            for course in self.rnd.choices(courses, weights=weights, k=count - len(picked)):
+                picked[course.pk] = course
+        return list(picked.values())
+
+    def create_enrollments(self, students, courses, per_student):
+        rnd = self.rnd
+        published = [course for course in courses if course.is_published]
+        if not published or not per_student:
+            return []
+        # Популярность курсов распределена по закону Ципфа: немногие курсы собирают много записей
+        weights = [1 / (rank + 1) ** 0.8 for rank in range(len(published))]
+
+        enrollments = []
+        total = 0
+        for student in students:
+            count = max(0, int(rnd.gauss(per_student, per_student / 3)))
+            for course in self.pick_courses(published, weights, count):
+                enrollments.append(Enrollment(user=student, course=course, completed=rnd.random() < 0.1))
+        for start in range(0, len(enrollments), self.batch_size * 10):
+            total += len(self.bulk_create(Enrollment, enrollments[start:start + self.batch_size * 10]))
+        self.report('записи на курсы', total)
+        return enrollments
+
+    def create_progress(self, enrollments, lessons_by_course, share):
+        rnd = self.rnd
+        now = timezone.now()
+        batch = []
+        total = 0
+        for enrollment in enrollments:
+            lesson_ids = lessons_by_course[enrollment.course_id]
+            count = int(len(lesson_ids) * min(1.0, rnd.random() * share * 2))
+            # Прогресс идет по порядку уроков - как у настоящих студентов
+            for lesson_id in lesson_ids[:count]:
+                completed = rnd.random() < 0.85
+                batch.append(Progress(
+                    user_id=enrollment.user_id,
+                    lesson_id=lesson_id,
+                    completed=completed,
+                    completed_at=now if completed else None,
+                ))
+            if len(batch) >= self.batch_size * 10:
+                total += len(self.bulk_create(Progress, batch))
+                batch = []
+        if batch:
+            total += len(self.bulk_create(Progress, batch))
+        self.report('прогресс', total)
+
+    def create_reviews(self, enrollments, share):
+        rnd = self.rnd
+        reviews = [
+            Review(
+                course_id=enrollment.course_id,
+                user_id=enrollment.user_id,
+                rating=rnd.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 8, 12])[0],
+                text=rnd.choice(REVIEW_TEXTS),
+            )
+            for enrollment in enrollments
+            if rnd.random() < share
+        ]
+        created = self.bulk_create(Review, reviews)
+        # Рейтинг курса обычно пересчитывает сигнал post_save отзыва
+        Course.objects.filter(pk__in={review.course_id for review in created}).update(**rating_expressions())
+        self.report('отзывы', len(created))
+
+    def create_orders(self, students, courses, count):
+        rnd = self.rnd
+        paid_courses = [course for course in courses if course.is_published and not course.is_free]
+        if not students or not paid_courses or not count:
+            return
+        orders = self.bulk_create(Order, [
+            Order(user=rnd.choice(students), status=rnd.choices(['new', 'paid', 'delivering'], weights=[1, 8, 1])[0])
+            for _ in range(count)
+        ])
+        items = [
+            OrderItem(order=order, course=course, price=course.price)
+            for order in orders
+            for course in rnd.sample(paid_courses, min(len(paid_courses), rnd.randint(1, 3)))
+        ]
+        self.bulk_create(OrderItem, items)
+        self.report('заказы', len(orders))
+        self.report('позиции заказов', len(items))
+
+    def create_support_requests(self, count):
+        rnd = self.rnd
+        now = timezone.now()
+        requests = []
+        for index in range(count):
+            completed = rnd.random() < 0.6
+            requests.append(SupportRequest(
+                name=f'Пользователь {index}',
+                contact=f'{self.prefix}_support_{index}@example.com',
+                message='Не могу найти материалы урока, помогите.',
+                contact_type=rnd.choice(['question', 'technical', 'payment']),
+                status='completed' if completed else 'pending',
+                completed_at=now if completed else None,
+            ))
+        self.report('обращения', len(self.bulk_create(SupportRequest, requests)))
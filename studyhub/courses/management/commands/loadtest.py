@@ -0,0 +1,131 @@
+import asyncio
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.loadtest import DEFAULT_MIX, LoadPlan, LoadTest, is_overloaded, parse_mix
+from courses.management.commands.generate_load_data import PASSWORD
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест запущенного сервера по сценариям пользователей (аноним, студент, '
+        'покупатель, преподаватель) со ступенчатым ростом числа одновременных пользователей. '
+        'Нужны данные generate_load_data и httpx'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Адрес сервера')
+        parser.add_argument(
+            '--concurrency',
+            default='1,5,10,25,50',
+            help='Ступени: число одновременных пользователей через запятую',
+        )
+        parser.add_argument('--duration', type=float, default=30.0, help='Длительность ступени, секунд')
+        parser.add_argument(
+            '--mix',
+            default=','.join(f'{role}={weight}' for role, weight in DEFAULT_MIX.items()),
+            help='Доли сценариев: visitor, student, buyer, tutor',
+        )
+        parser.add_argument('--think', type=float, default=0.0, help='Средняя пауза между сценариями, секунд')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Таймаут запроса, секунд')
+        parser.add_argument('--prefix', default='load', help='Префикс пользователей generate_load_data')
+        parser.add_argument('--password', default=PASSWORD, help='Пароль пользователей')
+        parser.add_argument(
+            '--max-error-rate', type=float, default=0.01, help='Доля ошибок, при которой ступень - перегрузка',
+        )
+        parser.add_argument(
+            '--max-p95-ms', type=float, default=2000.0, help='p95 (мс), при котором ступень - перегрузка',
+        )
+        parser.add_argument(
+            '--keep-going', action='store_true', help='Не останавливаться на первой ступени с перегрузкой',
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Seed выбора курсов и уроков')
+        parser.add_argument('--output', help='Сохранить результаты всех ступеней в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError('Для нагрузочного теста нужен httpx: pip install httpx')
+
+        try:
+            mix = parse_mix(options['mix'])
+            levels = [int(level) for level in options['concurrency'].split(',') if level.strip()]
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        plan = LoadPlan(prefix=options['prefix'], password=options['password'])
+        problems = plan.check(mix)
+        if problems:
+            raise CommandError(
+                'Недостаточно данных: ' + '; '.join(problems) + '. Запустите manage.py generate_load_data'
+            )
+
+        summaries = asyncio.run(self.run_levels(plan, mix, levels, options))
+
+        if options['output']:
+            Path(options['output']).write_text(
+                json.dumps({'url': options['url'], 'mix': mix, 'levels': summaries}, ensure_ascii=False, indent=2),
+                encoding='utf-8',
+            )
+            self.stdout.write(f'Результат: {options["output"]}')
+
+    async def run_levels(self, plan, mix, levels, options):
+        load_test = LoadTest(
+            options['url'], plan, mix=mix, think_time=options['think'],
+            timeout=options['timeout'], seed=options['seed'],
+        )
+        summaries = []
+        last_ok = None
+        try:
+            for concurrency in levels:
+                summary = await load_test.run_level(concurrency, options['duration'])
+                summaries.append(summary)
+                overloaded = is_overloaded(summary, options['max_error_rate'], options['max_p95_ms'])
+                self.print_level(summary, overloaded)
+                if not overloaded:
+                    last_ok = summary
+                elif not options['keep_going']:
+                    break
+        finally:
+            await load_test.close()
+
+        if last_ok is None:
+            self.stdout.write(self.style.ERROR('Сервер перегружен уже на первой ступени'))
+        elif len(summaries) == len(levels) and last_ok is summaries[-1]:
+            self.stdout.write(self.style.SUCCESS(
+                f'Все ступени без перегрузки: {last_ok["concurrency"]} пользователей, '
+                f'{last_ok["total"]["rps"]} запросов/с'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Предел: {last_ok["concurrency"]} одновременных пользователей, '
+                f'{last_ok["total"]["rps"]} запросов/с без перегрузки'
+            ))
+        return summaries
+
+    def print_level(self, summary, overloaded):
+        total = summary['total']
+        status = self.style.ERROR('ПЕРЕГРУЗКА') if overloaded else self.style.SUCCESS('норма')
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'\nПользователей: {summary["concurrency"]}  |  запросов: {total["count"]} '
+            f'({total["rps"]}/с)  |  ошибок: {total["error_rate"]:.2%}  |  '
+            f'p95: {total["p95_ms"]} мс  |  p99: {total["p99_ms"]} мс'
+        ) + f'  [{status}]')
+        journeys = ', '.join(f'{role}: {count}' for role, count in sorted(summary['journeys'].items()))
+        self.stdout.write(f'Сценариев выполнено: {journeys or "0"}')
+        self.stdout.write(
+            f'  {"Шаг":<18} {"Запросов":>9} {"В сек.":>8} {"Ошибок":>8} '
+            f'{"p50, мс":>9} {"p95, мс":>9} {"p99, мс":>9} {"Макс., мс":>10}'
+        )
+        for name, step in summary['steps'].items():
+            errors = f'{step["error_rate"]:.1%}' if step['errors'] else '-'
+            self.stdout.write(
+                f'  {name:<18} {step["count"]:>9} {step["rps"]:>8.1f} {errors:>8} '
+                f'{step["p50_ms"]:>9.1f} {step["p95_ms"]:>9.1f} {step["p99_ms"]:>9.1f} {step["max_ms"]:>10.1f}'
+            )
+            if step['error_kinds']:
+                kinds = ', '.join(f'{kind} x{count}' for kind, count in step['error_kinds'].items())
+                self.stdout.write(f'  {"":<18} {kinds}')
@@ -0,0 +1,84 @@
+import io
+import pstats
+import shutil
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.profiling import get_profile_dir, load_profiles, make_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Сохраненные профили запросов: список, сводка pstats по одному или нескольким '
+        'профилям, токен для профилирования'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Имена профилей для сводки')
+        parser.add_argument('--view', help='Только профили маршрута (имя из urls.py)')
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Сводка по всем выбранным профилям вместе (например, с --view)',
+        )
+        parser.add_argument(
+            '--sort',
+            default='cumulative',
+            choices=['cumulative', 'tottime', 'calls', 'ncalls'],
+            help='Сортировка сводки',
+        )
+        parser.add_argument('--limit', type=int, default=30, help='Строк в сводке / профилей в списке')
+        parser.add_argument('--token', action='store_true', help='Выдать подписанный токен для ?_profile=')
+        parser.add_argument('--clear', action='store_true', help='Удалить все сохраненные профили')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(make_token())
+            return
+
+        if options['clear']:
+            shutil.rmtree(get_profile_dir(), ignore_errors=True)
+            self.stdout.write(self.style.SUCCESS('Профили удалены'))
+            return
+
+        profiles = load_profiles() if get_profile_dir().exists() else []
+        if options['view']:
+            profiles = [info for info in profiles if info.get('view') == options['view']]
+
+        if options['names']:
+            by_name = {info['name']: info for info in profiles}
+            missing = [name for name in options['names'] if name not in by_name]
+            if missing:
+                raise CommandError(f'Профили не найдены: {", ".join(missing)}')
+            self.print_stats([by_name[name] for name in options['names']], options)
+        elif options['stats']:
+            if not profiles:
+                raise CommandError('Нет профилей для сводки')
+            self.print_stats(profiles, options)
+        else:
+            self.print_list(profiles[:options['limit']])
+
+    def print_list(self, profiles):
+        if not profiles:
+            self.stdout.write('Профилей нет. Откройте страницу с ?_profile=1 (нужен вход сотрудника).')
+            return
+
+        self.stdout.write(f'{"Профиль":<50} {"Статус":>6} {"Время, мс":>10} {"Запросов":>9} {"БД, мс":>8}  Адрес')
+        for info in profiles:
+            self.stdout.write(
+                f'{info["name"]:<50} {info.get("status", ""):>6} {info.get("duration_ms", 0):>10.1f} '
+                f'{info.get("queries", 0):>9} {info.get("db_ms", 0):>8.1f}  '
+                f'{info.get("method", "")} {info.get("path", "")}'
+            )
+
+    def print_stats(self, profiles, options):
+        durations = [info.get('duration_ms', 0) for info in profiles]
+        self.stdout.write(self.style.SUCCESS(
+            f'Профилей: {len(profiles)}, среднее время: {sum(durations) / len(durations):.1f} мс, '
+            f'максимум: {max(durations):.1f} мс'
+        ))
+
+        output = io.StringIO()
+        stats = pstats.Stats(*[info['prof_path'] for info in profiles], stream=output)
+        stats.strip_dirs().sort_stats(options['sort']).print_stats(options['limit'])
+        self.stdout.write(output.getvalue())
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courses.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет отметки об удаленных объектах старше SYNC_TOMBSTONE_DAYS дней. '
+        'Мобильные клиенты с более старым курсором получают полное состояние'
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_tombstones()
+        self.stdout.write(f'Удалено отметок: {deleted}')
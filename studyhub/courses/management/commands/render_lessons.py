@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from courses.content import render_lessons
+from courses.models import Lesson
+
+
+class Command(BaseCommand):
+    help = (
+        'Компилирует содержание уроков в HTML, оглавление и число слов. По умолчанию - '
+        'только еще не скомпилированные уроки (созданные через bulk_create или до миграции)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true', help='Перекомпилировать все уроки (после смены правил очистки)',
+        )
+        parser.add_argument('--batch-size', type=int, default=500, help='Размер пачки bulk_update')
+
+    def handle(self, *args, **options):
+        lessons = Lesson.objects.order_by('pk')
+        if not options['all']:
+            lessons = lessons.filter(content_html='').exclude(content='')
+        count = render_lessons(lessons, options['batch_size'])
+        self.stdout.write(f'Скомпилировано уроков: {count}')
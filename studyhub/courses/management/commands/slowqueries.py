@@ -0,0 +1,70 @@
+import statistics
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from courses.metrics import percentile
+from courses.slowqueries import get_log_path, read_entries
+
+
+class Command(BaseCommand):
+    help = 'Отчет по журналу медленных запросов: группы по виду запроса с p50, p95 и суммарным временем'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Количество групп в отчете')
+        parser.add_argument(
+            '--sort',
+            choices=['total', 'p95', 'count'],
+            default='total',
+            help='Сортировка групп',
+        )
+        parser.add_argument('--view', help='Только запросы маршрута (имя из urls.py)')
+        parser.add_argument('--plans', action='store_true', help='Показать план и пример параметров')
+
+    def handle(self, *args, **options):
+        groups = defaultdict(list)
+        for entry in read_entries():
+            if options['view'] and entry.get('view') != options['view']:
+                continue
+            groups[entry['fingerprint']].append(entry)
+
+        if not groups:
+            self.stdout.write(f'Медленных запросов нет ({get_log_path()})')
+            return
+
+        rows = []
+        for sql, entries in groups.items():
+            durations = [entry['duration_ms'] for entry in entries]
+            rows.append({
+                'sql': sql,
+                'entries': entries,
+                'count': len(durations),
+                'total': sum(durations),
+                'p50': statistics.median(durations),
+                'p95': percentile(durations, 95),
+                'max': max(durations),
+            })
+        rows.sort(key=lambda row: row[options['sort']], reverse=True)
+
+        total = sum(row['total'] for row in rows)
+        self.stdout.write(self.style.SUCCESS(
+            f'Медленных запросов: {sum(row["count"] for row in rows)}, видов: {len(rows)}, '
+            f'суммарно {total / 1000:.2f} с'
+        ))
+
+        for row in rows[:options['limit']]:
+            last = row['entries'][-1]
+            views = sorted({entry.get('view') or '-' for entry in row['entries']})
+            self.stdout.write('')
+            self.stdout.write(
+                f'{row["count"]:>6} раз  всего {row["total"]:>10.1f} мс  p50 {row["p50"]:>8.1f}  '
+                f'p95 {row["p95"]:>8.1f}  max {row["max"]:>8.1f}'
+            )
+            self.stdout.write(f'  {row["sql"][:300]}')
+            self.stdout.write(f'  Маршруты: {", ".join(views)}')
+            if last.get('frame'):
+                self.stdout.write(f'  Вызов: {last["frame"]}')
+            if options['plans']:
+                self.stdout.write(f'  Параметры: {last.get("params")}')
+                for line in last.get('plan') or []:
+                    self.stdout.write(f'    {line}')
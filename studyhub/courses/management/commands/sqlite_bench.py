@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.metrics import percentile
+
+# Профиль SQLite по умолчанию (как было до настройки в settings.py)
+DEFAULT_PROFILE = {
+    'pragmas': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'begin': 'BEGIN',
+    'timeout': 5,
+}
+
+SCHEMA = """
+CREATE TABLE progress (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    lesson_id INTEGER NOT NULL,
+    completed INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    UNIQUE (user_id, lesson_id)
+);
+CREATE INDEX progress_user_completed ON progress (user_id, completed);
+"""
+
+
+def get_tuned_profile():
+    return {
+        'pragmas': dict(getattr(settings, 'SQLITE_PRAGMAS', {})),
+        'begin': 'BEGIN IMMEDIATE',
+        'timeout': settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 20),
+    }
+
+
+def open_connection(path, profile):
+    conn = sqlite3.connect(path, timeout=profile['timeout'], isolation_level=None)
+    for name, value in profile['pragmas'].items():
+        conn.execute(f'PRAGMA {name} = {value}')
+    return conn
+
+
+def run_worker(args):
+    """
+    Процесс нагрузки: чтения считают прогресс пользователя, записи повторяют
+    MarkLessonCompletedView - чтение и обновление строки в одной транзакции.
+    """
+    path, profile, duration, write_ratio, users, lessons, seed = args
+    rnd = random.Random(seed)
+    conn = open_connection(path, profile)
+    stats = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+    deadline = time.perf_counter() + duration
+
+    while time.perf_counter() < deadline:
+        user_id = rnd.randint(1, users)
+        started = time.perf_counter()
+        try:
+            if rnd.random() < write_ratio:
+                lesson_id = rnd.randint(1, lessons)
+                conn.execute(profile['begin'])
+                try:
+                    conn.execute(
+                        'SELECT id FROM progress WHERE user_id = ? AND lesson_id = ?',
+                        (user_id, lesson_id),
+                    ).fetchone()
+                    conn.execute(
+                        'INSERT INTO progress (user_id, lesson_id, completed, updated_at) '
+                        'VALUES (?, ?, 1, ?) ON CONFLICT (user_id, lesson_id) '
+                        'DO UPDATE SET completed = 1 - completed, updated_at = excluded.updated_at',
+                        (user_id, lesson_id, time.time()),
+                    )
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+                stats['writes'] += 1
+            else:
+                conn.execute(
+                    'SELECT COUNT(*) FROM progress WHERE user_id = ? AND completed = 1',
+                    (user_id,),
+                ).fetchone()
+                stats['reads'] += 1
+        except sqlite3.OperationalError:
+            stats['errors'] += 1
+        stats['latencies'].append(time.perf_counter() - started)
+
+    conn.close()
+    return stats
+
+
+class Command(BaseCommand):
+    help = 'Многопроцессный бенчмарк чтения/записи SQLite: профиль по умолчанию против настроенного'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=4, help='Количество процессов')
+        parser.add_argument('--duration', type=float, default=5.0, help='Длительность прогона, сек')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Доля операций записи (0..1)')
+        parser.add_argument('--users', type=int, default=500, help='Количество пользователей в данных')
+        parser.add_argument('--lessons', type=int, default=200, help='Количество уроков в данных')
+        parser.add_argument(
+            '--profile',
+            choices=['default', 'tuned', 'both'],
+            default='both',
+            help='Какой профиль SQLite запускать',
+        )
+
+    def handle(self, *args, **options):
+        profiles = []
+        if options['profile'] in ('default', 'both'):
+            profiles.append(('default', DEFAULT_PROFILE))
+        if options['profile'] in ('tuned', 'both'):
+            profiles.append(('tuned', get_tuned_profile()))
+
+        self.stdout.write(
+            f"Процессов: {options['processes']}, длительность: {options['duration']} с, "
+            f"доля записей: {options['write_ratio']:.0%}"
+        )
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for name, profile in profiles:
+                path = os.path.join(tmpdir, f'bench_{name}.sqlite3')
+                self.prepare_database(path, profile, options['users'], options['lessons'])
+                result = self.run_profile(path, profile, options)
+                self.print_result(name, result, options['duration'])
+
+    def prepare_database(self, path, profile, users, lessons):
+        conn = open_connection(path, profile)
+        conn.executescript(SCHEMA)
+        rnd = random.Random(0)
+        rows = [
+            (user_id, lesson_id, rnd.randint(0, 1), time.time())
+            for user_id in range(1, users + 1)
+            for lesson_id in rnd.sample(range(1, lessons + 1), min(20, lessons))
+        ]
+        conn.execute('BEGIN')
+        conn.executemany(
+            'INSERT INTO progress (user_id, lesson_id, completed, updated_at) VALUES (?, ?, ?, ?)',
+            rows,
+        )
+        conn.execute('COMMIT')
+        conn.close()
+
+    def run_profile(self, path, profile, options):
+        tasks = [
+            (path, profile, options['duration'], options['write_ratio'],
+             options['users'], options['lessons'], seed)
+            for seed in range(options['processes'])
+        ]
+        with multiprocessing.Pool(options['processes']) as pool:
+            results = pool.map(run_worker, tasks)
+
+        total = {'reads': 0, 'writes': 0, 'errors': 0, 'latencies': []}
+        for stats in results:
+            for key in ('reads', 'writes', 'errors'):
+                total[key] += stats[key]
+            total['latencies'].extend(stats['latencies'])
+        return total
+
+    def print_result(self, name, result, duration):
+        latencies_ms = [value * 1000 for value in result['latencies']]
+        ops = result['reads'] + result['writes']
+        self.stdout.write(self.style.SUCCESS(f'\nПрофиль: {name}'))
+        self.stdout.write(f'  Операций/с:      {ops / duration:,.0f}')
+        self.stdout.write(f'  Чтений/с:        {result["reads"] / duration:,.0f}')
+        self.stdout.write(f'  Записей/с:       {result["writes"] / duration:,.0f}')
+        self.stdout.write(f'  Ошибок блокировки: {result["errors"]}')
+        if latencies_ms:
+            self.stdout.write(f'  Задержка p50:    {statistics.median(latencies_ms):.2f} мс')
+            self.stdout.write(f'  Задержка p95:    {percentile(latencies_ms, 95):.2f} мс')
+            self.stdout.write(f'  Задержка p99:    {percentile(latencies_ms, 99):.2f} мс')
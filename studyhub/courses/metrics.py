@@ -0,0 +1,259 @@
+"""
+Метрики запросов в формате Prometheus.
+
+MetricsMiddleware для каждого запроса записывает в гистограммы время ответа,
+время в базе, время рендеринга шаблона и размер ответа с меткой view -
+именем маршрута из urls.py. Метрики отдаются по адресу /metrics
+(только персоналу или по токену METRICS_TOKEN).
+
+Каждый процесс (воркер gunicorn/uwsgi) копит значения в памяти и раз в
+METRICS_FLUSH_INTERVAL секунд сохраняет их в свой файл в METRICS_DIR.
+/metrics складывает файлы всех процессов, поэтому видны суммарные значения
+по всем воркерам. Файлы завершившихся процессов не удаляются (счетчики
+не должны уменьшаться); при развертывании каталог можно очистить.
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Границы корзин гистограмм
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Имя метрики: (тип, описание, границы корзин)
+METRICS = {
+    'studyhub_requests_total': ('counter', 'Количество запросов', None),
+    'studyhub_request_duration_seconds': ('histogram', 'Время обработки запроса', DURATION_BUCKETS),
+    'studyhub_db_duration_seconds': ('histogram', 'Время запросов к базе за запрос', DURATION_BUCKETS),
+    'studyhub_template_render_seconds': ('histogram', 'Время рендеринга шаблона', DURATION_BUCKETS),
+    'studyhub_response_size_bytes': ('histogram', 'Размер ответа', SIZE_BUCKETS),
+}
+
+
+class MetricsRegistry:
+    """Значения метрик текущего процесса с сохранением в файл"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.reset()
+
+    def reset(self):
+        # {имя метрики: {метки в JSON: значение}}
+        # значение счетчика - число, гистограммы - {'buckets': [...], 'sum': ..., 'count': ...}
+        self.values = {name: {} for name in METRICS}
+        self.pid = os.getpid()
+        self.filename = f'{self.pid}-{uuid.uuid4().hex[:8]}.json'
+        self.last_flush = time.monotonic()
+        self.dirty = False
+
+    def check_process(self):
+        # После fork дочерний процесс не должен продолжать счетчики родителя
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, labels, amount=1):
+        key = json.dumps(labels, sort_keys=True)
+        with self.lock:
+            self.check_process()
+            values = self.values[name]
+            values[key] = values.get(key, 0) + amount
+            self.dirty = True
+
+    def observe(self, name, labels, value):
+        bounds = METRICS[name][2]
+        key = json.dumps(labels, sort_keys=True)
+        with self.lock:
+            self.check_process()
+            histogram = self.values[name].get(key)
+            if histogram is None:
+                histogram = {'buckets': [0] * len(bounds), 'sum': 0.0, 'count': 0}
+                self.values[name][key] = histogram
+            for index, bound in enumerate(bounds):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+            self.dirty = True
+
+    def get_directory(self):
+        return Path(getattr(settings, 'METRICS_DIR', Path(settings.BASE_DIR) / '.metrics'))
+
+    def flush(self, force=False):
+        """Сохраняет значения процесса в файл (не чаще METRICS_FLUSH_INTERVAL)"""
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+        with self.lock:
+            self.check_process()
+            if not self.dirty or (not force and time.monotonic() - self.last_flush < interval):
+                return
+            data = json.dumps(self.values)
+            self.last_flush = time.monotonic()
+            self.dirty = False
+
+        directory = self.get_directory()
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / self.filename
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(data, encoding='utf-8')
+        # Замена атомарна: читатель видит либо старый, либо новый файл целиком
+        os.replace(tmp_path, path)
+
+    def collect(self):
+        """Сумма значений всех процессов"""
+        self.flush(force=True)
+        total = {name: {} for name in METRICS}
+        directory = self.get_directory()
+        if not directory.exists():
+            return total
+
+        for path in directory.glob('*.json'):
+            try:
+                data = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                continue
+            for name, values in data.items():
+                if name not in total:
+                    continue
+                for key, value in values.items():
+                    merge_value(total[name], key, value)
+        return total
+
+
+def merge_value(values, key, value):
+    if isinstance(value, dict):
+        current = values.setdefault(key, {'buckets': [0] * len(value['buckets']), 'sum': 0.0, 'count': 0})
+        current['buckets'] = [a + b for a, b in zip(current['buckets'], value['buckets'])]
+        current['sum'] += value['sum']
+        current['count'] += value['count']
+    else:
+        values[key] = values.get(key, 0) + value
+
+
+registry = MetricsRegistry()
+atexit.register(registry.flush, force=True)
+
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels, **extra):
+    labels = {**labels, **extra}
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+def format_number(value):
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_metrics(values=None):
+    """Текст в формате Prometheus exposition format"""
+    values = registry.collect() if values is None else values
+    lines = []
+    for name, (kind, description, bounds) in METRICS.items():
+        lines.append(f'# HELP {name} {description}')
+        lines.append(f'# TYPE {name} {kind}')
+        for key in sorted(values.get(name, {})):
+            labels = json.loads(key)
+            value = values[name][key]
+            if kind == 'counter':
+                lines.append(f'{name}{format_labels(labels)} {format_number(value)}')
+                continue
+            for bound, count in zip(bounds, value['buckets']):
+                lines.append(f'{name}_bucket{format_labels(labels, le=format_number(float(bound)))} {count}')
+            lines.append(f'{name}_bucket{format_labels(labels, le="+Inf")} {value["count"]}')
+            lines.append(f'{name}_sum{format_labels(labels)} {format_number(value["sum"])}')
+            lines.append(f'{name}_count{format_labels(labels)} {value["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def percentile(values, percent):
+    """Перцентиль по ближайшему рангу (для отчетов по сырым измерениям)"""
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def get_view_name(request):
+    """Метка запроса: имя маршрута или шаблон пути, если имени нет"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    if match.view_name:
+        return match.view_name
+    return match.route or 'unnamed'
+
+
+class MetricsMiddleware:
+    """
+    Записывает метрики каждого запроса. Должен стоять перед
+    QueryBudgetMiddleware, чтобы получить время в базе из request.query_stats
+    (время в базе записывается, только если включен QUERY_STATS).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, duration):
+        labels = {'view': get_view_name(request)}
+        registry.inc('studyhub_requests_total', {
+            **labels, 'method': request.method, 'status': str(response.status_code),
+        })
+        registry.observe('studyhub_request_duration_seconds', labels, duration)
+
+        query_stats = getattr(request, 'query_stats', None)
+        if query_stats is not None:
+            registry.observe('studyhub_db_duration_seconds', labels, query_stats.duration)
+
+        render_time = getattr(request, '_metrics_render_time', None)
+        if render_time is not None:
+            registry.observe('studyhub_template_render_seconds', labels, render_time)
+
+        if not response.streaming:
+            registry.observe('studyhub_response_size_bytes', labels, len(response.content))
+
+        registry.flush()
+
+    def process_template_response(self, request, response):
+        # Вызывается непосредственно перед рендерингом TemplateResponse
+        render_started = time.perf_counter()
+
+        def record_render_time(rendered_response):
+            request._metrics_render_time = time.perf_counter() - render_started
+
+        response.add_post_render_callback(record_render_time)
+        return response
@@ -0,0 +1,69 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.core.cache import cache
+
+ROLE_SESSION_KEY = '_user_role'
+PROFILE_VERSION_KEY = 'courses:profile_version:{}'
+
+
+def get_profile_version(user_id):
+    """Текущая версия профиля пользователя (меняется при каждом UserProfile.save)"""
+    key = PROFILE_VERSION_KEY.format(user_id)
+    version = cache.get(key)
+    if version is None:
+        # Версии нет (кэш очищен или перезапущен) - заводим новую,
+        # чтобы ранее сохраненные в сессии роли стали недействительными
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_profile_version(user_id):
+    """Инвалидирует роль, закэшированную в сессиях пользователя"""
+    cache.set(PROFILE_VERSION_KEY.format(user_id), time.time_ns(), timeout=None)
+
+
+class UserRoleMiddleware:
+    """
+    Кэширует роль пользователя в сессии вместе с версией профиля.
+    Пока версия совпадает, роль берется из сессии без обращения к профилю;
+    после UserProfile.save версия меняется и роль перечитывается.
+    Должен стоять после AuthenticationMiddleware.
+
+    Под ASGI роль (а с ней и request.user) загружается в потоке sync_to_async,
+    поэтому дальше request.user можно читать в цикле событий без запросов к базе.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request.user_role = self.get_role(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        request.user_role = await sync_to_async(self.get_role)(request)
+        return await self.get_response(request)
+
+    def get_role(self, request):
+        if not request.user.is_authenticated:
+            return None
+
+        version = get_profile_version(request.user.pk)
+        cached = request.session.get(ROLE_SESSION_KEY)
+        if cached and cached.get('version') == version:
+            return cached.get('role')
+
+        user_profile = getattr(request.user, 'user_profile', None)
+        role = user_profile.role if user_profile else None
+        request.session[ROLE_SESSION_KEY] = {'role': role, 'version': version}
+        return role
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_hot_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(choices=[('enrollment', 'Запись на курс'), ('module', 'Модуль'), ('lesson', 'Урок')], max_length=20, verbose_name='Модель')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='ID объекта')),
+                ('parent_id', models.PositiveBigIntegerField(verbose_name='ID родителя')),
+                ('user_id', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='ID пользователя')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')),
+            ],
+            options={
+                'verbose_name': 'Удаленный объект',
+                'verbose_name_plural': 'Удаленные объекты',
+            },
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollment',
+            index=models.Index(fields=['user', 'updated_at'], name='enrollment_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['module', 'updated_at'], name='lesson_module_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='module',
+            index=models.Index(fields=['course', 'updated_at'], name='module_course_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progress',
+            index=models.Index(fields=['user', 'updated_at'], name='progress_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['model', 'parent_id', 'deleted_at'], name='tombstone_parent_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['user_id', 'deleted_at'], name='tombstone_user_deleted_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ),
+    ]
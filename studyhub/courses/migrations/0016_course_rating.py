@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:09
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
+
+
+def fill_course_rating(apps, schema_editor):
+    """Рейтинг существующих курсов по их отзывам"""
+    Course = apps.get_model('courses', 'Course')
+    Review = apps.get_model('courses', 'Review')
+    reviews = Review.objects.filter(course=OuterRef('pk')).order_by().values('course')
+    average = Cast(Avg('rating'), DecimalField(max_digits=3, decimal_places=2))
+    Course.objects.update(
+        review_count=Coalesce(Subquery(reviews.annotate(count=Count('pk')).values('count')), 0),
+        average_rating=Subquery(reviews.annotate(average=average).values('average')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='average_rating',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=3, null=True, verbose_name='Средняя оценка'),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество отзывов'),
+        ),
+        migrations.RunPython(fill_course_rating, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 13:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_course_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='content_format',
+            field=models.CharField(choices=[('text', 'Обычный текст'), ('markdown', 'Markdown'), ('html', 'HTML')], default='text', help_text='Markdown и HTML очищаются от опасных тегов и атрибутов', max_length=10, verbose_name='Формат содержания'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Содержание (HTML)'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='toc',
+            field=models.JSONField(blank=True, default=list, editable=False, verbose_name='Оглавление'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='word_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество слов'),
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.contrib.auth.mixins import UserPassesTestMixin
 from django.shortcuts import redirect, get_object_or_404
 from django.contrib import messages
 from django.http import HttpResponseForbidden
+from .roles import is_admin, is_tutor, is_tutor_or_admin
 
 
 class IsTutorMixin(UserPassesTestMixin):
@@ -10,10 +11,7 @@ class IsTutorMixin(UserPassesTestMixin):
     def test_func(self):
         if not self.request.user.is_authenticated:
             return False
-        user_profile = getattr(self.request.user, 'user_profile', None)
-        if not user_profile:
-            return False
-        return user_profile.is_tutor()
+        return is_tutor(self.request)
     
     def handle_no_permission(self):
         if self.request.user.is_authenticated:
@@ -29,10 +27,7 @@ class IsAdminMixin(UserPassesTestMixin):
     def test_func(self):
         if not self.request.user.is_authenticated:
             return False
-        user_profile = getattr(self.request.user, 'user_profile', None)
-        if not user_profile:
-            return False
-        return user_profile.is_admin()
+        return is_admin(self.request)
     
     def handle_no_permission(self):
         if self.request.user.is_authenticated:
@@ -48,10 +43,7 @@ class IsTutorOrAdminMixin(UserPassesTestMixin):
     def test_func(self):
         if not self.request.user.is_authenticated:
             return False
-        user_profile = getattr(self.request.user, 'user_profile', None)
-        if not user_profile:
-            return False
-        return user_profile.is_tutor_or_admin()
+        return is_tutor_or_admin(self.request)
     
     def handle_no_permission(self):
         if self.request.user.is_authenticated:
@@ -69,8 +61,7 @@ class IsCourseAuthorOrAdminMixin(UserPassesTestMixin):
             return False
         
         # Администратор может все
-        user_profile = getattr(self.request.user, 'user_profile', None)
-        if user_profile and user_profile.is_admin():
+        if is_admin(self.request):
             return True
         
         # Проверяем, является ли пользователь автором курса
@@ -93,8 +84,7 @@ class IsModuleCourseAuthorOrAdminMixin(UserPassesTestMixin):
             return False
         
         # Администратор может все
-        user_profile = getattr(self.request.user, 'user_profile', None)
-        if user_profile and user_profile.is_admin():
+        if is_admin(self.request):
             return True
         
         # Получаем модуль и проверяем автора курса
@@ -126,8 +116,7 @@ class IsLessonCourseAuthorOrAdminMixin(UserPassesTestMixin):
             return False
         
         # Администратор может все
-        user_profile = getattr(self.request.user, 'user_profile', None)
-        if user_profile and user_profile.is_admin():
+        if is_admin(self.request):
             return True
         
         # Получаем урок и проверяем автора курса
@@ -1,5 +1,7 @@
 from django.db import models
+from django.db.models.functions import Left
 from django.contrib.auth.models import User
+from .content import render_content
 from django.core.validators import RegexValidator
 import os
 from datetime import date
@@ -12,6 +14,7 @@ class Category(models.Model):
     """
     name = models.CharField(max_length=100, verbose_name="Название категории")
     description = models.TextField(blank=True, verbose_name="Описание")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     
     def __str__(self):
         return self.name
@@ -21,6 +24,16 @@ class Category(models.Model):
         verbose_name_plural = "Категории"
 
 
+class CourseQuerySet(models.QuerySet):
+    def cards(self):
+        """
+        Курсы для списков и карточек: автор и категория загружаются тем же
+        запросом, а полное описание (full_description) не загружается -
+        оно нужно только на странице курса.
+        """
+        return self.select_related('author', 'category').defer('full_description')
+
+
 class Course(models.Model):
     """
     Основная модель курса.
@@ -89,6 +102,19 @@ class Course(models.Model):
         verbose_name="Продолжительность (часов)",
         help_text="Сколько часов в среднем занимает прохождение курса"
     )
+
+    objects = CourseQuerySet.as_manager()
+
+    # Рейтинг по отзывам (денормализован, обновляется сигналами Review - см. ratings.py)
+    review_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Количество отзывов")
+    average_rating = models.DecimalField(
+        max_digits=3,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name="Средняя оценка"
+    )
     
     def __str__(self):
         return self.title
@@ -108,6 +134,36 @@ class Course(models.Model):
         verbose_name = "Курс"
         verbose_name_plural = "Курсы"
         ordering = ['-created_at']  # Сортировка по дате создания (новые первыми)
+        # Каталог всегда фильтрует опубликованные курсы и сортирует по дате,
+        # поэтому индексы частичные (только is_published=True)
+        indexes = [
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(is_published=True),
+                name='course_published_created_idx',
+            ),
+            models.Index(
+                fields=['category', '-created_at'],
+                condition=models.Q(is_published=True),
+                name='course_pub_category_idx',
+            ),
+            models.Index(
+                fields=['level', '-created_at'],
+                condition=models.Q(is_published=True),
+                name='course_pub_level_idx',
+            ),
+            models.Index(
+                fields=['is_free', '-created_at'],
+                condition=models.Q(is_published=True),
+                name='course_pub_free_idx',
+            ),
+            models.Index(
+                fields=['is_popular', '-created_at'],
+                condition=models.Q(is_published=True),
+                name='course_pub_popular_idx',
+            ),
+            models.Index(fields=['author', '-created_at'], name='course_author_created_idx'),
+        ]
 
 
 class Profile(models.Model):
@@ -180,6 +236,9 @@ class Review(models.Model):
         unique_together = ['course', 'user']
         # Сортировка по дате создания (новые первыми)
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['course', '-created_at'], name='review_course_created_idx'),
+        ]
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
     
@@ -197,11 +256,16 @@ class Enrollment(models.Model):
     course = models.ForeignKey('Course', on_delete=models.CASCADE, verbose_name="Курс")
     enrolled_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата записи")
     completed = models.BooleanField(default=False, verbose_name="Завершено")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     
     class Meta:
         verbose_name = "Запись на курс"
         verbose_name_plural = "Записи на курсы"
         unique_together = ['user', 'course']  # Одна запись на курс
+        indexes = [
+            # Синхронизация мобильного приложения (courses/sync.py)
+            models.Index(fields=['user', 'updated_at'], name='enrollment_user_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} → {self.course.title}"
@@ -214,11 +278,16 @@ class Enrollment(models.Model):
 
 class UserProfile(models.Model):
     """Расширенный профиль пользователя"""
+    STUDENT = 'student'
+    TUTOR = 'tutor'
+    ADMIN = 'admin'
     ROLE_CHOICES = [
-        ('student', 'Студент'),
-        ('tutor', 'Преподаватель'),
-        ('admin', 'Администратор'),
+        (STUDENT, 'Студент'),
+        (TUTOR, 'Преподаватель'),
+        (ADMIN, 'Администратор'),
     ]
+    # Роли, которым доступно создание и редактирование курсов
+    STAFF_ROLES = (TUTOR, ADMIN)
     user = models.OneToOneField(
         User, 
         on_delete=models.CASCADE, 
@@ -228,7 +297,7 @@ class UserProfile(models.Model):
     role = models.CharField(
         max_length=20,
         choices=ROLE_CHOICES,
-        default='student',
+        default=STUDENT,
         verbose_name="Роль на платформе",
         help_text="Выберите, как вы будете использовать платформу: как студент или как преподаватель"
     )
@@ -266,6 +335,9 @@ class UserProfile(models.Model):
     class Meta:
         verbose_name = "Профиль пользователя"
         verbose_name_plural = "Профили пользователей"
+        indexes = [
+            models.Index(fields=['role'], name='userprofile_role_idx'),
+        ]
     
     def __str__(self):
         return f"Профиль {self.user.username}"
@@ -286,19 +358,19 @@ class UserProfile(models.Model):
     
     def is_student(self):
         """Проверка, является ли пользователь студентом"""
-        return self.role == 'student'
+        return self.role == self.STUDENT
     
     def is_tutor(self):
         """Проверка, является ли пользователь преподавателем"""
-        return self.role == 'tutor'
+        return self.role == self.TUTOR
     
     def is_admin(self):
         """Проверка, является ли пользователь администратором"""
-        return self.role == 'admin'
+        return self.role == self.ADMIN
     
     def is_tutor_or_admin(self):
         """Проверка, является ли пользователь преподавателем или администратором"""
-        return self.role in ['tutor', 'admin']
+        return self.role in self.STAFF_ROLES
     
     def clean(self):
         """Валидация данных"""
@@ -361,19 +433,43 @@ class Module(models.Model):
         verbose_name = 'Модуль'
         verbose_name_plural = 'Модули'
         unique_together = ['course', 'order']  # В рамках одного курса порядок уникален
+        indexes = [
+            models.Index(fields=['course', 'updated_at'], name='module_course_updated_idx'),
+        ]
     
     def __str__(self):
         return f'{self.title} (Курс: {self.course.title})'
     
     def lesson_count(self):
         """Возвращает количество уроков в модуле."""
+        # Значение уже посчитано в запросе (annotate lessons_count)
+        if hasattr(self, 'lessons_count'):
+            return self.lessons_count
         return self.lessons.count()
     
     def total_duration(self):
         """Возвращает общую продолжительность всех уроков модуля."""
+        if hasattr(self, 'lessons_duration'):
+            return self.lessons_duration
         return sum(lesson.duration_minutes for lesson in self.lessons.all())
 
 
+# Длина анонса урока в списках (см. LessonQuerySet.outline)
+LESSON_PREVIEW_LENGTH = 100
+
+
+class LessonQuerySet(models.QuerySet):
+    def outline(self):
+        """
+        Уроки для списков и навигации без текста (content). Для анонса
+        загружается только начало текста - content_preview: на один символ
+        длиннее LESSON_PREVIEW_LENGTH, чтобы truncatechars добавил многоточие.
+        """
+        return self.defer('content', 'content_html', 'toc').annotate(
+            content_preview=Left('content', LESSON_PREVIEW_LENGTH + 1)
+        )
+
+
 class Lesson(models.Model):
     """
     Модель урока в модуле. Каждый модуль состоит из нескольких уроков.
@@ -391,10 +487,29 @@ class Lesson(models.Model):
         verbose_name='Название урока'
     )
     
+    CONTENT_FORMAT_CHOICES = [
+        ('text', 'Обычный текст'),
+        ('markdown', 'Markdown'),
+        ('html', 'HTML'),
+    ]
+
     content = models.TextField(
         verbose_name='Содержание урока',
         help_text='Подробный учебный материал урока'
     )
+
+    content_format = models.CharField(
+        max_length=10,
+        choices=CONTENT_FORMAT_CHOICES,
+        default='text',
+        verbose_name='Формат содержания',
+        help_text='Markdown и HTML очищаются от опасных тегов и атрибутов'
+    )
+
+    # Скомпилированное содержание (заполняется при сохранении - см. content.py)
+    content_html = models.TextField(blank=True, editable=False, verbose_name='Содержание (HTML)')
+    toc = models.JSONField(default=list, blank=True, editable=False, verbose_name='Оглавление')
+    word_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество слов')
     
     order = models.PositiveIntegerField(
         default=0,
@@ -422,12 +537,17 @@ class Lesson(models.Model):
         verbose_name='Опубликован',
         help_text='Если не отмечено, урок будет виден только преподавателю'
     )
+
+    objects = LessonQuerySet.as_manager()
     
     class Meta:
         ordering = ['order', 'created_at']
         verbose_name = 'Урок'
         verbose_name_plural = 'Уроки'
         unique_together = ['module', 'order'] # В рамках одного модуля порядок уникален
+        indexes = [
+            models.Index(fields=['module', 'updated_at'], name='lesson_module_updated_idx'),
+        ]
     
     def __str__(self):
         return f'{self.title} (Модуль: {self.module.title})'
@@ -436,6 +556,16 @@ class Lesson(models.Model):
         """Возвращает курс, к которому принадлежит урок."""
         return self.module.course
 
+    def render_content(self):
+        """Компилирует content в content_html, toc и word_count"""
+        self.content_html, self.toc, self.word_count = render_content(self.content, self.content_format)
+
+    def save(self, *args, **kwargs):
+        # Markdown и очистка HTML - при сохранении, а не при каждом показе урока
+        if 'content' not in self.get_deferred_fields():
+            self.render_content()
+        super().save(*args, **kwargs)
+
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
@@ -458,6 +588,7 @@ class Progress(models.Model):
         indexes = [
             models.Index(fields=['user', 'completed']),
             models.Index(fields=['lesson', 'completed']),
+            models.Index(fields=['user', 'updated_at'], name='progress_user_updated_idx'),
         ]
     
     def __str__(self):
@@ -513,6 +644,10 @@ class Order(models.Model):
         verbose_name = 'Заказ'
         verbose_name_plural = 'Заказы'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f'Заказ #{self.pk} от {self.user.username}'
@@ -624,6 +759,10 @@ class SupportRequest(models.Model):
         verbose_name = 'Обращение в поддержку'
         verbose_name_plural = 'Обращения в поддержку'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', '-created_at'], name='support_status_created_idx'),
+            models.Index(fields=['-created_at'], name='support_created_idx'),
+        ]
 
     def __str__(self):
         return f'Обращение от {self.name} ({self.contact})'
@@ -634,4 +773,37 @@ class SupportRequest(models.Model):
     
     def is_completed(self):
         """Проверка, выполнено ли обращение"""
-        return self.status == 'completed'
\ No newline at end of file
+        return self.status == 'completed'
+
+
+class SyncTombstone(models.Model):
+    """
+    Отметка об удалении объекта для синхронизации мобильного приложения
+    (courses/sync.py): у удаленной строки нет updated_at, поэтому клиент
+    узнает об удалении из этой таблицы.
+    """
+    MODEL_CHOICES = [
+        ('enrollment', 'Запись на курс'),
+        ('module', 'Модуль'),
+        ('lesson', 'Урок'),
+    ]
+
+    model = models.CharField(max_length=20, choices=MODEL_CHOICES, verbose_name='Модель')
+    object_id = models.PositiveBigIntegerField(verbose_name='ID объекта')
+    # Курс для записей и модулей, модуль для уроков
+    parent_id = models.PositiveBigIntegerField(verbose_name='ID родителя')
+    # Пользователь для записей на курс
+    user_id = models.PositiveBigIntegerField(null=True, blank=True, verbose_name='ID пользователя')
+    deleted_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата удаления')
+
+    class Meta:
+        verbose_name = 'Удаленный объект'
+        verbose_name_plural = 'Удаленные объекты'
+        indexes = [
+            models.Index(fields=['model', 'parent_id', 'deleted_at'], name='tombstone_parent_deleted_idx'),
+            models.Index(fields=['user_id', 'deleted_at'], name='tombstone_user_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_model_display()} #{self.object_id}'
@@ -0,0 +1,61 @@
+"""
+Новый порядок модулей курса или уроков модуля за одно действие
+(перетаскивание в интерфейсе преподавателя).
+
+Номера уникальны в пределах родителя (unique_together (course, order)
+и (module, order)), поэтому сохранять строки по одной нельзя: новый
+номер строки часто занят другой строкой. Порядок меняется в два шага
+с постоянным числом запросов:
+
+1. один bulk_update присваивает строкам временные номера
+   offset + новая позиция, где offset больше любого текущего номера, -
+   временные номера не совпадают ни с текущими, ни между собой;
+2. один UPDATE вычитает offset - номера становятся 1..n, и ни один
+   из них не совпадает с временными.
+
+Ограничение не нарушается ни на одной строке, в том числе в PostgreSQL,
+где неоткладываемое ограничение уникальности проверяется после каждой
+строки, а не в конце запроса.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import bump_namespace_version
+
+
+def parse_order(values):
+    """ID из запроса в новом порядке; неверный список - ValueError"""
+    if not isinstance(values, list) or not values:
+        raise ValueError('Передайте order - список ID в новом порядке')
+    try:
+        ids = [int(value) for value in values]
+    except (TypeError, ValueError):
+        raise ValueError('order должен содержать только числовые ID')
+    if len(set(ids)) != len(ids):
+        raise ValueError('ID в order повторяются')
+    return ids
+
+
+def reorder(queryset, ids, namespace):
+    """
+    Переставляет строки queryset (все модули курса или все уроки модуля)
+    в порядке ids и нумерует их с 1. ids должен содержать каждую строку
+    ровно один раз - иначе ValueError. Кэш пространства имен namespace
+    сбрасывается один раз после фиксации транзакции.
+    """
+    model = queryset.model
+    with transaction.atomic():
+        # Блокировка строк: одновременные перестановки выполняются по очереди
+        current = dict(queryset.select_for_update().values_list('pk', 'order'))
+        if set(ids) != set(current):
+            raise ValueError('order должен содержать все ID и только их')
+
+        offset = max(*current.values(), len(ids)) + 1
+        model.objects.bulk_update(
+            [model(pk=pk, order=offset + position) for position, pk in enumerate(ids, start=1)],
+            ['order'],
+        )
+        # bulk_update и update не обновляют auto_now - updated_at нужен синхронизации и ETag
+        queryset.update(order=F('order') - offset, updated_at=timezone.now())
+        transaction.on_commit(lambda: bump_namespace_version(namespace))
@@ -0,0 +1,189 @@
+"""
+Профилирование отдельных запросов (cProfile).
+
+Запрос профилируется целиком - представление, рендеринг шаблона и ORM, если:
+- вошедший сотрудник добавил к адресу ?_profile=1 (или заголовок X-Profile: 1);
+- передан подписанный токен в ?_profile=<токен> или X-Profile: <токен>
+  (токен выдает `manage.py profiles --token`, действует PROFILING_TOKEN_MAX_AGE секунд);
+- включена выборка: каждый PROFILING_SAMPLE_RATE-й запрос в среднем (0 - выключено).
+
+Результат сохраняется в PROFILING_DIR: файл .prof (формат pstats, можно
+открыть в snakeviz) и .json с описанием запроса. Имя файла возвращается
+в заголовке ответа X-Profile. Просмотр: `manage.py profiles`.
+
+Под ASGI cProfile видит только код в цикле событий (в том числе код других
+запросов, обрабатываемых в это время): запросы async ORM и рендеринг шаблонов
+выполняются в потоке sync_to_async и попадают в профиль как ожидание. Число запросов и время в базе в описании учитываются полностью.
+"""
+import cProfile
+import json
+import random
+import re
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+
+from .metrics import get_view_name
+from .querystats import acollect_queries, collect_queries
+
+PROFILE_PARAM = '_profile'
+PROFILE_HEADER = 'X-Profile'
+TOKEN_SALT = 'courses.profiling'
+TOKEN_VALUE = 'profile'
+
+
+def get_profile_dir():
+    return Path(getattr(settings, 'PROFILING_DIR', Path(settings.BASE_DIR) / '.profiles'))
+
+
+def make_token():
+    """Подписанный токен для профилирования без входа в систему"""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def check_token(value):
+    max_age = getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 60 * 60)
+    try:
+        return signing.TimestampSigner(salt=TOKEN_SALT).unsign(value, max_age=max_age) == TOKEN_VALUE
+    except signing.BadSignature:
+        return False
+
+
+def load_profiles(directory=None):
+    """Описания сохраненных профилей, новые первыми"""
+    directory = directory or get_profile_dir()
+    profiles = []
+    for path in directory.glob('*.json'):
+        try:
+            info = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        info['name'] = path.stem
+        info['prof_path'] = str(path.with_suffix('.prof'))
+        profiles.append(info)
+    profiles.sort(key=lambda info: info['name'], reverse=True)
+    return profiles
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запрос по требованию сотрудника, по токену или по выборке.
+    Должен стоять после AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        reason = self.get_reason(request)
+        if reason is None:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # В процессе уже работает другой профилировщик (например, в соседнем потоке)
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            with collect_queries() as stats:
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        name = self.save(request, response, profiler, {
+            'reason': reason,
+            'duration_ms': round(duration * 1000, 1),
+            'queries': stats.count,
+            'db_ms': round(stats.duration_ms, 1),
+        })
+        response[PROFILE_HEADER] = name
+        return response
+
+    async def __acall__(self, request):
+        # request.user к этому моменту загружен UserRoleMiddleware
+        reason = self.get_reason(request)
+        if reason is None:
+            return await self.get_response(request)
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            async with acollect_queries() as stats:
+                response = await self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - started
+
+        name = await sync_to_async(self.save)(request, response, profiler, {
+            'reason': reason,
+            'duration_ms': round(duration * 1000, 1),
+            'queries': stats.count,
+            'db_ms': round(stats.duration_ms, 1),
+        })
+        response[PROFILE_HEADER] = name
+        return response
+
+    def get_reason(self, request):
+        """Почему запрос нужно профилировать (None - не нужно)"""
+        value = request.GET.get(PROFILE_PARAM) or request.headers.get(PROFILE_HEADER)
+        if value:
+            if value == '1' and request.user.is_staff:
+                return 'staff'
+            if value != '1' and check_token(value):
+                return 'token'
+
+        sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0)
+        if sample_rate and random.randrange(sample_rate) == 0:
+            return 'sample'
+        return None
+
+    def save(self, request, response, profiler, info):
+        directory = get_profile_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+
+        view_name = get_view_name(request)
+        now = timezone.now()
+        slug = re.sub(r'[^\w.-]+', '_', view_name)[:50]
+        name = f'{now:%Y%m%d-%H%M%S-%f}-{slug}'
+
+        profiler.dump_stats(directory / f'{name}.prof')
+        (directory / f'{name}.json').write_text(json.dumps({
+            **info,
+            'created_at': now.isoformat(),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': view_name,
+            'status': response.status_code,
+            'user': request.user.get_username() if request.user.is_authenticated else None,
+        }, ensure_ascii=False), encoding='utf-8')
+
+        self.cleanup(directory)
+        return name
+
+    def cleanup(self, directory):
+        """Оставляет только PROFILING_MAX_FILES последних профилей"""
+        max_files = getattr(settings, 'PROFILING_MAX_FILES', 200)
+        for info in load_profiles(directory)[max_files:]:
+            for suffix in ('.prof', '.json'):
+                (directory / f"{info['name']}{suffix}").unlink(missing_ok=True)
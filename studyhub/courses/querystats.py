@@ -0,0 +1,185 @@
+"""
+Учет SQL-запросов в рамках одного HTTP-запроса.
+
+QueryBudgetMiddleware считает количество запросов, время в базе и
+повторяющиеся запросы (один и тот же SQL с разными параметрами - типичный
+признак N+1). Работает при DEBUG или QUERY_STATS = True: разбор каждого
+запроса в рабочем режиме не нужен. Результат доступен как request.query_stats,
+пишется в лог 'courses.queries', а при DEBUG отдается в заголовках ответа:
+
+    X-DB-Queries: 7
+    X-DB-Duplicates: 0
+    X-DB-Time: 3.1
+    Server-Timing: db;dur=3.1;desc="7 queries"
+
+Для произвольного участка кода:
+
+    with collect_queries() as stats:
+        ...
+    stats.count, stats.duration, stats.duplicates
+
+В асинхронном коде - acollect_queries (async with).
+"""
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('courses.queries')
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_RE = re.compile(r'%s|\?')
+_IN_LIST_RE = re.compile(r'IN \((?:\?, )*\?\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """
+    Вид запроса без конкретных значений: литералы и параметры заменяются на ?,
+    списки IN (...) любой длины сворачиваются
+    """
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _PLACEHOLDER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class QueryStats:
+    """Счетчик запросов; подключается к соединениям как execute_wrapper"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """Запросы, выполненные больше одного раза: {fingerprint: количество}"""
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+    @property
+    def duplicate_count(self):
+        """Сколько запросов было лишними повторами"""
+        return sum(count - 1 for count in self.duplicates.values())
+
+    @property
+    def duration_ms(self):
+        return self.duration * 1000
+
+
+@contextmanager
+def collect_queries(using=None):
+    """Считает запросы ко всем базам (или только к using) внутри блока"""
+    stats = QueryStats()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+        yield stats
+
+
+@asynccontextmanager
+async def acollect_queries(using=None):
+    """
+    collect_queries для асинхронного кода. Соединения у каждого потока свои,
+    а async ORM выполняет запросы в потоке sync_to_async, поэтому счетчик
+    подключается и отключается в том же потоке.
+    """
+    stats = QueryStats()
+    aliases = [using] if using else list(connections)
+    stack = ExitStack()
+
+    def install():
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+
+    await sync_to_async(install)()
+    try:
+        yield stats
+    finally:
+        await sync_to_async(stack.close)()
+
+
+class QueryBudgetMiddleware:
+    """
+    Считает запросы к базе за время обработки запроса.
+    Пишет предупреждение в лог, если запросов больше QUERY_COUNT_WARNING
+    или повторов больше DUPLICATE_QUERY_WARNING. Должен стоять первым,
+    чтобы учитывать запросы сессий и аутентификации. Без QUERY_STATS
+    отключается при загрузке (MiddlewareNotUsed).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_STATS', settings.DEBUG):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with collect_queries() as stats:
+            response = self.get_response(request)
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        async with acollect_queries() as stats:
+            response = await self.get_response(request)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        request.query_stats = stats
+        self.report(request, stats)
+        if settings.DEBUG:
+            self.add_headers(response, stats)
+        return response
+
+    def report(self, request, stats):
+        count_limit = getattr(settings, 'QUERY_COUNT_WARNING', 50)
+        duplicate_limit = getattr(settings, 'DUPLICATE_QUERY_WARNING', 5)
+
+        over_count = count_limit is not None and stats.count > count_limit
+        over_duplicates = duplicate_limit is not None and stats.duplicate_count > duplicate_limit
+        if over_count or over_duplicates:
+            top = sorted(stats.duplicates.items(), key=lambda item: item[1], reverse=True)[:3]
+            logger.warning(
+                '%s %s: %d запросов (%d повторов), %.1f мс в базе. Частые повторы: %s',
+                request.method, request.path, stats.count, stats.duplicate_count,
+                stats.duration_ms, '; '.join(f'{count} x {sql[:200]}' for sql, count in top),
+            )
+        else:
+            logger.debug(
+                '%s %s: %d запросов (%d повторов), %.1f мс в базе',
+                request.method, request.path, stats.count, stats.duplicate_count, stats.duration_ms,
+            )
+
+    def add_headers(self, response, stats):
+        response['X-DB-Queries'] = str(stats.count)
+        response['X-DB-Duplicates'] = str(stats.duplicate_count)
+        response['X-DB-Time'] = f'{stats.duration_ms:.1f}'
+        server_timing = f'db;dur={stats.duration_ms:.1f};desc="{stats.count} queries"'
+        if response.has_header('Server-Timing'):
+            server_timing = f"{response['Server-Timing']}, {server_timing}"
+        response['Server-Timing'] = server_timing
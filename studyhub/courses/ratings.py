@@ -0,0 +1,27 @@
+"""
+Денормализованный рейтинг курса: Course.review_count и Course.average_rating.
+
+Значения пересчитываются сигналами post_save/post_delete модели Review
+одним UPDATE с подзапросами - одновременные отзывы не затирают друг
+друга, а карточки курсов читают рейтинг без агрегации по отзывам.
+"""
+from django.db.models import Avg, Count, DecimalField, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce
+from django.utils import timezone
+
+from .models import Course, Review
+
+
+def rating_expressions():
+    """Выражения для update(): количество отзывов и средняя оценка курса"""
+    reviews = Review.objects.filter(course=OuterRef('pk')).order_by().values('course')
+    average = Cast(Avg('rating'), DecimalField(max_digits=3, decimal_places=2))
+    return {
+        'review_count': Coalesce(Subquery(reviews.annotate(count=Count('pk')).values('count')), 0),
+        'average_rating': Subquery(reviews.annotate(average=average).values('average')),
+    }
+
+
+def update_course_rating(course_id):
+    """Пересчитывает рейтинг курса; updated_at сдвигается, чтобы сменились ETag и кэш карточек"""
+    Course.objects.filter(pk=course_id).update(updated_at=timezone.now(), **rating_expressions())
@@ -0,0 +1,47 @@
+"""
+Роль пользователя текущего запроса.
+
+Роль берется из request.user_role, который заполняет UserRoleMiddleware
+(см. middleware.py), поэтому проверки прав не обращаются к профилю.
+Значения ролей заданы один раз - в UserProfile.
+"""
+from .models import UserProfile
+
+
+def get_user_role(request):
+    """
+    Роль текущего пользователя ('student', 'tutor', 'admin') или None.
+    Берется из request.user_role, если подключен UserRoleMiddleware.
+    """
+    if hasattr(request, 'user_role'):
+        return request.user_role
+    if not request.user.is_authenticated:
+        return None
+    user_profile = getattr(request.user, 'user_profile', None)
+    return user_profile.role if user_profile else None
+
+
+async def aget_request_user(request):
+    """
+    request.user для асинхронных представлений. UserRoleMiddleware уже
+    загрузил пользователя, поэтому обращения к базе не будет; без него
+    пользователь загружается через request.auser().
+    """
+    if hasattr(request, 'user_role'):
+        return request.user
+    return await request.auser()
+
+
+def is_tutor(request):
+    """Пользователь запроса - преподаватель"""
+    return get_user_role(request) == UserProfile.TUTOR
+
+
+def is_admin(request):
+    """Пользователь запроса - администратор"""
+    return get_user_role(request) == UserProfile.ADMIN
+
+
+def is_tutor_or_admin(request):
+    """Пользователь запроса - преподаватель или администратор"""
+    return get_user_role(request) in UserProfile.STAFF_ROLES
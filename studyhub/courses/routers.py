@@ -0,0 +1,145 @@
+"""
+Маршрутизация запросов между основной базой и репликами для чтения.
+
+Чтение каталога (курсы, категории, модули, уроки, отзывы) уходит на реплики,
+все записи и остальные модели - на основную базу. Чтобы пользователь сразу
+видел свои изменения, после записи он на REPLICA_PIN_SECONDS закрепляется
+за основной базой (см. ReplicaPinningMiddleware).
+"""
+import contextvars
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE_NAME = 'primary_pin'
+
+# Модели, чтение которых можно отдавать репликам
+REPLICA_READ_MODELS = {
+    'courses.course',
+    'courses.category',
+    'courses.module',
+    'courses.lesson',
+    'courses.review',
+}
+
+# Запись этих моделей не закрепляет пользователя за основной базой
+IGNORED_WRITE_MODELS = {
+    'sessions.session',
+}
+
+# Закреплен ли текущий запрос за основной базой
+_pinned = contextvars.ContextVar('primary_pinned', default=False)
+# Была ли запись в текущем запросе
+_written = contextvars.ContextVar('primary_written', default=False)
+
+
+def get_replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def pin_to_primary():
+    """Все последующие чтения в этом запросе идут в основную базу"""
+    _pinned.set(True)
+
+
+class PrimaryReplicaRouter:
+    """Роутер: запись - в основную базу, чтение каталога - в случайную реплику"""
+
+    def db_for_read(self, model, **hints):
+        replicas = get_replica_aliases()
+        if not replicas or _pinned.get():
+            return DEFAULT_DB_ALIAS
+        if model._meta.label_lower not in REPLICA_READ_MODELS:
+            return DEFAULT_DB_ALIAS
+        # Внутри транзакции читаем из той же базы, куда пишем
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        # Сохранение сессии не меняет данные, которые читаются с реплик
+        if model._meta.label_lower not in IGNORED_WRITE_MODELS:
+            _written.set(True)
+            _pinned.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема на реплики приходит вместе с репликацией
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinningMiddleware:
+    """
+    Обеспечивает read-your-writes: если в запросе была запись, ставит cookie,
+    и следующие REPLICA_PIN_SECONDS секунд запросы этого клиента читают
+    только из основной базы (реплики могут отставать).
+
+    Под ASGI флаги передаются в поток async ORM через контекстные переменные,
+    а отметка о записи возвращается из него вместе с контекстом (asgiref).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not get_replica_aliases():
+            return self.get_response(request)
+
+        tokens = self.pin(request)
+        try:
+            response = self.get_response(request)
+            self.set_pin_cookie(response)
+        finally:
+            self.unpin(tokens)
+        return response
+
+    async def __acall__(self, request):
+        if not get_replica_aliases():
+            return await self.get_response(request)
+
+        tokens = self.pin(request)
+        try:
+            response = await self.get_response(request)
+            self.set_pin_cookie(response)
+        finally:
+            self.unpin(tokens)
+        return response
+
+    def pin(self, request):
+        pinned_until = request.COOKIES.get(PIN_COOKIE_NAME)
+        try:
+            pinned = pinned_until is not None and float(pinned_until) > time.time()
+        except ValueError:
+            pinned = False
+        return _pinned.set(pinned), _written.set(False)
+
+    def unpin(self, tokens):
+        pinned_token, written_token = tokens
+        _pinned.reset(pinned_token)
+        _written.reset(written_token)
+
+    def set_pin_cookie(self, response):
+        if _written.get():
+            pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                str(time.time() + pin_seconds),
+                max_age=pin_seconds,
+                httponly=True,
+                samesite='Lax',
+            )
@@ -1,7 +1,15 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from .models import UserProfile, Enrollment, Course, Category, Module, Lesson, Review
+from .middleware import bump_profile_version
+from .enrollments import invalidate_enrolled_course_ids
+from .caching import bump_namespace_version
+from .slowqueries import install as install_slow_query_log
+from .sync import record_deletion
+from .ratings import update_course_rating
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -11,4 +19,81 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.get_or_create(
             user=instance,
             defaults={'role': 'student'}  # Дефолтная роль, если не указана
-        )
\ No newline at end of file
+        )
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_user_role(sender, instance, **kwargs):
+    """Сбрасываем роль, закэшированную в сессии, при изменении профиля"""
+    bump_profile_version(instance.user_id)
+
+
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+def invalidate_enrollments(sender, instance, **kwargs):
+    """Сбрасываем кэш курсов, на которые записан пользователь"""
+    invalidate_enrolled_course_ids(instance)
+
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def update_rating(sender, instance, **kwargs):
+    """Пересчитываем денормализованный рейтинг курса (см. ratings.py)"""
+    update_course_rating(instance.course_id)
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Module)
+@receiver(post_delete, sender=Module)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Enrollment)
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def bump_cache_namespace(sender, instance, **kwargs):
+    """Увеличиваем версию пространства имен кэша измененной модели"""
+    bump_namespace_version(sender._meta.model_name)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_user_namespace(sender, instance, update_fields=None, **kwargs):
+    """
+    Имена пользователей выводятся в карточках курсов и отзывах.
+    Вход в систему сохраняет только last_login - кэш при этом не сбрасываем.
+    """
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_namespace_version('user')
+
+
+@receiver(post_delete, sender=Enrollment)
+@receiver(post_delete, sender=Module)
+@receiver(post_delete, sender=Lesson)
+def record_sync_tombstone(sender, instance, **kwargs):
+    """Запоминаем удаление для синхронизации мобильного приложения (см. sync.py)"""
+    record_deletion(instance)
+
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """Применяем настройки производительности SQLite к новому соединению"""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def enable_slow_query_log(sender, connection, **kwargs):
+    """Журнал медленных запросов для каждого соединения (см. slowqueries.py)"""
+    install_slow_query_log(connection)
@@ -0,0 +1,205 @@
+"""
+Журнал медленных запросов к базе.
+
+Обертка execute_wrapper подключается к каждому соединению (см. signals.py)
+и записывает запросы дольше SLOW_QUERY_THRESHOLD_MS в SLOW_QUERY_LOG -
+файл JSON Lines с ротацией. Каждая запись содержит:
+
+    {"time": ..., "duration_ms": 153.2, "fingerprint": "SELECT ... WHERE id = ?",
+     "sql": "...", "params": [...], "view": "course_list",
+     "frame": "courses/views.py:118 in get_context_data", "plan": ["SCAN courses_course"]}
+
+План (EXPLAIN) снимается автоматически для SELECT. Отчет по журналу:
+`manage.py slowqueries`.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import threading
+import time
+import traceback
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import transaction
+
+from .querystats import fingerprint
+
+logger = logging.getLogger('courses.slowqueries')
+logger.propagate = False
+
+# Маршрут, который обрабатывается в текущем запросе
+_current_view = contextvars.ContextVar('slow_query_view', default=None)
+# Выполняется EXPLAIN - его собственные запросы не записываем
+_explaining = contextvars.ContextVar('slow_query_explaining', default=False)
+
+_handler_lock = threading.Lock()
+_handler_path = None
+
+MAX_PARAM_LENGTH = 200
+
+
+def get_log_path():
+    return Path(getattr(settings, 'SLOW_QUERY_LOG', Path(settings.BASE_DIR) / 'logs' / 'slow_queries.jsonl'))
+
+
+def get_logger():
+    """Логгер с файлом из настроек (файл создается при первой записи)"""
+    global _handler_path
+    path = get_log_path()
+    if _handler_path != path:
+        with _handler_lock:
+            if _handler_path != path:
+                for handler in list(logger.handlers):
+                    logger.removeHandler(handler)
+                    handler.close()
+                path.parent.mkdir(parents=True, exist_ok=True)
+                handler = RotatingFileHandler(
+                    path,
+                    maxBytes=getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                    backupCount=getattr(settings, 'SLOW_QUERY_LOG_BACKUP_COUNT', 5),
+                    encoding='utf-8',
+                    delay=True,
+                )
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+                logger.setLevel(logging.INFO)
+                _handler_path = path
+    return logger
+
+
+def get_threshold():
+    """Порог в секундах или None, если журнал выключен"""
+    threshold_ms = getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', None)
+    return None if threshold_ms is None else threshold_ms / 1000
+
+
+def find_caller():
+    """Ближайший к запросу кадр стека из кода проекта (не Django и не библиотек)"""
+    base_dir = str(settings.BASE_DIR)
+    for frame in reversed(traceback.extract_stack()[:-3]):
+        filename = frame.filename
+        if not filename.startswith(base_dir) or filename == __file__ or 'site-packages' in filename:
+            continue
+        return f'{Path(filename).relative_to(base_dir)}:{frame.lineno} in {frame.name}'
+    return None
+
+
+def format_params(params):
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        params = params.values()
+    return [
+        value if isinstance(value, (int, float, bool, type(None))) else str(value)[:MAX_PARAM_LENGTH]
+        for value in params
+    ]
+
+
+def explain(connection, sql, params):
+    """План запроса; ошибки не должны мешать основному запросу"""
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    token = _explaining.set(True)
+    # Внутри транзакции ошибка EXPLAIN не должна прерывать ее (PostgreSQL)
+    savepoint = (
+        transaction.atomic(using=connection.alias) if connection.in_atomic_block
+        else contextlib.nullcontext()
+    )
+    try:
+        with savepoint, connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN не выполнен: {error}']
+    finally:
+        _explaining.reset(token)
+
+
+def log_slow_queries(execute, sql, params, many, context):
+    """execute_wrapper: записывает запросы дольше порога"""
+    threshold = get_threshold()
+    if threshold is None or _explaining.get():
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    if duration < threshold:
+        return result
+
+    connection = context['connection']
+    entry = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'duration_ms': round(duration * 1000, 2),
+        'database': connection.alias,
+        'fingerprint': fingerprint(sql),
+        'sql': sql,
+        'params': None if many else format_params(params),
+        'many': many,
+        'view': _current_view.get(),
+        'frame': find_caller(),
+        'plan': None if many else explain(connection, sql, params),
+    }
+    get_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+    return result
+
+
+def install(connection):
+    """Подключает журнал к соединению (один раз)"""
+    if log_slow_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_queries)
+
+
+def read_entries(path=None):
+    """Записи журнала вместе с ротированными файлами (старые первыми)"""
+    path = path or get_log_path()
+    backup_count = getattr(settings, 'SLOW_QUERY_LOG_BACKUP_COUNT', 5)
+    files = [path.with_name(f'{path.name}.{index}') for index in range(backup_count, 0, -1)] + [path]
+    for file in files:
+        if not file.exists():
+            continue
+        with file.open(encoding='utf-8') as lines:
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+class SlowQueryViewMiddleware:
+    """Запоминает имя маршрута, чтобы записи журнала знали, какая страница их вызвала"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _current_view.set(None)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_view.reset(token)
+
+    async def __acall__(self, request):
+        # Контекстные переменные копируются в поток sync_to_async вместе с запросами async ORM
+        token = _current_view.set(None)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        _current_view.set(match.view_name if match else view_func.__qualname__)
+        return None
@@ -0,0 +1,185 @@
+"""
+Дельта-синхронизация мобильного приложения (/api/sync?since=<курсор>).
+
+Клиент хранит курсор из прошлого ответа и получает только изменения по
+курсам, на которые записан: курсы, записи, модули, уроки и прогресс
+с updated_at позже курсора, а также удаленные объекты (SyncTombstone).
+По курсу, на который пользователь записался после курсора, приходит все
+содержимое. Без курсора или с курсором старше SYNC_TOMBSTONE_DAYS
+отдается полное состояние с reset: true - клиент заменяет им свои данные.
+
+Курсор - время сервера в микросекундах минус SYNC_CURSOR_LAG секунд,
+он никогда не уменьшается. Запас нужен для транзакций, которые записали
+updated_at раньше, а зафиксировались позже запроса: такие строки придут
+при следующей синхронизации. Строки из окна запаса могут прийти повторно -
+клиент применяет их по id, поэтому повтор безопасен.
+
+Таблицы передаются списком полей и строками-массивами, даты - в
+миллисекундах Unix. Если установлен msgpack и клиент прислал
+Accept: application/msgpack, ответ кодируется в msgpack:
+
+    {"cursor": "1760870400000000", "reset": false,
+     "lessons": {"fields": ["id", "module_id", "title", "content_html", ...], "rows": [[12, 3, ...]]},
+     "deleted": {"courses": [], "enrollments": [], "modules": [], "lessons": [7]}}
+"""
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .enrollments import get_enrolled_course_ids
+from .models import Course, Enrollment, Lesson, Module, Progress, SyncTombstone
+
+try:
+    import msgpack
+except ImportError:  # Необязательная зависимость: без нее ответ только в JSON
+    msgpack = None
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Передаваемые поля таблиц
+FIELDS = {
+    'courses': ('id', 'title', 'description', 'level', 'duration_hours', 'category_id', 'updated_at'),
+    'enrollments': ('id', 'course_id', 'enrolled_at', 'completed', 'updated_at'),
+    'modules': ('id', 'course_id', 'title', 'description', 'order', 'updated_at'),
+    # Текст урока - очищенный скомпилированный HTML (см. content.py), исходный content не передается
+    'lessons': (
+        'id', 'module_id', 'title', 'content_html', 'toc', 'word_count', 'order', 'duration_minutes', 'updated_at',
+    ),
+    'progress': ('id', 'lesson_id', 'completed', 'completed_at', 'updated_at'),
+}
+
+# Поле родителя для отметок об удалении: курс записи и модуля, модуль урока
+TOMBSTONE_PARENTS = {
+    Enrollment: 'course_id',
+    Module: 'course_id',
+    Lesson: 'module_id',
+}
+
+
+def parse_cursor(value):
+    """Момент из курсора запроса; None - полная синхронизация. Неверный курсор - ValueError"""
+    if not value:
+        return None
+    microseconds = int(value)
+    if microseconds < 0:
+        raise ValueError(value)
+    return EPOCH + timedelta(microseconds=microseconds)
+
+
+def make_cursor(moment):
+    return str((moment - EPOCH) // timedelta(microseconds=1))
+
+
+def to_millis(value):
+    if isinstance(value, datetime):
+        return (value - EPOCH) // timedelta(milliseconds=1)
+    return value
+
+
+def table(queryset, name):
+    fields = FIELDS[name]
+    rows = [[to_millis(value) for value in row] for row in queryset.values_list(*fields)]
+    return {'fields': list(fields), 'rows': rows}
+
+
+def get_changes(user, since=None, now=None):
+    """Изменения для пользователя после момента since (None - полное состояние)"""
+    now = now or timezone.now()
+    max_age = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 90))
+    # Отметки об удалении старше max_age удаляются - такой клиент получает все заново
+    reset = since is None or since < now - max_age
+    if reset:
+        since = None
+    cursor = now - timedelta(seconds=getattr(settings, 'SYNC_CURSOR_LAG', 5))
+    if since is not None and since > cursor:
+        cursor = since
+
+    course_ids = get_enrolled_course_ids(user)
+
+    def changed(queryset):
+        return queryset if since is None else queryset.filter(updated_at__gt=since)
+
+    enrollments = table(changed(Enrollment.objects.filter(user=user)).order_by('pk'), 'enrollments')
+    # Курсы, на которые пользователь записался после курсора, передаются целиком
+    enrolled_at = FIELDS['enrollments'].index('enrolled_at')
+    course_id = FIELDS['enrollments'].index('course_id')
+    since_millis = to_millis(since)
+    new_course_ids = [] if since is None else [
+        row[course_id] for row in enrollments['rows'] if row[enrolled_at] > since_millis
+    ]
+
+    def changed_content(queryset, course_field):
+        if since is None:
+            return queryset
+        return queryset.filter(Q(updated_at__gt=since) | Q(**{f'{course_field}__in': new_course_ids}))
+
+    courses = changed_content(Course.objects.filter(pk__in=course_ids), 'pk')
+    modules = changed_content(Module.objects.filter(course_id__in=course_ids), 'course_id')
+    lessons = changed_content(Lesson.objects.filter(module__course_id__in=course_ids), 'module__course_id')
+
+    changes = {
+        'cursor': make_cursor(cursor),
+        'reset': reset,
+        'courses': table(courses.order_by('pk'), 'courses'),
+        'enrollments': enrollments,
+        'modules': table(modules.order_by('pk'), 'modules'),
+        'lessons': table(lessons.filter(is_published=True).order_by('pk'), 'lessons'),
+        'progress': table(changed(Progress.objects.filter(user=user)).order_by('pk'), 'progress'),
+        'deleted': {'courses': [], 'enrollments': [], 'modules': [], 'lessons': []},
+    }
+    if since is not None:
+        changes['deleted'] = get_deletions(user, since, course_ids, lessons)
+    return changes
+
+
+def get_deletions(user, since, course_ids, changed_lessons):
+    """ID удаленных объектов; снятый с публикации урок для клиента тоже удален"""
+    tombstones = SyncTombstone.objects.filter(deleted_at__gt=since)
+    enrollments = list(
+        tombstones.filter(model='enrollment', user_id=user.pk).values_list('object_id', 'parent_id')
+    )
+    deleted_modules = list(
+        tombstones.filter(model='module', parent_id__in=course_ids).values_list('object_id', flat=True)
+    )
+    # Уроки удаленного модуля удаляются каскадом: их модуля уже нет в таблице
+    module_ids = [*Module.objects.filter(course_id__in=course_ids).values_list('pk', flat=True), *deleted_modules]
+    lessons = tombstones.filter(model='lesson', parent_id__in=module_ids).values_list('object_id', flat=True)
+    return {
+        # Курс удаляется с устройства, если запись на него удалена и не создана заново
+        'courses': sorted({parent_id for _, parent_id in enrollments} - set(course_ids)),
+        'enrollments': sorted(object_id for object_id, _ in enrollments),
+        'modules': sorted(deleted_modules),
+        'lessons': sorted([
+            *lessons,
+            *changed_lessons.filter(is_published=False).values_list('pk', flat=True),
+        ]),
+    }
+
+
+def encode(changes, accept=''):
+    """Тело ответа и Content-Type: msgpack по запросу клиента, иначе компактный JSON"""
+    if msgpack is not None and 'application/msgpack' in accept:
+        return msgpack.packb(changes), 'application/msgpack'
+    return json.dumps(changes, ensure_ascii=False, separators=(',', ':')), 'application/json'
+
+
+def record_deletion(instance):
+    """Отметка об удалении записи на курс, модуля или урока (вызывается сигналом post_delete)"""
+    model = type(instance)
+    SyncTombstone.objects.create(
+        model=model._meta.model_name,
+        object_id=instance.pk,
+        parent_id=getattr(instance, TOMBSTONE_PARENTS[model]),
+        user_id=getattr(instance, 'user_id', None),
+    )
+
+
+def prune_tombstones(now=None):
+    """Удаляет отметки старше SYNC_TOMBSTONE_DAYS (клиенты с таким курсором получают все заново)"""
+    now = now or timezone.now()
+    max_age = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 90))
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=now - max_age).delete()
+    return deleted
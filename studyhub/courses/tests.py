@@ -1,3 +1,1662 @@
-from django.test import TestCase
+import asyncio
+import importlib.util
+import io
+import json
+import re
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+from django.db.models import F
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.defaultfilters import linebreaks_filter
+from django.test import LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.views import View
+from django.utils import timezone
+
+from . import urls as course_urls
+from .benchmarks import SCENARIOS, compare, generate_data, run_suite
+from .caching import bump_namespace_version, cache_anonymous_page, get_namespace_version
+from .cloning import clone_course
+from .content import render_content
+from .enrollments import ENROLLED_IDS_KEY, aget_enrolled_course_ids, ais_enrolled, get_enrolled_course_ids, is_enrolled
+from .events import bus, event_stream, progress_channel
+from .forms import LessonForm
+from .loaders import DataLoader
+from .loadtest import ROLES, LoadPlan, LoadTest, assign_roles, parse_mix
+from .metrics import registry, render_metrics
+from .profiling import make_token
+from .querystats import collect_queries, fingerprint
+from .roles import is_admin, is_tutor, is_tutor_or_admin
+from .routers import PIN_COOKIE_NAME
+from .slowqueries import read_entries
+from .views import CatalogApiView, ReorderMixin
+
+from .models import (
+    LESSON_PREVIEW_LENGTH,
+    Category,
+    Course,
+    Enrollment,
+    Lesson,
+    Module,
+    Order,
+    OrderItem,
+    Progress,
+    Review,
+    SupportRequest,
+    SyncTombstone,
+    UserProfile,
+)
+
+
+def create_catalog(courses=3, modules=2, lessons=3):
+    """
+    Тестовые данные: преподаватель, студент, администратор и курсы
+    с модулями, уроками, записями, прогрессом, отзывами, заказами и обращениями.
+    """
+    tutor = User.objects.create_user('tutor', password='pass12345')
+    tutor.user_profile.role = 'tutor'
+    tutor.user_profile.save()
+
+    student = User.objects.create_user('student', password='pass12345')
+
+    admin = User.objects.create_user('admin', password='pass12345', is_staff=True)
+    admin.user_profile.role = 'admin'
+    admin.user_profile.save()
+
+    categories = [Category.objects.create(name=f'Категория {i}') for i in range(2)]
+    order = Order.objects.create(user=student, status='paid')
+
+    for i in range(courses):
+        course = Course.objects.create(
+            title=f'Курс Python {i}',
+            description='Описание курса',
+            author=tutor,
+            category=categories[i % len(categories)],
+            price=0 if i % 2 else 1000,
+            is_popular=i % 3 == 0,
+        )
+        for m in range(modules):
+            module = Module.objects.create(
+                course=course, title=f'Модуль {m}', description='Описание', order=m + 1
+            )
+            for n in range(lessons):
+                lesson = Lesson.objects.create(
+                    module=module, title=f'Урок {n}', content='Текст урока', order=n + 1
+                )
+                if n % 2 == 0:
+                    Progress.objects.create(user=student, lesson=lesson, completed=True)
+        Enrollment.objects.create(user=student, course=course)
+        Review.objects.create(course=course, user=student, rating=5, text='Отличный курс')
+        OrderItem.objects.create(order=order, course=course, price=course.price)
+        SupportRequest.objects.create(name='Иван', contact='ivan@example.com', message='Вопрос')
+
+    return {'tutor': tutor, 'student': student, 'admin': admin, 'order': order}
+
+
+def hot_urls():
+    """Адреса страниц с основной нагрузкой и пользователь, от имени которого они открываются"""
+    course = Course.objects.order_by('pk').first()
+    module = course.modules.order_by('order').first()
+    lesson = module.lessons.order_by('order').first()
+    category = course.category
+    return [
+        ('student', reverse('home')),
+        ('student', reverse('course_list')),
+        ('student', reverse('course_list') + f'?category={category.pk}'),
+        ('student', reverse('course_list') + '?level=beginner&free=on'),
+        ('student', reverse('course_list') + '?search=Python'),
+        ('student', reverse('course_detail', args=[course.pk])),
+        ('student', reverse('course_search') + '?q=Python'),
+        ('student', reverse('module_list', args=[course.pk])),
+        ('student', reverse('module_detail', args=[course.pk, module.pk])),
+        ('student', reverse('lesson_detail', args=[course.pk, module.pk, lesson.pk])),
+        ('student', reverse('my_courses')),
+        ('tutor', reverse('my_courses')),
+        ('student', reverse('orders_history')),
+        ('student', reverse('cart')),
+        ('student', reverse('tutors')),
+        ('student', reverse('course_recommendation') + '?coding_interest=5&level=beginner'),
+        ('admin', reverse('admin_stats')),
+        ('admin', reverse('support_requests_list')),
+        ('admin', reverse('support_requests_list') + '?status=completed'),
+    ]
+
+
+# Тесты не пишут в файлы dev-сервера: метрики - во временный каталог,
+# журнал медленных запросов выключен (SlowQueryLogTests включает его сам)
+TEST_SETTINGS = {
+    # Тесты не должны видеть данные, оставшиеся в файловом кэше от dev-сервера
+    'CACHES': {
+        **settings.CACHES,
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'studyhub-test',
+        },
+    },
+    'METRICS_DIR': Path(tempfile.gettempdir()) / 'studyhub-test-metrics',
+    'SLOW_QUERY_THRESHOLD_MS': None,
+    # Тесты читают request.query_stats; бюджеты проверяет QueryBudgetTests,
+    # поэтому предупреждения в лог не нужны
+    'QUERY_STATS': True,
+    'QUERY_COUNT_WARNING': None,
+    'DUPLICATE_QUERY_WARNING': None,
+}
+
+
+class TestEnvironmentMixin:
+    """
+    Настройки TEST_SETTINGS на время тестов класса (через override_settings,
+    поэтому не зависят от способа запуска). Кэш общий для всех тестов
+    процесса - очищаем его перед каждым тестом.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(override_settings(**TEST_SETTINGS))
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        for alias in ('default', 'local'):
+            caches[alias].clear()
+
+
+# Таблица и псевдоним в SQL Django: JOIN "auth_user" T4, FROM "courses_review" U0, FROM "t" AS "a"
+TABLE_ALIAS_RE = re.compile(r'(?:FROM|JOIN)\s+"(\w+)"(?:\s+AS\s+"(\w+)"|\s+([A-Z]\d+)\b)?')
+
+
+class QueryPlanTests(TestEnvironmentMixin, TestCase):
+    """
+    Запросы страниц с основной нагрузкой не должны читать большие таблицы
+    целиком (SCAN без индекса в EXPLAIN QUERY PLAN).
+    """
+
+    # Таблицы, которые растут вместе с пользователями и каталогом
+    WATCHED_TABLES = {
+        'courses_course',
+        'courses_module',
+        'courses_lesson',
+        'courses_review',
+        'courses_enrollment',
+        'courses_progress',
+        'courses_order',
+        'courses_orderitem',
+        'courses_supportrequest',
+        'courses_userprofile',
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_catalog()
+
+    def explain(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def table_aliases(self, sql):
+        """Псевдонимы таблиц из SQL: FROM "courses_review" U0 -> {'U0': 'courses_review'}"""
+        return {
+            alias: table
+            for table, quoted, plain in TABLE_ALIAS_RE.findall(sql)
+            for alias in (quoted or plain,) if alias
+        }
+
+    def full_scans(self, sql, params):
+        # Новые версии SQLite выводят псевдоним (SCAN U0), старые - таблицу (SCAN TABLE t AS U0);
+        # SCAN ... USING (COVERING) INDEX идет по индексу и полным чтением таблицы не считается
+        aliases = self.table_aliases(sql)
+        scans = []
+        for detail in self.explain(sql, params):
+            match = re.match(r'SCAN (?:TABLE )?(\w+)(?: AS \w+)?$', detail)
+            if match and aliases.get(match.group(1), match.group(1)) in self.WATCHED_TABLES:
+                scans.append(detail)
+        return scans
+
+    def test_scans_in_subqueries_are_detected(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN есть только в SQLite')
+        queryset = Course.objects.filter(pk__in=Review.objects.filter(text='x').values('course_id'))
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn('U0', sql)
+        self.assertTrue(self.full_scans(sql, params))
+
+    def test_hot_views_use_indexes(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN есть только в SQLite')
+
+        problems = []
+        for username, url in hot_urls():
+            self.client.force_login(self.users[username])
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+
+            for query in context.captured_queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                # captured_queries содержит SQL с подставленными параметрами
+                scans = self.full_scans(sql, ())
+                if scans:
+                    problems.append(f'{url}: {scans} <- {sql}')
+
+        self.assertEqual(problems, [], '\n'.join(problems))
+
+
+def budget_requests():
+    """
+    Запрос для каждого маршрута courses/urls.py:
+    {имя маршрута: (пользователь или None, метод, адрес, данные POST)}
+    """
+    course = Course.objects.order_by('pk').first()
+    course_ids = list(Course.objects.order_by('pk').values_list('pk', flat=True))
+    free_course = Course.objects.filter(is_free=True).order_by('pk').first()
+    paid_course = Course.objects.filter(is_free=False).order_by('pk').first()
+    module = course.modules.order_by('order').first()
+    lesson = module.lessons.order_by('order').first()
+    support_request = SupportRequest.objects.order_by('pk').first()
+    course_kwargs = {'course_pk': course.pk}
+    module_kwargs = {'course_pk': course.pk, 'module_pk': module.pk}
+
+    return {
+        'home': ('student', 'get', reverse('home'), None),
+        'about': ('student', 'get', reverse('about'), None),
+        'contact': ('student', 'get', reverse('contact'), None),
+        'contact_form': ('student', 'get', reverse('contact_form'), None),
+        'course_list': ('student', 'get', reverse('course_list') + '?search=Python', None),
+        'course_detail': ('student', 'get', reverse('course_detail', args=[course.pk]), None),
+        'course_create': ('tutor', 'get', reverse('course_create'), None),
+        'course_edit': ('tutor', 'get', reverse('course_edit', args=[course.pk]), None),
+        'course_update': ('tutor', 'get', reverse('course_update', args=[course.pk]), None),
+        'course_delete': ('tutor', 'get', reverse('course_delete', args=[course.pk]), None),
+        'course_clone': ('tutor', 'post', reverse('course_clone', args=[course.pk]), {}),
+        'course_search': ('student', 'get', reverse('course_search') + '?q=Python', None),
+        'register': (None, 'get', reverse('register'), None),
+        'login': (None, 'get', reverse('login'), None),
+        'logout': ('student', 'post', reverse('logout'), {}),
+        'my_courses': ('tutor', 'get', reverse('my_courses'), None),
+        'tutors': ('student', 'get', reverse('tutors'), None),
+        'profile_edit': ('student', 'get', reverse('profile_edit'), None),
+        'profile_update': ('student', 'get', reverse('profile_update'), None),
+        'add_review': ('admin', 'get', reverse('add_review', args=[course.pk]), None),
+        'enroll': ('student', 'get', reverse('enroll'), None),
+        'quick_enroll': ('admin', 'post', reverse('quick_enroll', args=[free_course.pk]), {}),
+        'assistant_faq': ('student', 'get', reverse('assistant_faq'), None),
+        'assistant_contact': ('student', 'get', reverse('assistant_contact'), None),
+        'admin_stats': ('admin', 'get', reverse('admin_stats'), None),
+        'course_recommendation': (
+            'student', 'get', reverse('course_recommendation') + '?coding_interest=5&level=beginner', None,
+        ),
+        'support_requests_list': ('admin', 'get', reverse('support_requests_list') + '?status=all', None),
+        'support_request_update_status': (
+            'admin', 'post', reverse('support_request_update_status', args=[support_request.pk]),
+            {'status': 'completed'},
+        ),
+        'cart': ('student', 'get', reverse('cart'), None),
+        'add_to_cart': ('admin', 'post', reverse('add_to_cart', args=[paid_course.pk]), {}),
+        'remove_from_cart': ('student', 'post', reverse('remove_from_cart', args=[paid_course.pk]), {}),
+        'checkout': ('student', 'get', reverse('checkout'), None),
+        'orders_history': ('student', 'get', reverse('orders_history'), None),
+        'module_list': ('student', 'get', reverse('module_list', kwargs=course_kwargs), None),
+        'module_create': ('tutor', 'get', reverse('module_create', kwargs=course_kwargs), None),
+        'module_reorder': (
+            'tutor', 'post', reverse('module_reorder', kwargs=course_kwargs),
+            {'order': list(course.modules.order_by('-order').values_list('pk', flat=True))},
+        ),
+        'module_detail': ('student', 'get', reverse('module_detail', kwargs=module_kwargs), None),
+        'module_edit': ('tutor', 'get', reverse('module_edit', kwargs=module_kwargs), None),
+        'module_delete': ('tutor', 'get', reverse('module_delete', kwargs=module_kwargs), None),
+        'lesson_create': ('tutor', 'get', reverse('lesson_create', kwargs=module_kwargs), None),
+        'lesson_reorder': (
+            'tutor', 'post', reverse('lesson_reorder', kwargs=module_kwargs),
+            {'order': list(module.lessons.order_by('-order').values_list('pk', flat=True))},
+        ),
+        'lesson_detail': (
+            'student', 'get', reverse('lesson_detail', kwargs={**module_kwargs, 'lesson_pk': lesson.pk}), None,
+        ),
+        'lesson_edit': ('tutor', 'get', reverse('lesson_edit', kwargs={**module_kwargs, 'pk': lesson.pk}), None),
+        'mark_lesson_completed': (
+            'student', 'post', reverse('mark_lesson_completed'), {'lesson_id': lesson.pk, 'completed': 'true'},
+        ),
+        'progress_stream': ('student', 'get', reverse('progress_stream'), None),
+        'api_sync': ('student', 'get', reverse('api_sync'), None),
+        'api_categories': (None, 'get', reverse('api_categories'), None),
+        'api_courses': (None, 'get', reverse('api_courses') + '?search=Python&fields=id,title,price', None),
+        'api_course': (None, 'get', reverse('api_course', args=[course.pk]), None),
+        'api_courses_batch': (
+            None, 'get', reverse('api_courses_batch') + '?ids=' + ','.join(str(pk) for pk in course_ids), None,
+        ),
+        'api_modules': (None, 'get', reverse('api_modules', kwargs=course_kwargs), None),
+        'api_lessons': (None, 'get', reverse('api_lessons', kwargs=module_kwargs), None),
+        'metrics': ('admin', 'get', reverse('metrics'), None),
+    }
+
+
+class QueryBudgetTests(TestEnvironmentMixin, TestCase):
+    """
+    Каждый маршрут имеет бюджет запросов к базе (с холодным кэшем).
+    Страница проверяется на нескольких объемах данных: количество запросов
+    не должно зависеть от числа курсов, модулей и уроков (признак N+1).
+    """
+
+    # Объемы данных: (курсов, модулей в курсе, уроков в модуле)
+    DATA_SIZES = [(2, 2, 2), (6, 4, 5)]
+
+    # Максимальное количество запросов для маршрута
+    QUERY_BUDGETS = {
+        'home': 9,
+        'about': 5,
+        'contact': 5,
+        'contact_form': 5,
+        'course_list': 8,
+        'course_detail': 16,
+        'course_create': 6,
+        'course_edit': 9,
+        'course_update': 9,
+        'course_delete': 9,
+        'course_clone': 15,
+        'course_search': 7,
+        'register': 0,
+        'login': 0,
+        'logout': 4,
+        'my_courses': 14,
+        'tutors': 7,
+        'profile_edit': 6,
+        'profile_update': 6,
+        'add_review': 6,
+        'enroll': 8,
+        'quick_enroll': 8,
+        'assistant_faq': 5,
+        'assistant_contact': 5,
+        'admin_stats': 8,
+        'course_recommendation': 6,
+        'support_requests_list': 10,
+        'support_request_update_status': 7,
+        'cart': 6,
+        'add_to_cart': 7,
+        'remove_from_cart': 5,
+        'checkout': 6,
+        'orders_history': 8,
+        'module_list': 8,
+        'module_create': 8,
+        'module_reorder': 12,
+        'module_detail': 10,
+        'module_edit': 10,
+        'module_delete': 11,
+        'lesson_create': 10,
+        'lesson_reorder': 12,
+        'lesson_detail': 15,
+        'lesson_edit': 12,
+        'mark_lesson_completed': 15,
+        'progress_stream': 5,
+        'api_sync': 11,
+        'api_categories': 2,
+        'api_courses': 2,
+        'api_course': 2,
+        'api_courses_batch': 1,
+        'api_modules': 3,
+        'api_lessons': 3,
+        'metrics': 5,
+    }
+
+    def measure(self, size):
+        """Количество запросов для каждого маршрута на данных размера size"""
+        counts = {}
+        with transaction.atomic():
+            users = create_catalog(*size)
+            # Корзина студента - все платные курсы
+            cart = list(Course.objects.filter(is_free=False).values_list('pk', flat=True))
+            for name, (username, method, url, data) in budget_requests().items():
+                caches['default'].clear()
+                caches['local'].clear()
+                self.client.logout()
+                if username:
+                    self.client.force_login(users[username])
+                    session = self.client.session
+                    session['cart'] = cart
+                    session.save()
+                response = getattr(self.client, method)(url, data) if data is not None else self.client.get(url)
+                self.assertLess(response.status_code, 400, f'{name}: {url}')
+                counts[name] = response.wsgi_request.query_stats.count
+            transaction.set_rollback(True)
+        return counts
+
+    def test_every_route_has_budget(self):
+        names = {pattern.name for pattern in course_urls.urlpatterns}
+        self.assertEqual(names - set(self.QUERY_BUDGETS), set())
+
+    def test_query_budgets(self):
+        results = [(size, self.measure(size)) for size in self.DATA_SIZES]
+
+        problems = []
+        for size, counts in results:
+            for name, count in counts.items():
+                if count > self.QUERY_BUDGETS[name]:
+                    problems.append(f'{name}: {count} запросов на данных {size}, бюджет {self.QUERY_BUDGETS[name]}')
+
+        (small_size, small), (large_size, large) = results[0], results[-1]
+        for name in small:
+            if large[name] > small[name]:
+                problems.append(
+                    f'{name}: запросов стало больше с ростом данных '
+                    f'({small[name]} на {small_size}, {large[name]} на {large_size})'
+                )
+
+        self.assertEqual(problems, [], '\n'.join(problems))
+
+
+class QueryStatsTests(TestEnvironmentMixin, TestCase):
+
+    def test_fingerprint_ignores_values(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id = %s AND name = \'x\' LIMIT 21'),
+            fingerprint('SELECT * FROM t WHERE id = %s AND name = \'y\' LIMIT 1'),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            fingerprint('SELECT * FROM t WHERE id IN (%s)'),
+        )
+
+    def test_duplicates_are_counted(self):
+        create_catalog(courses=2, modules=1, lessons=1)
+        with collect_queries() as stats:
+            for course in Course.objects.all():
+                course.modules.count()
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(stats.duplicate_count, 1)
+
+    @override_settings(DEBUG=True)
+    def test_debug_headers(self):
+        create_catalog(courses=1, modules=1, lessons=1)
+        response = self.client.get(reverse('course_list'))
+        self.assertEqual(response['X-DB-Queries'], str(response.wsgi_request.query_stats.count))
+        self.assertIn('X-DB-Duplicates', response)
+        self.assertIn('db;dur=', response['Server-Timing'])
+
+    @override_settings(QUERY_STATS=False)
+    def test_disabled_without_setting(self):
+        create_catalog(courses=1, modules=1, lessons=1)
+        response = self.client.get(reverse('course_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(hasattr(response.wsgi_request, 'query_stats'))
+
+    def test_warning_over_budget(self):
+        create_catalog(courses=1, modules=1, lessons=1)
+        with override_settings(QUERY_COUNT_WARNING=1):
+            with self.assertLogs('courses.queries', 'WARNING') as logs:
+                self.client.get(reverse('course_list'))
+        self.assertIn('GET /courses/', logs.output[0])
+        # По умолчанию в тестах пороги выключены - в выводе тестов нет предупреждений
+        with self.assertNoLogs('courses.queries', 'WARNING'):
+            self.client.get(reverse('course_list') + '?page=1')
+
+
+class EnrollmentCacheTests(TestEnvironmentMixin, TestCase):
+    """Кэш ID курсов, на которые записан пользователь (courses/enrollments.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_catalog(courses=2, modules=1, lessons=1)
+        cls.enrolled = tuple(Course.objects.order_by('pk').values_list('pk', flat=True))
+        cls.new_course = Course.objects.create(
+            title='Новый курс', description='Описание', author=cls.users['tutor'], price=0,
+        )
+
+    def fresh_student(self):
+        """Новый объект пользователя - как request.user следующего запроса"""
+        return User.objects.get(pk=self.users['student'].pk)
+
+    def test_ids_are_loaded_once(self):
+        student = self.fresh_student()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_enrolled_course_ids(student), self.enrolled)
+        # Повторно в рамках запроса и в следующих запросах - без обращения к базе
+        next_request_student = self.fresh_student()
+        with self.assertNumQueries(0):
+            self.assertTrue(is_enrolled(student, self.enrolled[0]))
+            self.assertFalse(is_enrolled(student, self.new_course))
+            self.assertEqual(get_enrolled_course_ids(next_request_student), self.enrolled)
+        self.assertEqual(get_enrolled_course_ids(AnonymousUser()), ())
+
+    async def test_async_ids_share_cache(self):
+        student = await User.objects.aget(pk=self.users['student'].pk)
+        self.assertEqual(await aget_enrolled_course_ids(student), self.enrolled)
+        self.assertTrue(await ais_enrolled(student, self.enrolled[-1]))
+        self.assertEqual(caches['default'].get(ENROLLED_IDS_KEY.format(student.pk)), self.enrolled)
+
+    def test_enroll_and_unenroll_invalidate_cache(self):
+        student = self.fresh_student()
+        self.assertFalse(is_enrolled(student, self.new_course))
+
+        # Запись через объект пользователя из запроса сбрасывает и значение на нем
+        enrollment = Enrollment.objects.create(user=student, course=self.new_course)
+        self.assertTrue(is_enrolled(student, self.new_course))
+        self.assertTrue(is_enrolled(self.fresh_student(), self.new_course))
+
+        enrollment.delete()
+        self.assertFalse(is_enrolled(student, self.new_course))
+        self.assertFalse(is_enrolled(self.fresh_student(), self.new_course))
+
+        # Удаление записи, загруженной без пользователя, сбрасывает общий кэш
+        Enrollment.objects.get(user=student, course_id=self.enrolled[0]).delete()
+        self.assertEqual(get_enrolled_course_ids(self.fresh_student()), self.enrolled[1:])
+
+    def test_quick_enroll_updates_course_page(self):
+        self.client.force_login(self.users['student'])
+        url = reverse('course_detail', args=[self.new_course.pk])
+        self.assertFalse(self.client.get(url).context['user_enrolled'])
+        self.client.post(reverse('quick_enroll', args=[self.new_course.pk]))
+        self.assertTrue(self.client.get(url).context['user_enrolled'])
+
+
+class SqliteConnectionTests(TestEnvironmentMixin, TestCase):
+
+    def test_busy_timeout_comes_from_options(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('настройки соединения SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            busy_timeout = cursor.fetchone()[0]
+        self.assertEqual(busy_timeout, connection.settings_dict['OPTIONS']['timeout'] * 1000)
+
+
+class ReplicaRoutingTests(TestEnvironmentMixin, TransactionTestCase):
+    """
+    Чтение каталога с реплики и закрепление за основной базой после записи
+    (courses/routers.py). TransactionTestCase: внутри транзакции TestCase
+    роутер всегда читает из основной базы.
+    """
+
+    replica = 'replica_test'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Реплика - второе соединение с той же тестовой базой (как TEST: MIRROR).
+        # Псевдоним добавляется после setUpClass, а соединение открывается в setUp
+        # через connect(): тестовый класс не дает открывать соединения с псевдонимами
+        # не из databases, а в databases могут быть только псевдонимы из настроек
+        connections.settings[cls.replica] = dict(connections[DEFAULT_DB_ALIAS].settings_dict)
+        cls.addClassCleanup(cls.remove_replica)
+
+    @classmethod
+    def remove_replica(cls):
+        connections[cls.replica].close()
+        del connections[cls.replica]
+        del connections.settings[cls.replica]
+
+    def setUp(self):
+        super().setUp()
+        # TransactionTestCase закрывает соединения после каждого теста (кроме SQLite в памяти)
+        if connections[self.replica].connection is None:
+            connections[self.replica].connect()
+        settings_override = override_settings(DATABASE_REPLICAS=[self.replica])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.users = create_catalog(courses=1, modules=1, lessons=1)
+        self.course = Course.objects.get()
+        self.lesson = Lesson.objects.get()
+
+    def get_modules(self):
+        """Список модулей и число запросов каталога к реплике и к основной базе"""
+        with CaptureQueriesContext(connections[self.replica]) as replica, \
+                CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            response = self.client.get(reverse('module_list', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 200)
+
+        def catalog_queries(context):
+            return [query for query in context.captured_queries if '"courses_module"' in query['sql']]
+
+        return response, len(catalog_queries(replica)), len(catalog_queries(primary))
+
+    def test_catalog_reads_go_to_replica(self):
+        response, replica, primary = self.get_modules()
+        self.assertEqual((replica > 0, primary), (True, 0))
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_write_pins_client_to_primary(self):
+        self.client.force_login(self.users['student'])
+        response = self.client.post(
+            reverse('mark_lesson_completed'), {'lesson_id': self.lesson.pk, 'completed': 'true'},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(PIN_COOKIE_NAME, response.cookies)
+
+        # Клиент с cookie читает только из основной базы
+        _, replica, primary = self.get_modules()
+        self.assertEqual((replica, primary > 0), (0, True))
+
+        # Без cookie (срок закрепления истек) чтение снова уходит на реплику
+        del self.client.cookies[PIN_COOKIE_NAME]
+        _, replica, primary = self.get_modules()
+        self.assertEqual((replica > 0, primary), (True, 0))
+
+
+class ProfileBackendTests(TestEnvironmentMixin, TestCase):
+    """Пользователь запроса загружается вместе с профилем (courses/backends.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_catalog(courses=1, modules=1, lessons=1)
+
+    def test_profile_costs_no_extra_query(self):
+        self.client.login(username='student', password='pass12345')
+        with CaptureQueriesContext(connection) as context:
+            user = self.client.get(reverse('about')).wsgi_request.user
+        profile_queries = [query for query in context.captured_queries if 'FROM "courses_userprofile"' in query['sql']]
+        self.assertEqual(profile_queries, [])
+        with self.assertNumQueries(0):
+            self.assertEqual(user.user_profile.role, 'student')
+
+    def test_role_helpers_follow_profile_roles(self):
+        for username, checks in {
+            'student': (False, False, False),
+            'tutor': (True, False, True),
+            'admin': (False, True, True),
+        }.items():
+            request = RequestFactory().get('/')
+            request.user = User.objects.select_related('user_profile').get(username=username)
+            profile = request.user.user_profile
+            self.assertEqual(checks, (profile.is_tutor(), profile.is_admin(), profile.is_tutor_or_admin()))
+            # С ролью из UserRoleMiddleware и без нее ответ одинаковый
+            for user_role in (None, profile.role):
+                if user_role:
+                    request.user_role = user_role
+                with self.subTest(username=username, user_role=user_role):
+                    self.assertEqual(checks, (is_tutor(request), is_admin(request), is_tutor_or_admin(request)))
+
+    def test_sessions_of_previous_backend_stay_logged_in(self):
+        self.client.force_login(self.users['student'], backend='django.contrib.auth.backends.ModelBackend')
+        self.assertTrue(self.client.get(reverse('about')).wsgi_request.user.is_authenticated)
+
+
+class PageCacheTests(TestEnvironmentMixin, TestCase):
+    """Кэш страниц для анонимных посетителей (cache_anonymous_page) и фрагментов шаблонов"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_catalog(courses=1, modules=1, lessons=1)
+        cls.course = Course.objects.get()
+
+    def counting_view(self, action=None):
+        """Декорированное представление, которое считает свои вызовы"""
+        calls = []
+
+        @cache_anonymous_page('course')
+        def view(request):
+            calls.append(request)
+            response = HttpResponse('ok')
+            if action:
+                action(request, response)
+            return response
+
+        return view, calls
+
+    def test_anonymous_page_is_cached(self):
+        url = reverse('course_detail', args=[self.course.pk])
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertIn('Cookie', response['Vary'])
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_session_and_messages_cookies_bypass_cache(self):
+        view, calls = self.counting_view()
+        factory = RequestFactory()
+        view(factory.get('/page/'))
+        for cookie_name in (settings.SESSION_COOKIE_NAME, CookieStorage.cookie_name):
+            request = factory.get('/page/')
+            request.COOKIES[cookie_name] = 'value'
+            response = view(request)
+            self.assertNotIn('X-Page-Cache', response)
+            self.assertIn('Cookie', response['Vary'])
+        self.assertEqual(len(calls), 3)
+
+        # Вошедший пользователь видит свою версию страницы, а не анонимную
+        self.client.get(reverse('course_detail', args=[self.course.pk]))
+        self.client.force_login(self.users['student'])
+        response = self.client.get(reverse('course_detail', args=[self.course.pk]))
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertTrue(response.context['user_enrolled'])
+
+    def test_responses_with_cookies_or_csrf_are_not_cached(self):
+        actions = {
+            'cookie': lambda request, response: response.set_cookie('theme', 'dark'),
+            'csrf': lambda request, response: get_token(request),
+        }
+        for name, action in actions.items():
+            with self.subTest(name):
+                view, calls = self.counting_view(action)
+                for _ in range(2):
+                    response = view(RequestFactory().get(f'/{name}/'))
+                    self.assertNotIn('X-Page-Cache', response)
+                    self.assertIn('Cookie', response['Vary'])
+                self.assertEqual(len(calls), 2)
+
+    def test_namespace_bump_invalidates_page(self):
+        view, calls = self.counting_view()
+        view(RequestFactory().get('/page/'))
+        self.assertEqual(view(RequestFactory().get('/page/'))['X-Page-Cache'], 'HIT')
+        bump_namespace_version('course')
+        self.assertEqual(view(RequestFactory().get('/page/'))['X-Page-Cache'], 'MISS')
+        self.assertEqual(len(calls), 2)
+
+        # Сохранение модели сбрасывает версию через сигнал
+        url = reverse('course_detail', args=[self.course.pk])
+        self.client.get(url)
+        self.course.title = 'Новое название'
+        self.course.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertContains(response, 'Новое название')
+
+    def test_course_card_follows_category_and_author(self):
+        # Вошедший пользователь получает страницу мимо кэша страниц, но с кэшем карточек
+        self.client.force_login(self.users['student'])
+        url = reverse('course_list')
+        self.assertContains(self.client.get(url), f'bi-tag"></i> {self.course.category.name}')
+
+        # Название категории есть и в фильтре каталога - проверяем строку карточки
+        category = self.course.category
+        category.name = 'Переименованная категория'
+        category.save()
+        self.assertContains(self.client.get(url), 'bi-tag"></i> Переименованная категория')
+
+        author = self.course.author
+        author.username = 'renamed_author'
+        author.save()
+        self.assertContains(self.client.get(url), 'renamed_author')
+
+    def test_login_keeps_user_namespace(self):
+        version = get_namespace_version('user')
+        self.assertTrue(self.client.login(username='student', password='pass12345'))
+        self.assertEqual(get_namespace_version('user'), version)
+
+
+class AsyncViewTests(TestEnvironmentMixin, TestCase):
+    """Асинхронные представления через ASGI-обработчик (AsyncClient)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_catalog(courses=2, modules=2, lessons=3)
+        cls.course = Course.objects.order_by('pk').first()
+        cls.module = cls.course.modules.order_by('order').first()
+        cls.lessons = list(cls.module.lessons.order_by('order'))
+
+    def lesson_url(self, lesson):
+        return reverse('lesson_detail', args=[self.course.pk, self.module.pk, lesson.pk])
+
+    async def test_course_list(self):
+        response = await self.async_client.get(reverse('course_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['courses']), 2)
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        self.assertEqual(len(response.context['categories_with_counts']), 2)
+        # Запросы async ORM учтены QueryBudgetMiddleware в асинхронном режиме
+        self.assertGreater(response.asgi_request.query_stats.count, 0)
+
+        response = await self.async_client.get(reverse('course_list'))
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        response = await self.async_client.get(reverse('course_list') + '?page=5')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_course_detail(self):
+        await self.async_client.aforce_login(self.users['student'])
+        response = await self.async_client.get(reverse('course_detail', args=[self.course.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['modules']), 2)
+        self.assertEqual(response.context['review_count'], 1)
+        self.assertEqual(response.context['average_rating'], 5)
+        self.assertTrue(response.context['has_reviewed'])
+        self.assertTrue(response.context['user_enrolled'])
+        self.assertEqual(response.context['user_progress']['completed_lessons'], 4)
+        self.assertEqual(response.context['user_progress']['percentage'], 66)
+
+    async def test_lesson_detail(self):
+        await self.async_client.aforce_login(self.users['student'])
+        response = await self.async_client.get(self.lesson_url(self.lessons[-1]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['previous_lesson'], self.lessons[-2])
+        self.assertNotIn('next_lesson', response.context)
+        self.assertTrue(response.context['user_progress']['completed'])
+        self.assertEqual(response.context['module_progress'], {'completed': 2, 'total': 3, 'percentage': 66})
+        self.assertEqual(response.context['course_progress']['completed'], 4)
+
+        response = await self.async_client.get(
+            reverse('lesson_detail', args=[self.course.pk, self.module.pk, 0])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_mark_lesson_completed(self):
+        url = reverse('mark_lesson_completed')
+        data = {'lesson_id': self.lessons[1].pk, 'completed': 'true'}
+        response = await self.async_client.post(url, data)
+        self.assertEqual(response.status_code, 403)
+
+        await self.async_client.aforce_login(self.users['student'])
+        response = await self.async_client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        result = response.json()
+        self.assertEqual((result['module_completed'], result['module_total']), (3, 3))
+        self.assertEqual((result['course_completed'], result['course_total']), (5, 6))
+        self.assertTrue(
+            await Progress.objects.filter(user=self.users['student'], lesson=self.lessons[1], completed=True).aexists()
+        )
+
+
+class ProgressStreamTests(TestEnvironmentMixin, TestCase):
+    """Поток событий прогресса (Server-Sent Events) и шина событий"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = create_catalog(courses=1, modules=1, lessons=2)
+        cls.lesson = Lesson.objects.select_related('module').order_by('order').last()
+        cls.lesson_url = reverse('lesson_detail', kwargs={
+            'course_pk': cls.lesson.module.course_id, 'module_pk': cls.lesson.module_id, 'lesson_pk': cls.lesson.pk,
+        })
+
+    def setUp(self):
+        super().setUp()
+        bus.reset()
+        self.addCleanup(bus.reset)
+
+    async def test_progress_is_pushed_to_other_devices(self):
+        phone, laptop = self.async_client, self.async_client_class()
+        await phone.aforce_login(self.users['student'])
+        await laptop.aforce_login(self.users['student'])
+
+        response = await laptop.get(reverse('progress_stream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            await phone.post(reverse('mark_lesson_completed'), {'lesson_id': self.lesson.pk, 'completed': 'true'})
+            chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+        finally:
+            await stream.aclose()
+
+        self.assertTrue(chunk.startswith('event: progress\n'))
+        data = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual(data['lesson_id'], self.lesson.pk)
+        self.assertTrue(data['completed'])
+        self.assertEqual((data['module_completed'], data['module_total'], data['module_progress']), (2, 2, 100))
+
+    async def test_anonymous_stream_is_forbidden(self):
+        response = await self.async_client.get(reverse('progress_stream'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_wsgi_gets_no_stream(self):
+        # Под WSGI поток занимал бы рабочий поток - короткий ответ без тела
+        self.client.force_login(self.users['student'])
+        response = self.client.get(reverse('progress_stream'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+        self.assertNotContains(self.client.get(self.lesson_url), 'EventSource(')
+
+    async def test_asgi_lesson_page_subscribes(self):
+        await self.async_client.aforce_login(self.users['student'])
+        response = await self.async_client.get(self.lesson_url)
+        self.assertContains(response, 'EventSource(')
+
+    async def test_keepalive_and_max_duration(self):
+        chunks = [chunk async for chunk in event_stream('progress:0', keepalive=0.01, max_duration=0.05)]
+        self.assertEqual(chunks[0], 'retry: 3000\n\n')
+        self.assertIn(': keepalive\n\n', chunks)
+
+    async def test_delivery_from_other_thread_and_overflow(self):
+        subscription = bus.subscribe(progress_channel(1))
+        await asyncio.to_thread(bus.publish, progress_channel(1), 'progress', {'n': 0})
+        self.assertEqual(await subscription.get(timeout=5), {'event': 'progress', 'data': {'n': 0}})
+
+        # Медленный подписчик теряет самые старые события
+        for n in range(subscription.queue.maxsize + 1):
+            bus.publish(progress_channel(1), 'progress', {'n': n})
+        await asyncio.sleep(0)
+        self.assertEqual((await subscription.get(timeout=1))['data'], {'n': 1})
+        subscription.close()
+        self.assertEqual(bus.subscriptions, {})
+
+
+@override_settings(SYNC_CURSOR_LAG=0)
+class SyncTests(TestEnvironmentMixin, TestCase):
+    """Дельта-синхронизация мобильного приложения (/api/sync)"""
+
+    def setUp(self):
+        super().setUp()
+        self.users = create_catalog(courses=2, modules=2, lessons=2)
+        self.student = self.users['student']
+        self.client.force_login(self.student)
+
+        # Курс, на который студент запишется после первой синхронизации
+        self.new_course = Course.objects.create(
+            title='Новый курс', description='Описание', author=self.users['tutor'], price=0,
+        )
+        self.new_module = Module.objects.create(course=self.new_course, title='Модуль', description='-', order=1)
+        self.new_lesson = Lesson.objects.create(module=self.new_module, title='Урок', content='-', order=1)
+
+    def sync(self, cursor=None, status=200):
+        response = self.client.get(reverse('api_sync'), {'since': cursor} if cursor else {})
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def ids(self, changes, name):
+        return sorted(row[0] for row in changes[name]['rows'])
+
+    def test_full_sync(self):
+        changes = self.sync()
+        self.assertTrue(changes['reset'])
+        self.assertEqual(len(changes['courses']['rows']), 2)
+        self.assertEqual(len(changes['modules']['rows']), 4)
+        self.assertEqual(len(changes['lessons']['rows']), 8)
+        self.assertEqual(len(changes['progress']['rows']), Progress.objects.filter(user=self.student).count())
+        self.assertEqual(changes['lessons']['fields'][:2], ['id', 'module_id'])
+        self.assertNotIn('content', changes['lessons']['fields'])
+        self.assertIn('content_html', changes['lessons']['fields'])
+
+    def test_delta_contains_only_changes(self):
+        cursor = self.sync()['cursor']
+        unchanged = self.sync(cursor)
+        self.assertFalse(unchanged['reset'])
+        for name in ('courses', 'enrollments', 'modules', 'lessons', 'progress'):
+            self.assertEqual(unchanged[name]['rows'], [], name)
+        self.assertGreaterEqual(int(unchanged['cursor']), int(cursor))
+
+        lessons = list(Lesson.objects.filter(module__course__enrollment__user=self.student).order_by('pk'))
+        lessons[0].title = 'Новое название'
+        lessons[0].save()
+        lessons[1].is_published = False
+        lessons[1].save()
+        progress = Progress.objects.create(user=self.student, lesson=lessons[3], completed=True)
+        deleted_module = lessons[-1].module
+        deleted_module_id = deleted_module.pk
+        deleted_lessons = list(deleted_module.lessons.values_list('pk', flat=True))
+        deleted_module.delete()
+        enrollment = Enrollment.objects.create(user=self.student, course=self.new_course)
+
+        delta = self.sync(cursor)
+        self.assertEqual(self.ids(delta, 'lessons'), [lessons[0].pk, self.new_lesson.pk])
+        self.assertEqual(self.ids(delta, 'modules'), [self.new_module.pk])
+        self.assertEqual(self.ids(delta, 'courses'), [self.new_course.pk])
+        self.assertEqual(self.ids(delta, 'enrollments'), [enrollment.pk])
+        self.assertEqual(self.ids(delta, 'progress'), [progress.pk])
+        self.assertEqual(delta['deleted']['modules'], [deleted_module_id])
+        self.assertEqual(delta['deleted']['lessons'], sorted([lessons[1].pk, *deleted_lessons]))
+
+        # Отписка: курс удаляется с устройства
+        cursor = delta['cursor']
+        old_enrollment = Enrollment.objects.filter(user=self.student).exclude(pk=enrollment.pk).first()
+        old_enrollment_id = old_enrollment.pk
+        old_enrollment.delete()
+        delta = self.sync(cursor)
+        self.assertEqual(delta['deleted']['enrollments'], [old_enrollment_id])
+        self.assertEqual(delta['deleted']['courses'], [old_enrollment.course_id])
+
+    def test_old_or_invalid_cursor(self):
+        self.assertTrue(self.sync('1')['reset'])
+        self.sync('abc', status=400)
+        self.client.logout()
+        self.sync(status=403)
+
+    def test_prune_tombstones(self):
+        self.new_module.delete()
+        SyncTombstone.objects.update(deleted_at=timezone.now() - timedelta(days=91))
+        out = io.StringIO()
+        call_command('prune_sync_tombstones', stdout=out)
+        self.assertIn('Удалено отметок: 2', out.getvalue())
+        self.assertFalse(SyncTombstone.objects.exists())
+
+
+class CatalogApiTests(TestEnvironmentMixin, TestCase):
+    """JSON API каталога: поля, курсорная пагинация, фильтры и ETag"""
+
+    def setUp(self):
+        super().setUp()
+        create_catalog(courses=5, modules=2, lessons=3)
+        self.course = Course.objects.order_by('pk').first()
+        self.module = self.course.modules.order_by('order').first()
+
+    def test_cursor_pagination_walks_catalog(self):
+        ids = []
+        params = {'limit': 2, 'fields': 'id,title'}
+        while True:
+            data = self.client.get(reverse('api_courses'), params).json()
+            self.assertTrue(all(set(row) == {'id', 'title'} for row in data['results']))
+            ids += [row['id'] for row in data['results']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        expected = Course.objects.filter(is_published=True).order_by('-created_at', '-id')
+        self.assertEqual(ids, list(expected.values_list('pk', flat=True)))
+
+    def test_filters_match_catalog(self):
+        category = self.course.category
+        data = self.client.get(reverse('api_courses'), {'category': category.pk, 'free': 'on'}).json()
+        expected = Course.objects.filter(category=category, is_free=True, is_published=True)
+        self.assertEqual(sorted(row['id'] for row in data['results']), sorted(expected.values_list('pk', flat=True)))
+
+    def test_etag_not_modified(self):
+        url = reverse('api_course', args=[self.course.pk])
+        response = self.client.get(url)
+        etag = response.headers['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.headers['ETag'], etag)
+        self.assertEqual(not_modified.wsgi_request.query_stats.count, 1)
+
+        self.course.title = 'Новое название'
+        self.course.save()
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+        self.assertEqual(changed.json()['title'], 'Новое название')
+
+    def test_lessons_of_published_course(self):
+        lesson = self.module.lessons.order_by('order').first()
+        lesson.is_published = False
+        lesson.save()
+        url = reverse('api_lessons', kwargs={'course_pk': self.course.pk, 'module_pk': self.module.pk})
+        data = self.client.get(url).json()
+        self.assertNotIn(lesson.pk, [row['id'] for row in data['results']])
+        self.assertNotIn('content_html', data['results'][0])
+        row = self.client.get(url, {'fields': 'id,content_html,toc'}).json()['results'][0]
+        self.assertEqual(row['content_html'], '<p>Текст урока</p>')
+        self.assertEqual(row['toc'], [])
+        # Исходный текст (возможно, неочищенный HTML автора) не отдается
+        self.assertEqual(self.client.get(url, {'fields': 'id,content'}).status_code, 400)
+
+        Course.objects.filter(pk=self.course.pk).update(is_published=False)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api_course', args=[self.course.pk])).status_code, 404)
+
+    def test_invalid_params(self):
+        for params in ({'fields': 'id,password'}, {'cursor': 'abc'}, {'limit': 1000}, {'category': 'abc'}):
+            self.assertEqual(self.client.get(reverse('api_courses'), params).status_code, 400, params)
+
+    def test_batch_cards(self):
+        unpublished = Course.objects.order_by('pk')[1]
+        Course.objects.filter(pk=unpublished.pk).update(is_published=False)
+        ids = [self.course.pk, unpublished.pk, 999999, self.course.pk]
+        response = self.client.get(reverse('api_courses_batch'), {'ids': ','.join(map(str, ids))})
+        data = response.json()
+        self.assertEqual([card['id'] for card in data['results']], [self.course.pk])
+        self.assertEqual(data['missing'], [unpublished.pk, 999999])
+        self.assertEqual(data['results'][0]['author']['username'], 'tutor')
+        self.assertEqual(data['results'][0]['review_count'], 1)
+        self.assertEqual(response.wsgi_request.query_stats.count, 1)
+
+        too_many = ','.join(str(pk) for pk in range(1, 200))
+        self.assertEqual(self.client.get(reverse('api_courses_batch'), {'ids': too_many}).status_code, 400)
+
+    def test_data_loader_coalesces_keys(self):
+        calls = []
+
+        def batch_load(keys):
+            calls.append(list(keys))
+            return {key: key * 10 for key in keys if key != 3}
+
+        loader = DataLoader(batch_load)
+        first, second, again = loader.load(1), loader.load(2), loader.load(1)
+        self.assertEqual(calls, [])
+        self.assertEqual(first + second + again, 40)
+        self.assertEqual(calls, [[1, 2]])
+        self.assertEqual(loader.load_many([2, 3, 4]), [20, None, 40])
+        self.assertEqual(calls, [[1, 2], [3, 4]])
+
+    def test_api_view_without_queryset_is_misconfigured(self):
+        view = CatalogApiView()
+        view.setup(RequestFactory().get('/'))
+        with self.assertRaises(ImproperlyConfigured):
+            view.get_queryset()
+
+    def test_home_sections_share_one_course_query(self):
+        # Популярные бесплатные курсы выводятся в обоих блоках главной
+        Course.objects.update(is_popular=True, price=0, is_free=True)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('home'))
+        featured = [course.pk for course in response.context['featured_courses']]
+        free = [course.pk for course in response.context['free_courses']]
+        self.assertEqual(len(featured), 3)
+        self.assertEqual(featured, free)
+        card_queries = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and '"courses_course"."description"' in query['sql']
+        ]
+        self.assertEqual(len(card_queries), 1)
+
+    def test_rating_is_denormalized(self):
+        other = User.objects.create_user('other', password='pass12345')
+        review = Review.objects.create(course=self.course, user=other, rating=2, text='Так себе')
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.review_count, self.course.average_rating), (2, Decimal('3.50')))
+
+        review.delete()
+        self.course.refresh_from_db()
+        self.assertEqual((self.course.review_count, self.course.average_rating), (1, Decimal('5.00')))
+
+
+class ListProjectionTests(TestEnvironmentMixin, TestCase):
+    """Списки не загружают полное описание курса и текст уроков"""
+
+    def setUp(self):
+        super().setUp()
+        self.users = create_catalog(courses=3, modules=1, lessons=2)
+        self.client.force_login(self.users['student'])
+
+    def test_course_lists_defer_full_description(self):
+        for url in (reverse('course_list'), reverse('course_search') + '?q=Python'):
+            courses = list(self.client.get(url).context['courses'])
+            self.assertTrue(courses, url)
+            for course in courses:
+                self.assertIn('full_description', course.get_deferred_fields(), url)
+
+    def test_lesson_outline(self):
+        lesson = Lesson.objects.order_by('pk').first()
+        lesson.content = 'А' * 300
+        lesson.save()
+
+        outlined = Lesson.objects.outline().get(pk=lesson.pk)
+        self.assertIn('content', outlined.get_deferred_fields())
+        self.assertEqual(len(outlined.content_preview), LESSON_PREVIEW_LENGTH + 1)
+
+        module = lesson.module
+        url = reverse('module_detail', kwargs={'course_pk': module.course_id, 'module_pk': module.pk})
+        response = self.client.get(url)
+        self.assertContains(response, 'А' * (LESSON_PREVIEW_LENGTH - 1) + '…')
+        self.assertNotContains(response, 'А' * LESSON_PREVIEW_LENGTH)
+        for lesson in response.context['lessons']:
+            self.assertIn('content', lesson.get_deferred_fields())
+
+
+class LessonContentTests(TestEnvironmentMixin, TestCase):
+    """Содержание урока компилируется в HTML при сохранении"""
+
+    def setUp(self):
+        super().setUp()
+        self.users = create_catalog(courses=1, modules=1, lessons=1)
+        self.lesson = Lesson.objects.get()
+
+    def test_html_is_sanitized_on_save(self):
+        self.lesson.content_format = 'html'
+        self.lesson.content = (
+            '<h1>Введение</h1><p onclick="steal()">Текст <b>урока</b><script>alert(1)</script></p>'
+            '<a href="jav&#x09;ascript:alert(1)">ссылка</a><h3>Детали</h3><p>Без <em>закрытия'
+        )
+        self.lesson.save()
+        self.lesson.refresh_from_db()
+
+        html = self.lesson.content_html
+        for dangerous in ('script', 'alert', 'onclick', 'javascript'):
+            self.assertNotIn(dangerous, html)
+        self.assertIn('<h2 id="введение">Введение</h2>', html)
+        self.assertTrue(html.endswith('<em>закрытия</em></p>'))
+        self.assertEqual(self.lesson.toc, [
+            {'level': 2, 'id': 'введение', 'title': 'Введение'},
+            {'level': 3, 'id': 'детали', 'title': 'Детали'},
+        ])
+        self.assertEqual(self.lesson.word_count, 7)
+
+    def test_text_renders_like_linebreaks(self):
+        text = 'Первая строка\nвторая\n\n<b>Абзац</b> & co'
+        self.assertEqual(render_content(text)[0], linebreaks_filter(text, autoescape=True))
+
+    def test_markdown(self):
+        html, toc, _ = render_content('## Шаг 1\n\n*важно* <script>x</script>', 'markdown')
+        self.assertIn('<em>важно</em>', html)
+        self.assertNotIn('<script>', html)
+        self.assertEqual(toc, [{'level': 2, 'id': 'шаг-1', 'title': 'Шаг 1'}])
+
+    def test_markdown_choice_requires_package(self):
+        self.assertIn('markdown', dict(LessonForm().fields['content_format'].choices))
+        with mock.patch('courses.content.markdown', None):
+            self.assertNotIn('markdown', dict(LessonForm().fields['content_format'].choices))
+
+    def test_lesson_page_emits_stored_html(self):
+        self.lesson.content_format = 'html'
+        self.lesson.content = '<h2>Раздел</h2><p>Текст</p>'
+        self.lesson.save()
+        self.client.force_login(self.users['student'])
+        module = self.lesson.module
+        response = self.client.get(reverse('lesson_detail', kwargs={
+            'course_pk': module.course_id, 'module_pk': module.pk, 'lesson_pk': self.lesson.pk,
+        }))
+        self.assertContains(response, '<h2 id="раздел">Раздел</h2>', html=False)
+        self.assertContains(response, 'href="#раздел"')
+        self.assertIn('content', response.context['lesson'].get_deferred_fields())
+
+    def test_render_lessons_command(self):
+        Lesson.objects.update(content_html='', toc=[], word_count=0)
+        out = io.StringIO()
+        call_command('render_lessons', stdout=out)
+        self.assertIn('Скомпилировано уроков: 1', out.getvalue())
+        self.assertEqual(Lesson.objects.get().content_html, '<p>Текст урока</p>')
+
+
+class ReorderTests(TestEnvironmentMixin, TestCase):
+    """Перестановка модулей и уроков одним запросом"""
+
+    def setUp(self):
+        super().setUp()
+        self.users = create_catalog(courses=1, modules=3, lessons=6)
+        self.course = Course.objects.get()
+        self.module = self.course.modules.order_by('order').first()
+        self.client.force_login(self.users['tutor'])
+
+    def lesson_url(self, module):
+        return reverse('lesson_reorder', kwargs={'course_pk': self.course.pk, 'module_pk': module.pk})
+
+    def lesson_order(self, module):
+        return list(module.lessons.order_by('order').values_list('pk', 'order'))
+
+    def test_reorder_lessons(self):
+        ids = [pk for pk, _ in self.lesson_order(self.module)]
+        new_order = [ids[2], ids[0], ids[5], ids[1], ids[4], ids[3]]
+        version = get_namespace_version('lesson')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(
+                self.lesson_url(self.module), json.dumps({'order': new_order}), content_type='application/json',
+            )
+        self.assertEqual(response.json(), {'success': True, 'order': new_order})
+        self.assertEqual(self.lesson_order(self.module), [(pk, n) for n, pk in enumerate(new_order, start=1)])
+        self.assertEqual(len(callbacks), 1)
+        self.assertNotEqual(get_namespace_version('lesson'), version)
+
+    def test_query_count_does_not_grow(self):
+        small = self.module
+        large = Module.objects.create(course=self.course, title='Большой', description='-', order=10)
+        for n in range(40):
+            Lesson.objects.create(module=large, title=f'Урок {n}', content='-', order=n + 1)
+
+        counts = []
+        # Первый запрос прогревает сессию и профиль - сравниваются второй и третий
+        for module in (small, small, large):
+            ids = [pk for pk, _ in self.lesson_order(module)][::-1]
+            response = self.client.post(self.lesson_url(module), {'order': ids})
+            self.assertEqual(response.status_code, 200)
+            counts.append(response.wsgi_request.query_stats.count)
+        self.assertEqual(counts[1], counts[2])
+
+    def test_reorder_modules(self):
+        ids = list(self.course.modules.order_by('-order').values_list('pk', flat=True))
+        response = self.client.post(reverse('module_reorder', kwargs={'course_pk': self.course.pk}), {'order': ids})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(self.course.modules.order_by('order').values_list('pk', flat=True)), ids)
+
+    def test_invalid_order_is_rejected(self):
+        before = self.lesson_order(self.module)
+        ids = [pk for pk, _ in before]
+        other_lesson = Lesson.objects.exclude(module=self.module).first().pk
+        for order in (ids[:-1], ids + [ids[0]], ids[:-1] + [other_lesson], ['abc']):
+            response = self.client.post(self.lesson_url(self.module), {'order': order})
+            self.assertEqual(response.status_code, 400, order)
+        self.assertEqual(self.lesson_order(self.module), before)
+
+    def test_view_without_queryset_is_misconfigured(self):
+        view = type('BareReorderView', (ReorderMixin, View), {})()
+        view.setup(RequestFactory().post('/'))
+        with self.assertRaises(ImproperlyConfigured):
+            view.get_queryset()
+
+    def test_only_course_author(self):
+        ids = [pk for pk, _ in self.lesson_order(self.module)][::-1]
+        self.client.force_login(self.users['student'])
+        self.assertEqual(self.client.post(self.lesson_url(self.module), {'order': ids}).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.post(self.lesson_url(self.module), {'order': ids}).status_code, 403)
+
+
+class CourseCloneTests(TestEnvironmentMixin, TestCase):
+    """Копирование курса с модулями и уроками"""
+
+    def setUp(self):
+        super().setUp()
+        self.users = create_catalog(courses=1, modules=2, lessons=3)
+        self.course = Course.objects.get()
+
+    def outline(self, course):
+        return [
+            (module.title, module.order, [
+                (lesson.title, lesson.order, lesson.content, lesson.content_html, lesson.toc, lesson.word_count)
+                for lesson in module.lessons.order_by('order')
+            ])
+            for module in course.modules.order_by('order')
+        ]
+
+    def test_clone_copies_modules_and_lessons(self):
+        Lesson.objects.filter(module__course=self.course).update(content_html='<p>Текст урока</p>', word_count=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            new_course = clone_course(self.course)
+
+        self.assertNotEqual(new_course.pk, self.course.pk)
+        self.assertEqual(new_course.title, 'Курс Python 0 (копия)')
+        self.assertEqual(new_course.author, self.course.author)
+        self.assertFalse(new_course.is_published)
+        self.assertEqual((new_course.review_count, new_course.average_rating), (0, None))
+        self.assertEqual(self.outline(new_course), self.outline(self.course))
+        self.assertEqual(Lesson.objects.filter(module__course=self.course).count(), 6)
+
+    def test_query_count_does_not_grow(self):
+        small = Course.objects.create(title='Малый', description='-', author=self.users['tutor'], price=0)
+        Module.objects.create(course=small, title='Модуль', description='-', order=1)
+        large = Course.objects.create(title='Большой', description='-', author=self.users['tutor'], price=0)
+        for m in range(5):
+            module = Module.objects.create(course=large, title=f'Модуль {m}', description='-', order=m + 1)
+            Lesson.objects.bulk_create([
+                Lesson(module=module, title=f'Урок {n}', content='-', order=n + 1) for n in range(100)
+            ])
+
+        lesson_insert = f'INSERT INTO {connection.ops.quote_name(Lesson._meta.db_table)}'
+        counts = []
+        for course in (small, large):
+            with CaptureQueriesContext(connection) as queries:
+                clone_course(course)
+            # SQLite делит большой INSERT на пачки по лимиту параметров - остальные запросы не зависят от размера
+            counts.append(len([query for query in queries if not query['sql'].startswith(lesson_insert)]))
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Lesson.objects.filter(module__course__title='Большой (копия)').count(), 500)
+
+    def test_clone_view(self):
+        self.client.force_login(self.users['tutor'])
+        response = self.client.post(reverse('course_clone', args=[self.course.pk]))
+        new_course = Course.objects.exclude(pk=self.course.pk).get()
+        self.assertRedirects(response, reverse('course_update', args=[new_course.pk]))
+        self.assertEqual(new_course.modules.count(), 2)
+
+    def test_only_course_author(self):
+        url = reverse('course_clone', args=[self.course.pk])
+        self.client.force_login(self.users['student'])
+        self.assertRedirects(self.client.post(url), reverse('home'), fetch_redirect_response=False)
+        self.client.logout()
+        self.client.post(url)
+        self.assertEqual(Course.objects.count(), 1)
+
+
+class MetricsTests(TestEnvironmentMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.metrics_dir = Path(tmpdir.name)
+        settings_override = override_settings(METRICS_DIR=self.metrics_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        registry.reset()
+        self.users = create_catalog(courses=1, modules=1, lessons=1)
+
+    def test_metrics_require_staff(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.users['student'])
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_token(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+
+    def test_request_metrics_by_url_name(self):
+        self.client.get(reverse('home'))
+        self.client.get(reverse('course_list'))
+        self.client.force_login(self.users['admin'])
+        text = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('studyhub_request_duration_seconds_count{view="home"} 1', text)
+        self.assertIn('studyhub_template_render_seconds_count{view="course_list"} 1', text)
+        self.assertIn('studyhub_db_duration_seconds_count{view="course_list"} 1', text)
+        self.assertIn('studyhub_response_size_bytes_count{view="home"} 1', text)
+        self.assertIn('studyhub_requests_total{method="GET",status="200",view="home"} 1', text)
+
+    def test_values_of_all_processes_are_summed(self):
+        self.client.get(reverse('home'))
+        # Файл другого воркера
+        other_process = {
+            'studyhub_requests_total': {json.dumps({'method': 'GET', 'status': '200', 'view': 'home'}): 4},
+            'studyhub_request_duration_seconds': {
+                json.dumps({'view': 'home'}): {'buckets': [0] * 10 + [4], 'sum': 40.0, 'count': 4},
+            },
+        }
+        (self.metrics_dir / 'other-worker.json').write_text(json.dumps(other_process))
+
+        text = render_metrics()
+        self.assertIn('studyhub_requests_total{method="GET",status="200",view="home"} 5', text)
+        self.assertIn('studyhub_request_duration_seconds_count{view="home"} 5', text)
+        self.assertIn('studyhub_request_duration_seconds_bucket{view="home",le="+Inf"} 5', text)
+
+
+class ProfilingTests(TestEnvironmentMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.profile_dir = Path(tmpdir.name)
+        settings_override = override_settings(PROFILING_DIR=self.profile_dir, PROFILING_SAMPLE_RATE=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.users = create_catalog(courses=2, modules=1, lessons=1)
+
+    def test_staff_can_profile_request(self):
+        self.client.force_login(self.users['admin'])
+        response = self.client.get(reverse('my_courses') + '?_profile=1')
+        name = response['X-Profile']
+        self.assertTrue((self.profile_dir / f'{name}.prof').exists())
+        info = json.loads((self.profile_dir / f'{name}.json').read_text())
+        self.assertEqual(info['view'], 'my_courses')
+        self.assertEqual(info['reason'], 'staff')
+        self.assertGreater(info['queries'], 0)
+
+    def test_non_staff_cannot_profile(self):
+        self.client.force_login(self.users['student'])
+        response = self.client.get(reverse('my_courses') + '?_profile=1')
+        self.assertNotIn('X-Profile', response)
+        self.assertEqual(list(self.profile_dir.iterdir()), [])
+
+    def test_signed_token(self):
+        response = self.client.get(reverse('course_list'), HTTP_X_PROFILE=make_token())
+        self.assertIn('X-Profile', response)
+        response = self.client.get(reverse('course_list'), HTTP_X_PROFILE='profile:forged')
+        self.assertNotIn('X-Profile', response)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1)
+    def test_sampling(self):
+        response = self.client.get(reverse('about'))
+        self.assertIn('X-Profile', response)
+
+    def test_profiles_command(self):
+        self.client.force_login(self.users['admin'])
+        name = self.client.get(reverse('course_recommendation') + '?coding_interest=5&_profile=1')['X-Profile']
+
+        out = io.StringIO()
+        call_command('profiles', stdout=out)
+        self.assertIn(name, out.getvalue())
+
+        out = io.StringIO()
+        call_command('profiles', '--view', 'course_recommendation', '--stats', '--limit', '5', stdout=out)
+        self.assertIn('Профилей: 1', out.getvalue())
+        self.assertIn('function calls', out.getvalue())
+
+
+class SlowQueryLogTests(TestEnvironmentMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.log_path = Path(tmpdir.name) / 'slow.jsonl'
+        self.users = create_catalog(courses=2, modules=1, lessons=1)
+
+    def test_slow_queries_are_logged_with_plan(self):
+        with override_settings(SLOW_QUERY_LOG=self.log_path, SLOW_QUERY_THRESHOLD_MS=0):
+            self.client.force_login(self.users['student'])
+            self.client.get(reverse('course_list') + '?search=Python')
+            entries = list(read_entries(self.log_path))
+
+        course_queries = [
+            entry for entry in entries
+            if entry['view'] == 'course_list' and 'FROM "courses_course"' in entry['sql']
+        ]
+        self.assertTrue(course_queries)
+        entry = course_queries[0]
+        self.assertIn('%Python%', entry['params'])
+        self.assertTrue(entry['plan'])
+        self.assertTrue(entry['frame'].startswith('courses/'))
+        self.assertNotIn('%s', entry['fingerprint'])
+
+    def test_fast_queries_are_not_logged(self):
+        with override_settings(SLOW_QUERY_LOG=self.log_path, SLOW_QUERY_THRESHOLD_MS=10_000):
+            self.client.get(reverse('course_list'))
+        self.assertEqual(list(read_entries(self.log_path)), [])
+
+    def test_report(self):
+        with override_settings(SLOW_QUERY_LOG=self.log_path, SLOW_QUERY_THRESHOLD_MS=0):
+            self.client.get(reverse('course_list'))
+            self.client.get(reverse('course_list') + '?page=1')
+            out = io.StringIO()
+            call_command('slowqueries', '--view', 'course_list', '--plans', stdout=out)
+        self.assertIn('p95', out.getvalue())
+        self.assertIn('Маршруты: course_list', out.getvalue())
+
+
+class LoadDataTests(TestEnvironmentMixin, TestCase):
+
+    def generate(self, **options):
+        options = {
+            'users': 20, 'tutors': 3, 'categories': 2, 'courses': 6, 'modules': 2, 'lessons': 3,
+            'enrollments': 4, 'orders': 5, 'support': 4, 'seed': 7, **options,
+        }
+        call_command('generate_load_data', stdout=io.StringIO(), **options)
+
+    def snapshot(self):
+        return (
+            list(Course.objects.order_by('title').values_list('title', 'price', 'is_free', 'level')),
+            sorted(Enrollment.objects.values_list('user__username', 'course__title')),
+            Progress.objects.count(),
+            Review.objects.count(),
+        )
+
+    def test_generates_consistent_data(self):
+        self.generate()
+
+        self.assertEqual(User.objects.filter(username__startswith='load_').count(), 23)
+        self.assertEqual(UserProfile.objects.filter(role='tutor').count(), 3)
+        self.assertEqual(Lesson.objects.count(), 6 * 2 * 3)
+        self.assertFalse(Course.objects.filter(price=0, is_free=False).exists())
+        self.assertTrue(Enrollment.objects.exists())
+        self.assertTrue(Progress.objects.exists())
+        self.assertFalse(Progress.objects.filter(completed=True, completed_at__isnull=True).exists())
+        self.assertEqual(Order.objects.count(), 5)
+        self.assertEqual(SupportRequest.objects.count(), 4)
+        # Прогресс только по урокам курсов, на которые студент записан
+        self.assertFalse(
+            Progress.objects.exclude(
+                lesson__module__course__enrollment__user=F('user')
+            ).exists()
+        )
+
+    def test_same_seed_gives_same_data(self):
+        self.generate()
+        first = self.snapshot()
+        self.generate(clear=True)
+        self.assertEqual(self.snapshot(), first)
+        self.generate(clear=True, seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_existing_prefix_requires_clear(self):
+        self.generate()
+        with self.assertRaises(CommandError):
+            self.generate()
+        self.generate(prefix='extra')
+        self.assertEqual(User.objects.filter(username__startswith='extra_').count(), 23)
+
+
+class BenchmarkTests(TestEnvironmentMixin, TestCase):
+
+    def test_suite_runs_on_generated_data(self):
+        generate_data({
+            'users': 10, 'tutors': 2, 'categories': 2, 'courses': 15, 'modules': 2, 'lessons': 2,
+            'enrollments': 3, 'orders': 3, 'support': 3,
+        })
+        results = run_suite(iterations=2, warmup=1, alloc_iterations=1)
+
+        self.assertEqual(set(results), set(SCENARIOS))
+        for name, result in results.items():
+            self.assertGreater(result['queries'], 0, name)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'], name)
+            self.assertGreater(result['alloc_peak_kb'], 0, name)
+        # Итерации на запись откатываются
+        self.assertFalse(Order.objects.filter(user__username__startswith='bench_', items__isnull=True).exists())
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_compare(self):
+        def report(p50, queries, alloc=100.0):
+            return {'results': {'small': {'catalog_list': {
+                'p50_ms': p50, 'p95_ms': p50, 'queries': queries, 'alloc_peak_kb': alloc,
+            }}}}
+
+        baseline = report(10.0, 5)
+        self.assertEqual(compare(baseline, report(12.0, 5)), [])
+        # Рост меньше min_delta_ms не считается, даже если он больше threshold
+        self.assertEqual(compare(report(1.0, 5), report(2.0, 5)), [])
+
+        regressions = compare(baseline, report(20.0, 6, alloc=1000.0))
+        self.assertEqual(
+            {item['metric'] for item in regressions},
+            {'p50_ms', 'p95_ms', 'queries', 'alloc_peak_kb'},
+        )
+        self.assertEqual(regressions[0]['change'], 100.0)
+        # Сценарии, которых нет в базовом прогоне, не сравниваются
+        self.assertEqual(compare({'results': {}}, report(20.0, 6)), [])
+
+
+@skipUnless(importlib.util.find_spec('httpx'), 'нагрузочному тесту нужен httpx')
+class LoadTestTests(TestEnvironmentMixin, LiveServerTestCase):
+
+    def test_all_journeys_run_against_live_server(self):
+        call_command(
+            'generate_load_data', users=6, tutors=2, courses=12, modules=2, lessons=2,
+            enrollments=2, orders=2, support=1, stdout=io.StringIO(),
+        )
+        load_test = LoadTest(self.live_server_url, LoadPlan(), mix=dict.fromkeys(ROLES, 1))
+
+        async def run():
+            try:
+                return await load_test.run_level(4, 1.0)
+            finally:
+                await load_test.close()
+
+        summary = asyncio.run(run())
+        self.assertEqual(summary['total']['errors'], 0, summary['steps'])
+        self.assertEqual(set(summary['journeys']), set(ROLES))
+        self.assertIn('lesson_complete', summary['steps'])
+        self.assertIn('checkout', summary['steps'])
+        self.assertTrue(Progress.objects.filter(user__username__startswith='load_student_').exists())
+
+    def test_roles_follow_mix(self):
+        self.assertEqual(parse_mix('visitor=3,tutor=1'), {'visitor': 3, 'tutor': 1})
+        with self.assertRaises(ValueError):
+            parse_mix('admin=1')
+        roles = assign_roles(8, {'visitor': 3, 'tutor': 1})
+        self.assertEqual(roles.count('visitor'), 6)
+        self.assertEqual(roles.count('tutor'), 2)
@@ -19,6 +19,7 @@ urlpatterns = [
     path('courses/<int:pk>/edit/', views.CourseUpdateView.as_view(), name='course_edit'),
     path('courses/<int:pk>/update/', views.CourseUpdateView.as_view(), name='course_update'),
     path('courses/<int:pk>/delete/', views.CourseDeleteView.as_view(), name='course_delete'),
+    path('courses/<int:pk>/clone/', views.CourseCloneView.as_view(), name='course_clone'),
     
     # Поиск
     path('search/', views.CourseSearchView.as_view(), name='course_search'),
@@ -68,15 +69,32 @@ urlpatterns = [
     # Модули
     path('courses/<int:course_pk>/modules/', views.ModuleListView.as_view(), name='module_list'),
     path('courses/<int:course_pk>/modules/create/', views.ModuleCreateView.as_view(), name='module_create'),
+    path('courses/<int:course_pk>/modules/reorder/', views.ModuleReorderView.as_view(), name='module_reorder'),
     path('courses/<int:course_pk>/modules/<int:module_pk>/', views.ModuleDetailView.as_view(), name='module_detail'),
     path('courses/<int:course_pk>/modules/<int:module_pk>/edit/', views.ModuleUpdateView.as_view(), name='module_edit'),
     path('courses/<int:course_pk>/modules/<int:module_pk>/delete/', views.ModuleDeleteView.as_view(), name='module_delete'),
     
     # Уроки
     path('courses/<int:course_pk>/modules/<int:module_pk>/lessons/create/', views.LessonCreateView.as_view(), name='lesson_create'),
+    path('courses/<int:course_pk>/modules/<int:module_pk>/lessons/reorder/', views.LessonReorderView.as_view(), name='lesson_reorder'),
     path('courses/<int:course_pk>/modules/<int:module_pk>/lessons/<int:lesson_pk>/', views.LessonDetailView.as_view(), name='lesson_detail'),
     path('courses/<int:course_pk>/modules/<int:module_pk>/lessons/<int:pk>/edit/', views.LessonUpdateView.as_view(), name='lesson_edit'),
 
     # Прогресс
     path('progress/mark-lesson-completed/', views.MarkLessonCompletedView.as_view(), name='mark_lesson_completed'),
+    path('progress/stream/', views.ProgressStreamView.as_view(), name='progress_stream'),
+
+    # Синхронизация мобильного приложения
+    path('api/sync', views.SyncView.as_view(), name='api_sync'),
+
+    # JSON API каталога (только чтение)
+    path('api/v1/categories/', views.CategoryApiListView.as_view(), name='api_categories'),
+    path('api/v1/courses/', views.CourseApiListView.as_view(), name='api_courses'),
+    path('api/v1/courses/batch/', views.CourseBatchApiView.as_view(), name='api_courses_batch'),
+    path('api/v1/courses/<int:pk>/', views.CourseApiDetailView.as_view(), name='api_course'),
+    path('api/v1/courses/<int:course_pk>/modules/', views.ModuleApiListView.as_view(), name='api_modules'),
+    path('api/v1/courses/<int:course_pk>/modules/<int:module_pk>/lessons/', views.LessonApiListView.as_view(), name='api_lessons'),
+
+    # Метрики Prometheus (только для персонала)
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 ]
\ No newline at end of file
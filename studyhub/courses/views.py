@@ -1,15 +1,28 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
 from django.views.generic import TemplateView, ListView, DetailView, FormView, CreateView, UpdateView, DeleteView, View
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import login
 from django.urls import reverse_lazy
 from django.contrib import messages
-from django.db.models import Q, Sum
-from django.http import JsonResponse
+from django.db import transaction
+from django.db.models import Q, Sum, Count
+from django.db.models.functions import Coalesce
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.gzip import gzip_page
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
 from django.utils.decorators import method_decorator
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.handlers.asgi import ASGIRequest
 from django import forms
 from .mixins import (
     IsTutorOrAdminMixin, 
@@ -31,6 +44,15 @@ from .models import (
     OrderItem,
     SupportRequest,
 )
+from .enrollments import ais_enrolled, is_enrolled
+from .cloning import clone_course
+from .loaders import course_card, course_loader
+from .ordering import parse_order, reorder
+from .events import bus, event_stream, progress_channel
+from . import api, sync
+from .caching import cached, cache_anonymous_page, get_namespace_versions
+from .roles import aget_request_user
+from .metrics import render_metrics
 from .forms import (
     UserRegisterForm,
     ContactForm,
@@ -41,23 +63,110 @@ from .forms import (
     LessonForm,
 )
 
+@cached('course', 'category', timeout=600)
+def get_categories_with_counts():
+    """Категории с количеством опубликованных курсов (один запрос, кэшируется)"""
+    categories = Category.objects.annotate(
+        published_count=Count('course', filter=Q(course__is_published=True))
+    )
+    return [
+        {'category': category, 'count': category.published_count}
+        for category in categories
+    ]
+
+def with_lesson_stats(modules):
+    """Добавляет к модулям количество и длительность уроков (см. Module.lesson_count)"""
+    return modules.annotate(
+        lessons_count=Count('lessons'),
+        lessons_duration=Coalesce(Sum('lessons__duration_minutes'), 0),
+    )
+
+async def alist(queryset):
+    """Результат запроса списком через async ORM"""
+    return [obj async for obj in queryset.aiterator()]
+
+async def apaginate(queryset, per_page, page_number):
+    """
+    Paginator и страница без синхронных запросов: количество считается
+    через acount(), строки страницы загружаются через aiterator().
+    Неверный номер страницы - 404, как в ListView.
+    """
+    paginator = Paginator(queryset, per_page)
+    # count - cached_property, подставляем значение, посчитанное асинхронно
+    paginator.count = await queryset.acount()
+    if page_number == 'last':
+        page_number = paginator.num_pages
+    try:
+        page = paginator.page(page_number or 1)
+    except InvalidPage as error:
+        raise Http404(f'Неверная страница ({page_number}): {error}')
+    page.object_list = await alist(page.object_list)
+    return paginator, page
+
+def filter_courses(queryset, params):
+    """Фильтры каталога: category, level, free=on и search (страница каталога и API)"""
+    category_id = params.get('category')
+    if category_id and category_id != 'all':
+        queryset = queryset.filter(category_id=category_id)
+
+    level = params.get('level')
+    if level and level != 'all':
+        queryset = queryset.filter(level=level)
+
+    show_free_only = params.get('free') == 'on'
+    if show_free_only:
+        queryset = queryset.filter(is_free=True)
+
+    search_query = params.get('search')
+    if search_query:
+        queryset = queryset.filter(
+            Q(title__icontains=search_query) | 
+            Q(description__icontains=search_query) |
+            Q(author__username__icontains=search_query)
+        )
+
+    return queryset
+
+def completion_percentage(completed, total):
+    """Процент выполнения (целое число)"""
+    return int((completed / total) * 100) if total > 0 else 0
+
+@cached('course', timeout=600)
+def get_home_sections():
+    """Три блока главной страницы: ID популярных и бесплатных курсов и число курсов"""
+    all_published = Course.objects.filter(is_published=True)
+    featured = list(all_published.filter(is_popular=True).values_list('pk', flat=True)[:3])
+    if not featured:
+        featured = list(all_published.values_list('pk', flat=True)[:3])
+    return {
+        'featured_ids': featured,
+        'free_ids': list(all_published.filter(is_free=True).values_list('pk', flat=True)[:3]),
+        'total_courses': all_published.count(),
+    }
+
+@method_decorator(cache_anonymous_page('course'), name='dispatch')
 class HomePageView(TemplateView):
     template_name = 'courses/home.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        all_published = Course.objects.filter(is_published=True)
-        featured = all_published.filter(is_popular=True)[:3]
-        if not featured:
-            featured = all_published[:3]
-        context['featured_courses'] = featured
-        context['free_courses'] = all_published.filter(is_free=True)[:3]
-        context['total_courses'] = all_published.count()
+        sections = get_home_sections()
+        # Курсы обоих блоков ставятся в очередь загрузчика и загружаются одним
+        # запросом при первом обращении; курс из обоих блоков загружается один раз
+        loader = course_loader(self.request)
+        featured = [loader.load(pk) for pk in sections['featured_ids']]
+        free = [loader.load(pk) for pk in sections['free_ids']]
+        # Пустое значение - курс снят с публикации после кэширования блоков
+        context['featured_courses'] = [course for course in featured if course]
+        context['free_courses'] = [course for course in free if course]
+        context['total_courses'] = sections['total_courses']
         return context
 
+@method_decorator(cache_anonymous_page(), name='dispatch')
 class AboutPageView(TemplateView):
     template_name = 'courses/about.html'
 
+@method_decorator(cache_anonymous_page('course', 'category', 'user'), name='dispatch')
 class CourseListView(ListView):
     model = Course
     template_name = 'courses/course_list.html'
@@ -66,126 +175,112 @@ class CourseListView(ListView):
     
     def get_queryset(self):
         queryset = super().get_queryset()
-        queryset = queryset.filter(is_published=True)
-        
-        category_id = self.request.GET.get('category')
-        if category_id and category_id != 'all':
-            queryset = queryset.filter(category_id=category_id)
-
-        level = self.request.GET.get('level')
-        if level and level != 'all':
-            queryset = queryset.filter(level=level)
-
-        show_free_only = self.request.GET.get('free') == 'on'
-        if show_free_only:
-            queryset = queryset.filter(is_free=True)
+        queryset = queryset.filter(is_published=True).cards()
+        return filter_courses(queryset, self.request.GET)
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Асинхронный dispatch - чтобы cache_anonymous_page выбрал асинхронную обертку
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        # Страница курсов и категории со счетчиками загружаются одновременно
+        self.page, self.categories_with_counts = await asyncio.gather(
+            apaginate(self.object_list, self.paginate_by, request.GET.get(self.page_kwarg)),
+            sync_to_async(get_categories_with_counts)(),
+        )
+        return self.render_to_response(self.get_context_data())
 
-        search_query = self.request.GET.get('search')
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) | 
-                Q(description__icontains=search_query) |
-                Q(author__username__icontains=search_query)
-            )
-        
-        return queryset
+    def paginate_queryset(self, queryset, page_size):
+        # Страница уже загружена в get()
+        paginator, page = self.page
+        return paginator, page, page.object_list, page.has_other_pages()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        categories_with_counts = self.categories_with_counts
+        context['categories'] = [item['category'] for item in categories_with_counts]
         context['current_category'] = self.request.GET.get('category', 'all')
         context['search_query'] = self.request.GET.get('search', '')
         context['current_level'] = self.request.GET.get('level', 'all')
         context['free_only'] = self.request.GET.get('free') == 'on'
         context['levels'] = Course.LEVEL_CHOICES
-        
-        categories_with_counts = []
-        for category in context['categories']:
-            count = Course.objects.filter(
-                category=category,
-                is_published=True
-            ).count()
-            categories_with_counts.append({
-                'category': category,
-                'count': count
-            })
         context['categories_with_counts'] = categories_with_counts
+        # Карточка выводит категорию и автора: их версии входят в ключ фрагмента
+        context['card_cache_versions'] = get_namespace_versions('category', 'user')
         
         return context
 
+@method_decorator(cache_anonymous_page('course', 'category', 'module', 'lesson', 'review', 'user'), name='dispatch')
 class CourseDetailView(DetailView):
     model = Course
     template_name = 'courses/course_detail.html'
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        course = self.object
-        
-        # Получаем все отзывы для курса
-        reviews = Review.objects.filter(course=course).select_related('user').order_by('-created_at')
-        context['reviews'] = reviews
-        
-        # Статистика отзывов
-        review_count = reviews.count()
-        context['review_count'] = review_count
-        
+    queryset = Course.objects.select_related('author', 'category')
+
+    async def dispatch(self, request, *args, **kwargs):
+        return await super().dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(self.get_queryset(), pk=kwargs['pk'])
+        user = await aget_request_user(request)
+        context = self.get_context_data(object=self.object)
+        context.update(await self.get_course_data(self.object, user))
+        return self.render_to_response(context)
+
+    async def get_course_data(self, course, user):
+        """Данные страницы курса; независимые запросы выполняются одновременно"""
+        modules, author_course_count, reviews, similar_courses, user_data = await asyncio.gather(
+            # Модули с количеством уроков (один запрос вместо запроса на модуль)
+            alist(with_lesson_stats(course.modules.all())),
+            Course.objects.filter(author_id=course.author_id).acount(),
+            alist(Review.objects.filter(course=course).select_related('user').order_by('-created_at')),
+            alist(
+                Course.objects.cards().filter(category=course.category, is_published=True)
+                .exclude(pk=course.pk)[:3]
+            ),
+            self.get_user_data(course, user),
+        )
+
+        # Статистика отзывов считается по уже загруженному списку
+        review_count = len(reviews)
+        average_rating = None
         if review_count > 0:
-            avg_rating = sum(review.rating for review in reviews) / review_count
-            context['average_rating'] = round(avg_rating, 1)
-        else:
-            context['average_rating'] = None
-        
-        # Проверяем, оставлял ли текущий пользователь отзыв
-        if self.request.user.is_authenticated:
-            context['has_reviewed'] = Review.objects.filter(
-                course=course,
-                user=self.request.user
-            ).exists()
-        else:
-            context['has_reviewed'] = False
-        
-        # Проверяем, записан ли пользователь на курс
-        if self.request.user.is_authenticated:
-            try:
-                enrollment = Enrollment.objects.get(
-                    user=self.request.user,
-                    course=course
-                )
-                context['user_enrolled'] = True
-                context['enrollment_date'] = enrollment.enrolled_at
-                context['enrollment_completed'] = enrollment.completed
-            except Enrollment.DoesNotExist:
-                context['user_enrolled'] = False
-        else:
-            context['user_enrolled'] = False
-        
-        # Похожие курсы
-        similar_courses = Course.objects.filter(
-            category=course.category,
-            is_published=True
-        ).exclude(pk=course.pk)[:3]
-        context['similar_courses'] = similar_courses
-        
-        # Добавляем данные о прогрессе (ОБНОВЛЕННЫЙ КОД)
-        if self.request.user.is_authenticated and hasattr(self.request.user, 'enrollment_set'):
-            if self.request.user.enrollment_set.filter(course=course).exists():
-                # Прогресс курса
-                completed_lessons = Progress.objects.filter(
-                    user=self.request.user,
-                    lesson__module__course=course,
-                    completed=True
-                ).count()
-                total_lessons = Lesson.objects.filter(module__course=course).count()
-                progress_percentage = int((completed_lessons / total_lessons) * 100) if total_lessons > 0 else 0
-                
-                context['user_progress'] = {
-                    'completed_lessons': completed_lessons,
-                    'total_lessons': total_lessons,
-                    'percentage': progress_percentage,
-                    'has_progress': completed_lessons > 0
-                }
-        
-        return context
+            average_rating = round(sum(review.rating for review in reviews) / review_count, 1)
+
+        return {
+            'modules': modules,
+            'author_course_count': author_course_count,
+            'reviews': reviews,
+            'review_count': review_count,
+            'average_rating': average_rating,
+            'has_reviewed': user.is_authenticated and any(review.user_id == user.pk for review in reviews),
+            'similar_courses': similar_courses,
+            **user_data,
+        }
+
+    async def get_user_data(self, course, user):
+        """Запись пользователя на курс и его прогресс"""
+        if not await ais_enrolled(user, course):
+            return {'user_enrolled': False}
+
+        enrollment, completed_lessons, total_lessons = await asyncio.gather(
+            Enrollment.objects.filter(user=user, course=course).afirst(),
+            Progress.objects.filter(user=user, lesson__module__course=course, completed=True).acount(),
+            Lesson.objects.filter(module__course=course).acount(),
+        )
+        data = {
+            'user_enrolled': True,
+            'user_progress': {
+                'completed_lessons': completed_lessons,
+                'total_lessons': total_lessons,
+                'percentage': completion_percentage(completed_lessons, total_lessons),
+                'has_progress': completed_lessons > 0,
+            },
+        }
+        if enrollment:
+            data['enrollment_date'] = enrollment.enrolled_at
+            data['enrollment_completed'] = enrollment.completed
+        return data
 
 class CourseCreateView(LoginRequiredMixin, IsTutorOrAdminMixin, CreateView):
     """Создание курса - только для преподавателей и администраторов"""
@@ -223,6 +318,18 @@ class CourseDeleteView(LoginRequiredMixin, IsCourseAuthorOrAdminMixin, DeleteVie
         messages.success(self.request, 'Курс успешно удален!')
         return reverse_lazy('course_list')
 
+class CourseCloneView(LoginRequiredMixin, IsCourseAuthorOrAdminMixin, View):
+    """Копия курса с модулями и уроками (новое издание) - автор или администратор"""
+    http_method_names = ['post']
+
+    def get_object(self):
+        return get_object_or_404(Course, pk=self.kwargs['pk'])
+
+    def post(self, request, *args, **kwargs):
+        new_course = clone_course(self.get_object())
+        messages.success(request, 'Копия курса создана. Она не опубликована - проверьте и опубликуйте ее.')
+        return redirect('course_update', pk=new_course.pk)
+
 class RegisterView(CreateView):
     form_class = UserRegisterForm
     template_name = 'registration/register.html'
@@ -251,17 +358,20 @@ class MyCoursesView(LoginRequiredMixin, ListView):
         
         # Для студентов - только курсы, на которые они записались
         if user_profile and user_profile.is_student():
-            enrollments = Enrollment.objects.filter(user=self.request.user).select_related('course')
+            enrollments = (
+                Enrollment.objects.filter(user=self.request.user)
+                .select_related('course').defer('course__full_description')
+            )
             return [enrollment.course for enrollment in enrollments]
         
         # Для преподавателей и администраторов - курсы, на которые записались + созданные курсы
         elif user_profile and user_profile.is_tutor_or_admin():
             # Курсы, на которые записались (через Enrollment)
             enrollment_ids = Enrollment.objects.filter(user=self.request.user).values_list('course_id', flat=True)
-            enrolled_courses = Course.objects.filter(id__in=enrollment_ids)
+            enrolled_courses = Course.objects.filter(id__in=enrollment_ids).defer('full_description')
             
             # Курсы, которые создали
-            created_courses = Course.objects.filter(author=self.request.user)
+            created_courses = Course.objects.filter(author=self.request.user).defer('full_description')
             
             # Объединяем и убираем дубликаты
             all_courses = (enrolled_courses | created_courses).distinct()
@@ -280,7 +390,7 @@ class MyCoursesView(LoginRequiredMixin, ListView):
         if user_profile and user_profile.is_student():
             # Получаем курсы через Enrollment
             enrollment_ids = Enrollment.objects.filter(user=self.request.user).values_list('course_id', flat=True)
-            enrolled_courses = Course.objects.filter(id__in=enrollment_ids)
+            enrolled_courses = Course.objects.cards().filter(id__in=enrollment_ids)
             
             context['enrolled_courses'] = enrolled_courses
             context['enrolled_count'] = enrolled_courses.count()
@@ -294,10 +404,10 @@ class MyCoursesView(LoginRequiredMixin, ListView):
         elif user_profile and user_profile.is_tutor_or_admin():
             # Курсы, на которые записались (через Enrollment)
             enrollment_ids = Enrollment.objects.filter(user=self.request.user).values_list('course_id', flat=True)
-            enrolled_courses = Course.objects.filter(id__in=enrollment_ids)
+            enrolled_courses = Course.objects.cards().filter(id__in=enrollment_ids)
             
             # Курсы, которые создали
-            created_courses = Course.objects.filter(author=self.request.user)
+            created_courses = Course.objects.cards().filter(author=self.request.user)
             
             context['enrolled_courses'] = enrolled_courses
             context['created_courses'] = created_courses
@@ -410,6 +520,13 @@ class EnrollView(LoginRequiredMixin, CreateView):
         kwargs['user'] = self.request.user
         return kwargs
     
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['user_enrollments'] = list(
+            Enrollment.objects.filter(user=self.request.user).select_related('course')
+        )
+        return context
+    
     def form_valid(self, form):
         form.instance.user = self.request.user
         response = super().form_valid(form)
@@ -436,7 +553,7 @@ def quick_enroll(request, pk):
             return redirect('course_detail', pk=pk)
         
         # Проверяем, не записан ли уже пользователь
-        if Enrollment.objects.filter(user=request.user, course=course).exists():
+        if is_enrolled(request.user, course):
             messages.warning(request, 'Вы уже записаны на этот курс!')
         else:
             Enrollment.objects.create(user=request.user, course=course)
@@ -486,7 +603,7 @@ class CourseSearchView(ListView):
     
     def get_queryset(self):
         queryset = super().get_queryset()
-        queryset = queryset.filter(is_published=True)
+        queryset = queryset.filter(is_published=True).cards()
         
         query = self.request.GET.get('q', '').strip()
         
@@ -503,7 +620,8 @@ class CourseSearchView(ListView):
         context = super().get_context_data(**kwargs)
         query = self.request.GET.get('q', '').strip()
         context['search_query'] = query
-        context['search_count'] = self.get_queryset().count()
+        paginator = context.get('paginator')
+        context['search_count'] = paginator.count if paginator else len(context['object_list'])
         return context
 
 class ModuleListView(ListView):
@@ -512,7 +630,7 @@ class ModuleListView(ListView):
     
     def get_queryset(self):
         course_pk = self.kwargs['course_pk']
-        return Module.objects.filter(course_id=course_pk).order_by('order')
+        return with_lesson_stats(Module.objects.filter(course_id=course_pk).order_by('order'))
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -521,8 +639,8 @@ class ModuleListView(ListView):
         context['course'] = course
         
         # Рассчитываем общую статистику
-        modules = self.get_queryset()
-        total_lessons = sum(module.lessons.count() for module in modules)
+        modules = self.object_list
+        total_lessons = sum(module.lesson_count() for module in modules)
         total_duration = sum(module.total_duration() for module in modules)
         
         context['total_lessons'] = total_lessons
@@ -540,7 +658,7 @@ class ModuleDetailView(DetailView):
         module_pk = self.kwargs['module_pk']
         
         return get_object_or_404(
-            Module, 
+            Module.objects.select_related('course__author'),
             pk=module_pk, 
             course_id=course_pk
         )
@@ -550,7 +668,7 @@ class ModuleDetailView(DetailView):
         module = self.object
         
         # Получаем уроки модуля
-        lessons = module.lessons.all().order_by('order')
+        lessons = module.lessons.outline().order_by('order')
         context['lessons'] = lessons
         
         # Рассчитываем общую продолжительность
@@ -560,17 +678,14 @@ class ModuleDetailView(DetailView):
         # Добавляем информацию о прогрессе
         if self.request.user.is_authenticated:
             # Проверяем, записан ли пользователь на курс
-            is_enrolled = hasattr(self.request.user, 'enrollment_set') and \
-                         self.request.user.enrollment_set.filter(course=module.course).exists()
-            
-            if is_enrolled:
+            if is_enrolled(self.request.user, module.course_id):
                 # Прогресс модуля
                 completed_lessons = Progress.objects.filter(
                     user=self.request.user,
                     lesson__module=module,
                     completed=True
                 ).count()
-                total_lessons = lessons.count()
+                total_lessons = len(lessons)
                 progress_percentage = int((completed_lessons / total_lessons) * 100) if total_lessons > 0 else 0
                 
                 context['user_progress'] = {
@@ -579,13 +694,17 @@ class ModuleDetailView(DetailView):
                     'percentage': progress_percentage
                 }
                 
-                # Информация о прогрессе для каждого урока
+                # Информация о прогрессе для каждого урока (один запрос на весь модуль)
+                progress_by_lesson = {
+                    progress.lesson_id: progress
+                    for progress in Progress.objects.filter(
+                        user=self.request.user,
+                        lesson__module=module
+                    )
+                }
                 lessons_with_progress = []
                 for lesson in lessons:
-                    progress = Progress.objects.filter(
-                        user=self.request.user,
-                        lesson=lesson
-                    ).first()
+                    progress = progress_by_lesson.get(lesson.pk)
                     lessons_with_progress.append({
                         'lesson': lesson,
                         'completed': progress.completed if progress else False,
@@ -599,88 +718,72 @@ class LessonDetailView(DetailView):
     model = Lesson
     template_name = 'courses/lesson_detail.html'
     context_object_name = 'lesson'
-    
-    def get_object(self, queryset=None):
-        course_pk = self.kwargs['course_pk']
-        module_pk = self.kwargs['module_pk']
-        lesson_pk = self.kwargs['lesson_pk']
-        
-        return get_object_or_404(
-            Lesson.objects.select_related('module__course'),
-            pk=lesson_pk,
-            module_id=module_pk,
-            module__course_id=course_pk
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(
+            # Страница выводит скомпилированный content_html, исходный текст не нужен
+            Lesson.objects.select_related('module__course').defer('content'),
+            pk=kwargs['lesson_pk'],
+            module_id=kwargs['module_pk'],
+            module__course_id=kwargs['course_pk'],
         )
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        lesson = self.object
-        
+        user = await aget_request_user(request)
+        context = self.get_context_data(object=self.object)
+        context.update(await self.get_lesson_data(self.object, user))
+        # Поток прогресса (ProgressStreamView) подключается только под ASGI
+        context['progress_stream'] = isinstance(request, ASGIRequest)
+        return self.render_to_response(context)
+
+    async def get_lesson_data(self, lesson, user):
+        """Навигация по урокам модуля и прогресс; запросы выполняются одновременно"""
+        module = lesson.module
+        lessons, progress_data = await asyncio.gather(
+            alist(module.lessons.outline().order_by('order')),
+            self.get_progress_data(lesson, user),
+        )
+
         # Информация для навигации
-        context['course'] = lesson.module.course
-        context['module'] = lesson.module
-        
-        # Находим предыдущий и следующий уроки
-        lessons = list(lesson.module.lessons.all().order_by('order'))
+        data = {'course': module.course, 'module': module}
         current_index = lessons.index(lesson)
-        
         if current_index > 0:
-            context['previous_lesson'] = lessons[current_index - 1]
-        
+            data['previous_lesson'] = lessons[current_index - 1]
         if current_index < len(lessons) - 1:
-            context['next_lesson'] = lessons[current_index + 1]
-        
-        # Добавляем информацию о прогрессе
-        if self.request.user.is_authenticated:
-            # Проверяем, записан ли пользователь на курс
-            is_enrolled = hasattr(self.request.user, 'enrollment_set') and \
-                         self.request.user.enrollment_set.filter(course=lesson.module.course).exists()
-            
-            if is_enrolled:
-                # Прогресс текущего урока
-                progress = Progress.objects.filter(
-                    user=self.request.user,
-                    lesson=lesson
-                ).first()
-                
-                context['user_progress'] = {
-                    'completed': progress.completed if progress else False,
-                    'completed_at': progress.completed_at if progress else None
-                }
-                
-                # Прогресс модуля
-                module = lesson.module
-                module_completed = Progress.objects.filter(
-                    user=self.request.user,
-                    lesson__module=module,
-                    completed=True
-                ).count()
-                module_total = module.lessons.count()
-                module_progress = int((module_completed / module_total) * 100) if module_total > 0 else 0
-                
-                context['module_progress'] = {
-                    'completed': module_completed,
-                    'total': module_total,
-                    'percentage': module_progress
-                }
-                
-                # Прогресс курса
-                course = lesson.module.course
-                course_completed = Progress.objects.filter(
-                    user=self.request.user,
-                    lesson__module__course=course,
-                    completed=True
-                ).count()
-                course_total = Lesson.objects.filter(module__course=course).count()
-                course_progress = int((course_completed / course_total) * 100) if course_total > 0 else 0
-                
-                context['course_progress'] = {
-                    'completed': course_completed,
-                    'total': course_total,
-                    'percentage': course_progress
-                }
-        
-        return context
+            data['next_lesson'] = lessons[current_index + 1]
+
+        if progress_data:
+            module_completed = progress_data.pop('module_completed')
+            data.update(progress_data)
+            data['module_progress'] = {
+                'completed': module_completed,
+                'total': len(lessons),
+                'percentage': completion_percentage(module_completed, len(lessons)),
+            }
+        return data
+
+    async def get_progress_data(self, lesson, user):
+        """Прогресс урока, модуля и курса (только для записанных на курс)"""
+        module = lesson.module
+        if not await ais_enrolled(user, module.course_id):
+            return None
+
+        progress, module_completed, course_completed, course_total = await asyncio.gather(
+            Progress.objects.filter(user=user, lesson=lesson).afirst(),
+            Progress.objects.filter(user=user, lesson__module=module, completed=True).acount(),
+            Progress.objects.filter(user=user, lesson__module__course_id=module.course_id, completed=True).acount(),
+            Lesson.objects.filter(module__course_id=module.course_id).acount(),
+        )
+        return {
+            'user_progress': {
+                'completed': progress.completed if progress else False,
+                'completed_at': progress.completed_at if progress else None,
+            },
+            'module_completed': module_completed,
+            'course_progress': {
+                'completed': course_completed,
+                'total': course_total,
+                'percentage': completion_percentage(course_completed, course_total),
+            },
+        }
 
 class ModuleCreateView(LoginRequiredMixin, IsTutorOrAdminMixin, CreateView):
     """Создание модуля - только преподаватели и администраторы"""
@@ -786,6 +889,63 @@ class ModuleDeleteView(LoginRequiredMixin, IsModuleCourseAuthorOrAdminMixin, Del
         messages.success(self.request, 'Модуль успешно удален!')
         return reverse_lazy('module_list', kwargs={'course_pk': self.object.course.pk})
 
+class ReorderMixin:
+    """
+    Новый порядок после перетаскивания (см. courses/ordering.py): POST с JSON
+    {"order": [id, ...]} или полями формы order - все ID в новом порядке.
+    """
+    namespace = None
+    queryset = None
+
+    def get_queryset(self):
+        """Все переставляемые строки родителя"""
+        if self.queryset is None:
+            raise ImproperlyConfigured(
+                f'{type(self).__name__}: задайте queryset или переопределите get_queryset()'
+            )
+        return self.queryset.all()
+
+    def handle_no_permission(self):
+        return JsonResponse({'success': False, 'error': 'Доступ запрещен'}, status=403)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            if request.content_type == 'application/json':
+                data = json.loads(request.body)
+                values = data.get('order') if isinstance(data, dict) else None
+            else:
+                values = request.POST.getlist('order')
+            ids = parse_order(values)
+            reorder(self.get_queryset(), ids, self.namespace)
+        except ValueError as error:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        return JsonResponse({'success': True, 'order': ids})
+
+
+class ModuleReorderView(ReorderMixin, LoginRequiredMixin, IsCourseAuthorOrAdminMixin, View):
+    """Порядок модулей курса - автор курса или администратор"""
+    namespace = 'module'
+
+    def get_object(self):
+        return get_object_or_404(Course, pk=self.kwargs['course_pk'])
+
+    def get_queryset(self):
+        return Module.objects.filter(course_id=self.kwargs['course_pk'])
+
+
+class LessonReorderView(ReorderMixin, LoginRequiredMixin, IsModuleCourseAuthorOrAdminMixin, View):
+    """Порядок уроков модуля - автор курса или администратор"""
+    namespace = 'lesson'
+
+    def get_object(self):
+        return get_object_or_404(
+            Module.objects.select_related('course'), pk=self.kwargs['module_pk'], course_id=self.kwargs['course_pk'],
+        )
+
+    def get_queryset(self):
+        return Lesson.objects.filter(module_id=self.kwargs['module_pk'])
+
+
 class LessonUpdateView(LoginRequiredMixin, IsLessonCourseAuthorOrAdminMixin, UpdateView):
     """Редактирование урока - только автор курса или администратор"""
     model = Lesson
@@ -819,6 +979,7 @@ class LessonUpdateView(LoginRequiredMixin, IsLessonCourseAuthorOrAdminMixin, Upd
         })
 
 
+@method_decorator(cache_anonymous_page('userprofile', 'course'), name='dispatch')
 class TutorsListView(TemplateView):
     """Список преподавателей (пользователи с ролью 'tutor')"""
     template_name = 'courses/tutors.html'
@@ -839,7 +1000,7 @@ class CartView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         cart_ids = self.get_cart_course_ids()
-        all_courses = Course.objects.filter(id__in=cart_ids, is_published=True)
+        all_courses = Course.objects.cards().filter(id__in=cart_ids, is_published=True)
         
         # Фильтруем бесплатные курсы из корзины (они не должны там быть)
         free_courses = [c for c in all_courses if c.is_free]
@@ -873,7 +1034,7 @@ class AddToCartView(LoginRequiredMixin, View):
             return redirect('course_detail', pk=course.pk)
         
         # Проверяем, не записан ли уже пользователь
-        if Enrollment.objects.filter(user=request.user, course=course).exists():
+        if is_enrolled(request.user, course):
             messages.warning(request, 'Вы уже записаны на этот курс!')
             return redirect('course_detail', pk=course.pk)
         
@@ -906,7 +1067,7 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
 
     def get_cart_courses(self):
         cart_ids = self.request.session.get('cart', [])
-        return Course.objects.filter(id__in=cart_ids, is_published=True)
+        return Course.objects.cards().filter(id__in=cart_ids, is_published=True)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -932,15 +1093,17 @@ class CheckoutView(LoginRequiredMixin, TemplateView):
             return redirect('cart')
 
         # Создаём заказ только для платных курсов
-        order = Order.objects.create(user=request.user, status='paid')
-        for course in paid_courses:
-            OrderItem.objects.create(
-                order=order,
-                course=course,
-                price=course.price
-            )
-            # После оплаты создаём Enrollment - доступ к курсу
-            Enrollment.objects.get_or_create(user=request.user, course=course)
+        # (одна транзакция на запись: одна блокировка и одна фиксация на весь заказ)
+        with transaction.atomic():
+            order = Order.objects.create(user=request.user, status='paid')
+            for course in paid_courses:
+                OrderItem.objects.create(
+                    order=order,
+                    course=course,
+                    price=course.price
+                )
+                # После оплаты создаём Enrollment - доступ к курсу
+                Enrollment.objects.get_or_create(user=request.user, course=course)
 
         # Очищаем корзину
         request.session['cart'] = []
@@ -1243,7 +1406,7 @@ class CourseRecommendationView(FormView):
         free_only = self.request.GET.get('free_only') == 'on'
         
         # Начинаем с базового запроса
-        qs = Course.objects.filter(is_published=True)
+        qs = Course.objects.cards().filter(is_published=True)
         
         # Фильтр по уровню
         if level:
@@ -1350,79 +1513,98 @@ class CourseRecommendationView(FormView):
 
 # ... предыдущий код остается без изменений ...
 
-class MarkLessonCompletedView(LoginRequiredMixin, View):
+class MarkLessonCompletedView(View):
     """Представление для отметки урока как пройденного/не пройденного"""
-    
+
     @method_decorator(csrf_exempt)
-    def dispatch(self, *args, **kwargs):
-        return super().dispatch(*args, **kwargs)
-    
-    def post(self, request, *args, **kwargs):
+    async def dispatch(self, *args, **kwargs):
+        return await super().dispatch(*args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
         lesson_id = request.POST.get('lesson_id')
         completed = request.POST.get('completed') == 'true'
-        
+
+        # LoginRequiredMixin не подходит асинхронному представлению - проверяем здесь
+        user = await aget_request_user(request)
+        if not user.is_authenticated:
+            return JsonResponse({'success': False, 'error': 'Требуется авторизация'}, status=403)
+
         if not lesson_id:
             return JsonResponse({'success': False, 'error': 'Не указан ID урока'}, status=400)
-        
-        lesson = get_object_or_404(Lesson, pk=lesson_id)
-        
-        # Проверяем, имеет ли пользователь доступ к уроку
-        if not request.user.is_authenticated:
-            return JsonResponse({'success': False, 'error': 'Требуется авторизация'}, status=403)
-        
+
+        lesson = await aget_object_or_404(Lesson.objects.select_related('module'), pk=lesson_id)
+        module = lesson.module
+
         # Проверяем, записан ли пользователь на курс
-        if not hasattr(request.user, 'enrollment_set') or \
-           not request.user.enrollment_set.filter(course=lesson.module.course).exists():
+        if not await ais_enrolled(user, module.course_id):
             return JsonResponse({'success': False, 'error': 'Вы не записаны на этот курс'}, status=403)
-        
+
         # Получаем или создаем запись прогресса
-        progress, created = Progress.objects.get_or_create(
-            user=request.user,
+        progress, created = await Progress.objects.aget_or_create(
+            user=user,
             lesson=lesson,
             defaults={'completed': completed}
         )
-        
+
         # Если запись уже существует, обновляем ее
         if not created:
             progress.completed = completed
-            progress.save()
-        
-        # Получаем статистику прогресса
-        module = lesson.module
-        course = module.course
-        
-        # Прогресс модуля
-        module_completed = Progress.objects.filter(
-            user=request.user,
-            lesson__module=module,
-            completed=True
-        ).count()
-        module_total = module.lessons.count()
-        module_progress = int((module_completed / module_total) * 100) if module_total > 0 else 0
-        
-        # Прогресс курса
-        course_completed = Progress.objects.filter(
-            user=request.user,
-            lesson__module__course=course,
-            completed=True
-        ).count()
-        course_total = Lesson.objects.filter(module__course=course).count()
-        course_progress = int((course_completed / course_total) * 100) if course_total > 0 else 0
-        
-        return JsonResponse({
-            'success': True,
+            await progress.asave()
+
+        # Статистика прогресса модуля и курса
+        module_completed, module_total, course_completed, course_total = await asyncio.gather(
+            Progress.objects.filter(user=user, lesson__module=module, completed=True).acount(),
+            Lesson.objects.filter(module=module).acount(),
+            Progress.objects.filter(user=user, lesson__module__course_id=module.course_id, completed=True).acount(),
+            Lesson.objects.filter(module__course_id=module.course_id).acount(),
+        )
+
+        result = {
+            'lesson_id': lesson.pk,
+            'module_id': module.pk,
+            'course_id': module.course_id,
             'completed': progress.completed,
             'completed_at': progress.completed_at.strftime('%d.%m.%Y %H:%M') if progress.completed_at else None,
-            'module_progress': module_progress,
-            'course_progress': course_progress,
+            'module_progress': completion_percentage(module_completed, module_total),
+            'course_progress': completion_percentage(course_completed, course_total),
             'module_completed': module_completed,
             'module_total': module_total,
             'course_completed': course_completed,
             'course_total': course_total,
+        }
+        # Другие устройства пользователя получат изменение через ProgressStreamView
+        await bus.apublish(progress_channel(user.pk), 'progress', result)
+
+        return JsonResponse({
+            'success': True,
+            **result,
             'message': 'Урок отмечен как пройденный' if completed else 'Урок отмечен как непройденный'
         })
 
 
+class ProgressStreamView(View):
+    """
+    Поток Server-Sent Events с изменениями прогресса текущего пользователя:
+    урок, отмеченный на одном устройстве, сразу обновляет прогресс на других.
+    Работает только под ASGI: под WSGI StreamingHttpResponse дочитывает
+    асинхронный поток целиком до отправки, и каждая открытая вкладка занимала
+    бы рабочий поток на EVENT_STREAM_MAX_DURATION. Там отдается 204 -
+    EventSource на такой ответ не переподключается.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        user = await aget_request_user(request)
+        if not user.is_authenticated:
+            return JsonResponse({'success': False, 'error': 'Требуется авторизация'}, status=403)
+
+        response = StreamingHttpResponse(event_stream(progress_channel(user.pk)), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Прокси (nginx) не должен буферизовать поток
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
 class SupportRequestsListView(LoginRequiredMixin, IsAdminMixin, ListView):
     """Список обращений для администраторов"""
     model = SupportRequest
@@ -1471,4 +1653,153 @@ class SupportRequestUpdateStatusView(LoginRequiredMixin, IsAdminMixin, View):
         else:
             messages.error(request, 'Неверный статус.')
         
-        return redirect('support_requests_list')
\ No newline at end of file
+        return redirect('support_requests_list')
+
+
+@method_decorator(gzip_page, name='dispatch')
+class SyncView(View):
+    """Изменения для мобильного приложения после курсора ?since= (см. courses/sync.py)"""
+
+    def get(self, request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'success': False, 'error': 'Требуется авторизация'}, status=403)
+        try:
+            since = sync.parse_cursor(request.GET.get('since'))
+        except (ValueError, OverflowError):
+            return JsonResponse({'success': False, 'error': 'Неверный курсор'}, status=400)
+
+        body, content_type = sync.encode(sync.get_changes(request.user, since), request.headers.get('Accept', ''))
+        response = HttpResponse(body, content_type=content_type)
+        patch_vary_headers(response, ('Accept',))
+        return response
+
+
+class CatalogApiView(View):
+    """
+    Список ресурса JSON API каталога (courses/api.py): поля fields=,
+    курсорная пагинация cursor=/limit= и ETag с ответом 304.
+    """
+    resource = None
+    queryset = None
+    paginated = True
+
+    def get_queryset(self):
+        """Строки ресурса, доступные в API; Http404 - нет родительского объекта"""
+        if self.queryset is None:
+            raise ImproperlyConfigured(
+                f'{type(self).__name__}: задайте queryset или переопределите get_queryset()'
+            )
+        return self.queryset.all()
+
+    def parse_params(self, params):
+        self.limit = api.parse_limit(params.get('limit'))
+        self.cursor_values = api.decode_cursor(self.resource, params.get('cursor'))
+
+    def get_data(self, queryset, names):
+        return api.paginate(self.resource, queryset, names, self.cursor_values, self.limit)
+
+    def get(self, request, *args, **kwargs):
+        try:
+            names = self.resource.parse_fields(request.GET.get('fields'))
+            self.parse_params(request.GET)
+            queryset = self.get_queryset()
+        except ValueError as error:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+        except Http404:
+            return JsonResponse({'success': False, 'error': 'Не найдено'}, status=404)
+
+        # ETag считается одним запросом; при совпадении строки не загружаются
+        etag, count = api.make_etag(request, queryset)
+        if not count and not self.paginated:
+            return JsonResponse({'success': False, 'error': 'Не найдено'}, status=404)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = JsonResponse(self.get_data(queryset, names))
+        response.headers['ETag'] = etag
+        # Клиент хранит ответ, но перед использованием проверяет ETag
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class CategoryApiListView(CatalogApiView):
+    resource = api.CATEGORIES
+    queryset = Category.objects.all()
+
+
+class CourseApiListView(CatalogApiView):
+    """Опубликованные курсы с фильтрами каталога: category, level, free=on, search"""
+    resource = api.COURSES
+
+    def get_queryset(self):
+        return filter_courses(Course.objects.filter(is_published=True), self.request.GET)
+
+
+class CourseApiDetailView(CatalogApiView):
+    resource = api.COURSES
+    paginated = False
+
+    def parse_params(self, params):
+        pass
+
+    def get_queryset(self):
+        return Course.objects.filter(pk=self.kwargs['pk'], is_published=True)
+
+    def get_data(self, queryset, names):
+        return self.resource.serialize(self.resource.only(queryset, names).get(), names)
+
+
+class CourseBatchApiView(View):
+    """
+    Карточки нескольких курсов за один запрос: /api/v1/courses/batch/?ids=1,2,3.
+    Карточки загружаются через загрузчик запроса (courses/loaders.py) одним
+    запросом id__in; отсутствующие и неопубликованные курсы - в missing.
+    """
+
+    def get(self, request, *args, **kwargs):
+        try:
+            ids = api.parse_ids(request.GET.get('ids'))
+        except api.ApiError as error:
+            return JsonResponse({'success': False, 'error': str(error)}, status=400)
+
+        courses = course_loader(request).load_many(ids)
+        return JsonResponse({
+            'results': [course_card(course) for course in courses if course is not None],
+            'missing': [pk for pk, course in zip(ids, courses) if course is None],
+        })
+
+
+class ModuleApiListView(CatalogApiView):
+    resource = api.MODULES
+
+    def get_queryset(self):
+        if not Course.objects.filter(pk=self.kwargs['course_pk'], is_published=True).exists():
+            raise Http404
+        return Module.objects.filter(course_id=self.kwargs['course_pk'])
+
+
+class LessonApiListView(CatalogApiView):
+    """Опубликованные уроки модуля"""
+    resource = api.LESSONS
+
+    def get_queryset(self):
+        module_exists = Module.objects.filter(
+            pk=self.kwargs['module_pk'], course_id=self.kwargs['course_pk'], course__is_published=True,
+        ).exists()
+        if not module_exists:
+            raise Http404
+        return Lesson.objects.filter(module_id=self.kwargs['module_pk'], is_published=True)
+
+
+class MetricsView(UserPassesTestMixin, View):
+    """Метрики в формате Prometheus - для персонала или сборщика с токеном METRICS_TOKEN"""
+    raise_exception = True
+
+    def test_func(self):
+        if self.request.user.is_staff:
+            return True
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        authorization = self.request.headers.get('Authorization', '')
+        return bool(token) and constant_time_compare(authorization, f'Bearer {token}')
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -42,11 +42,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'courses.metrics.MetricsMiddleware',
+    'courses.querystats.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'courses.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'courses.middleware.UserRoleMiddleware',
+    'courses.profiling.ProfilingMiddleware',
+    'courses.slowqueries.SlowQueryViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -74,11 +80,197 @@ WSGI_APPLICATION = 'studyhub.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# По умолчанию используется SQLite. Для PostgreSQL задайте DB_ENGINE=postgresql
+# и параметры подключения DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+# (нужен пакет psycopg: pip install "psycopg[binary,pool]").
+#
+# DB_CONN_MAX_AGE - время жизни постоянного соединения, сек (0 - закрывать после запроса)
+# DB_POOL=1 - пул соединений psycopg вместо постоянных соединений (только PostgreSQL),
+#             размер пула: DB_POOL_MIN_SIZE / DB_POOL_MAX_SIZE
+# DB_STATEMENT_TIMEOUT - максимальное время выполнения запроса, мс (только PostgreSQL)
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+
+if DB_ENGINE == 'postgresql':
+    DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+    DB_STATEMENT_TIMEOUT = int(os.environ.get('DB_STATEMENT_TIMEOUT', 5000))
+
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'studyhub'),
+            'USER': os.environ.get('DB_USER', 'studyhub'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Пул сам управляет соединениями, постоянные соединения с ним не совместимы
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'options': f'-c statement_timeout={DB_STATEMENT_TIMEOUT}',
+            },
+        }
+    }
+    if DB_POOL:
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+            'timeout': 10,
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Транзакции на запись сразу берут блокировку (BEGIN IMMEDIATE),
+                # а не пытаются повысить ее посреди транзакции
+                'transaction_mode': 'IMMEDIATE',
+                # Секунд ожидания блокировки вместо "database is locked" (busy_timeout SQLite)
+                'timeout': 20,
+            },
+        }
+    }
+
+# Реплики для чтения.
+# DB_REPLICAS - список через запятую: для PostgreSQL - хосты реплик,
+# для SQLite - пути к файлам (для локальной проверки маршрутизации).
+# Чтение каталога уходит на реплики (courses/routers.py), после записи
+# пользователь на REPLICA_PIN_SECONDS секунд читает только из основной базы.
+
+DATABASE_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1):
+    alias = f'replica{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'OPTIONS': dict(DATABASES['default']['OPTIONS']),
+        ('HOST' if DB_ENGINE == 'postgresql' else 'NAME'): replica.strip(),
+        # В тестах реплика указывает на ту же тестовую базу
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['courses.routers.PrimaryReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# PRAGMA, которые выполняются для каждого нового соединения с SQLite
+# (см. courses/signals.py, обработчик connection_created).
+# busy_timeout здесь не задается - его устанавливает OPTIONS['timeout']
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',          # читатели не блокируют писателя
+    'synchronous': 'NORMAL',        # в режиме WAL безопасно и намного быстрее FULL
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,           # ~20 МБ страничного кэша на соединение
+    'temp_store': 'MEMORY',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# 'default' - общий кэш для всех процессов: Redis, если задан REDIS_URL,
+# иначе файловый кэш (подходит для разработки и одного сервера).
+# 'local' - кэш в памяти процесса для небольших часто используемых объектов.
+
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
+        'OPTIONS': {'MAX_ENTRIES': 20000},
     }
+
+CACHES = {
+    'default': {
+        **SHARED_CACHE,
+        'KEY_PREFIX': 'studyhub',
+        'TIMEOUT': 300,
+    },
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'studyhub-local',
+        'TIMEOUT': 60,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
+# Учет запросов к базе (courses/querystats.py): включен при DEBUG или QUERY_STATS=1.
+# Предупреждение в лог, если страница делает больше запросов или повторов,
+# чем указано (None - не проверять). При DEBUG счетчики отдаются в заголовках
+# X-DB-* и Server-Timing.
+QUERY_STATS = os.environ.get('QUERY_STATS', '1' if DEBUG else '0') == '1'
+QUERY_COUNT_WARNING = int(os.environ.get('QUERY_COUNT_WARNING', 50))
+DUPLICATE_QUERY_WARNING = int(os.environ.get('DUPLICATE_QUERY_WARNING', 5))
+
+# Метрики Prometheus (courses/metrics.py), доступны персоналу по адресу /metrics.
+# Каждый процесс сохраняет свои значения в METRICS_DIR, /metrics их суммирует.
+# METRICS_TOKEN - токен для сборщика: заголовок "Authorization: Bearer <токен>".
+METRICS_DIR = Path(os.environ.get('METRICS_DIR', BASE_DIR / '.metrics'))
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1.0))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Профилирование запросов (courses/profiling.py): ?_profile=1 для сотрудников,
+# подписанный токен (manage.py profiles --token) или выборка 1 из PROFILING_SAMPLE_RATE.
+PROFILING_DIR = Path(os.environ.get('PROFILING_DIR', BASE_DIR / '.profiles'))
+PROFILING_SAMPLE_RATE = int(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+PROFILING_MAX_FILES = 200
+
+# Журнал медленных запросов (courses/slowqueries.py): запросы дольше порога
+# записываются вместе с планом выполнения в JSONL-файл с ротацией.
+# Пустое значение SLOW_QUERY_THRESHOLD_MS выключает журнал. Отчет: manage.py slowqueries
+_slow_query_threshold = os.environ.get('SLOW_QUERY_THRESHOLD_MS', '200')
+SLOW_QUERY_THRESHOLD_MS = float(_slow_query_threshold) if _slow_query_threshold else None
+SLOW_QUERY_LOG = Path(os.environ.get('SLOW_QUERY_LOG', BASE_DIR / 'logs' / 'slow_queries.jsonl'))
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 1024 * 1024
+SLOW_QUERY_LOG_BACKUP_COUNT = 5
+
+# Тесты производительности (manage.py bench): результат и базовый прогон
+# по умолчанию сохраняются в BENCH_DIR (latest.json и baseline.json).
+BENCH_DIR = Path(os.environ.get('BENCH_DIR', BASE_DIR / '.bench'))
+
+# События в реальном времени (courses/events.py): поток Server-Sent Events
+# /progress/stream/ с изменениями прогресса пользователя на всех его устройствах.
+# Между процессами события передает Redis pub/sub (если задан REDIS_URL),
+# иначе локальный брокер - события видны только внутри одного процесса.
+EVENT_BROKER = 'courses.events.RedisBroker' if REDIS_URL else 'courses.events.LocalBroker'
+# Пауза между пингами открытого потока и время, после которого браузер переподключается (секунд)
+EVENT_STREAM_KEEPALIVE = 15
+EVENT_STREAM_MAX_DURATION = 300
+
+# Синхронизация мобильного приложения (courses/sync.py, /api/sync?since=<курсор>).
+# Курсор отстает от времени сервера на SYNC_CURSOR_LAG секунд, чтобы не пропустить
+# изменения из транзакций, зафиксированных позже запроса. Отметки об удалении
+# хранятся SYNC_TOMBSTONE_DAYS дней (manage.py prune_sync_tombstones), клиент
+# с более старым курсором получает полное состояние.
+SYNC_CURSOR_LAG = 5
+SYNC_TOMBSTONE_DAYS = 90
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'courses': {
+            'handlers': ['console'],
+            'level': os.environ.get('COURSES_LOG_LEVEL', 'INFO' if DEBUG else 'WARNING'),
+        },
+    },
 }
 
 
@@ -133,6 +325,14 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # АВТОРИЗАЦИЯ И ПЕРЕНАПРАВЛЕНИЯ
 # ============================================
 
+# Пользователь загружается вместе с UserProfile одним запросом.
+# ModelBackend остается в списке для сессий, созданных до ProfileModelBackend:
+# Django не восстанавливает пользователя сессии, бэкенда которой нет в списке
+AUTHENTICATION_BACKENDS = [
+    'courses.backends.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 # URL для перенаправления после выхода
 LOGOUT_REDIRECT_URL = 'home'
 